@@ -0,0 +1,198 @@
+# analytics.py
+import threading
+
+try:
+    import numpy as np  # optional - /analytics/sizes is unavailable without it
+except ImportError:
+    np = None
+
+from similar import DIMENSIONS
+
+PERCENTILES = (5, 10, 25, 50, 75, 90, 95)
+SIZE_LABELS = {
+    1: ("FREE",),
+    2: ("S", "L"),
+    3: ("S", "M", "L"),
+    4: ("S", "M", "L", "XL"),
+    5: ("XS", "S", "M", "L", "XL"),
+    6: ("XS", "S", "M", "L", "XL", "XXL"),
+    7: ("XXS", "XS", "S", "M", "L", "XL", "XXL"),
+}
+# Size boundaries are rounded to what a cutter marks
+SIZE_STEP = 0.5
+
+
+def size_buckets(values, sizes):
+    """Split sorted values into `sizes` buckets holding about the same number of people"""
+    cuts = np.percentile(values, np.linspace(0, 100, sizes + 1)[1:-1])
+    cuts = np.unique(np.round(cuts / SIZE_STEP) * SIZE_STEP)
+    edges = np.concatenate([[values[0]], cuts[(cuts > values[0]) & (cuts < values[-1])], [values[-1]]])
+    # Each bucket holds [lower, upper), the last one also holds the maximum
+    counts = np.diff(np.searchsorted(values, edges[:-1], side="left").tolist() + [len(values)])
+    labels = SIZE_LABELS.get(len(counts)) or [str(n + 1) for n in range(len(counts))]
+    return [
+        {"size": label, "from": round(float(low), 2), "to": round(float(high), 2),
+         "count": int(count), "share": round(float(count) / len(values), 4)}
+        for label, low, high, count in zip(labels, edges[:-1], edges[1:], counts)
+    ]
+
+
+def describe(values, bins, sizes):
+    """Percentiles, histogram and suggested sizes of one dimension (values sorted, no NaN)"""
+    counts, edges = np.histogram(values, bins=bins)
+    return {
+        "count": int(values.size),
+        "min": round(float(values[0]), 2),
+        "max": round(float(values[-1]), 2),
+        "mean": round(float(values.mean()), 2),
+        "std": round(float(values.std()), 2),
+        "percentiles": {f"p{p}": round(float(v), 2) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))},
+        "histogram": {"edges": np.round(edges, 2).tolist(), "counts": counts.tolist()},
+        "sizes": size_buckets(values, sizes),
+    }
+
+
+class SizeDistribution:
+    """Columnar in-memory copy of MEASUREMENT for size statistics.
+
+    The first refresh loads every row; later ones read only rows with a newer
+    change_seq plus TOMBSTONE entries, so new, edited and deleted measurements
+    are picked up without reloading - whoever wrote them. Computed statistics
+    are cached until the data changes.
+    """
+
+    def __init__(self, max_cached=64):
+        self.max_cached = max_cached
+        self._lock = threading.Lock()
+        self._seq = None
+        self._version = 0
+        self._size = 0
+        self._positions = {}
+        self._garment_codes = {}
+        self._cache = {}
+        if np is not None:
+            self._allocate(0)
+
+    def _allocate(self, capacity):
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.customers = np.zeros(capacity, dtype=np.int64)
+        self.garments = np.zeros(capacity, dtype=np.int16)
+        self.dates = np.zeros(capacity, dtype="datetime64[D]")
+        self.values = np.zeros((capacity, len(DIMENSIONS)), dtype=np.float32)
+
+    def _reserve(self, extra):
+        needed = self._size + extra
+        if needed <= self.ids.shape[0]:
+            return
+        old = (self.ids, self.customers, self.garments, self.dates, self.values)
+        self._allocate(max(1024, needed, 2 * self.ids.shape[0]))
+        for new, previous in zip((self.ids, self.customers, self.garments, self.dates, self.values), old):
+            new[:self._size] = previous[:self._size]
+
+    def _garment_code(self, garment_type):
+        return self._garment_codes.setdefault(garment_type, len(self._garment_codes))
+
+    def refresh(self, conn):
+        """Apply measurements changed since the last refresh; returns the data version"""
+        columns = ", ".join(DIMENSIONS)
+        with self._lock:
+            since = -1 if self._seq is None else self._seq
+            conn.execute('BEGIN')  # one snapshot for the clock, rows and tombstones
+            try:
+                seq = conn.execute('SELECT seq FROM CHANGE_CLOCK').fetchone()[0]
+                if seq == self._seq:
+                    return self._version
+                rows = conn.execute(f'SELECT measurement_id, customer_id, garment_type, measurement_date, {columns} '
+                                    'FROM MEASUREMENT WHERE change_seq > ?', (since,)).fetchall()
+                deleted = [row[0] for row in conn.execute(
+                    "SELECT entity_id FROM TOMBSTONE WHERE change_seq > ? AND entity = 'measurement'", (since,))]
+            finally:
+                conn.rollback()
+
+            for measurement_id in deleted:
+                self._remove(measurement_id)
+            if rows:
+                self._upsert(rows)
+            if rows or deleted:
+                self._version += 1
+                self._cache.clear()
+            self._seq = seq
+            return self._version
+
+    def _remove(self, measurement_id):
+        row = self._positions.pop(measurement_id, None)
+        if row is None:
+            return
+        last = self._size - 1
+        if row != last:
+            for column in (self.ids, self.customers, self.garments, self.dates, self.values):
+                column[row] = column[last]
+            self._positions[int(self.ids[row])] = row
+        self._size = last
+
+    def _upsert(self, rows):
+        existing = [(self._positions[row[0]], row) for row in rows if row[0] in self._positions]
+        new = [row for row in rows if row[0] not in self._positions] if existing else rows
+        if existing:
+            targets = np.array([position for position, _ in existing], dtype=np.int64)
+            self._write(targets, [row for _, row in existing])
+        if new:
+            self._reserve(len(new))
+            targets = np.arange(self._size, self._size + len(new))
+            self._write(targets, new)
+            self._positions.update(zip((row[0] for row in new), targets.tolist()))
+            self._size += len(new)
+
+    def _write(self, targets, rows):
+        ids, customers, garments, dates = zip(*(row[:4] for row in rows))
+        self.ids[targets] = ids
+        self.customers[targets] = customers
+        self.garments[targets] = [self._garment_code(garment_type) for garment_type in garments]
+        self.dates[targets] = np.array(dates, dtype="datetime64[D]")
+        # None becomes NaN in a float array
+        self.values[targets] = np.array([row[4:] for row in rows], dtype=np.float32)
+
+    def compute(self, conn, garment_types, start=None, end=None, bins=12, sizes=5, latest_per_customer=True):
+        """{garment_type: statistics per dimension} over measurements dated start..end (inclusive)"""
+        version = self.refresh(conn)
+        key = (tuple(garment_types), start, end, bins, sizes, latest_per_customer)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+
+            size = self._size
+            in_range = np.ones(size, dtype=bool)
+            if start is not None:
+                in_range &= self.dates[:size] >= np.datetime64(start, "D")
+            if end is not None:
+                in_range &= self.dates[:size] <= np.datetime64(end, "D")
+
+            result = {}
+            for garment_type in garment_types:
+                code = self._garment_codes.get(garment_type)
+                rows = np.flatnonzero(in_range & (self.garments[:size] == code)) if code is not None else np.array([], int)
+                if latest_per_customer and rows.size:
+                    # Sort by customer, date then id, keep each customer's last row - the id
+                    # settles same-day ties, as row positions change with every delete
+                    order = rows[np.lexsort((self.ids[rows], self.dates[rows], self.customers[rows]))]
+                    customers = self.customers[order]
+                    rows = order[np.append(customers[1:] != customers[:-1], True)]
+                dimensions = {}
+                block = self.values[rows]
+                for index, name in enumerate(DIMENSIONS):
+                    column = block[:, index]
+                    column = np.sort(column[~np.isnan(column)]).astype(np.float64)
+                    if column.size:
+                        dimensions[name] = describe(column, bins, sizes)
+                result[garment_type] = {"measurements": int(rows.size), "dimensions": dimensions}
+
+            if len(self._cache) >= self.max_cached:
+                self._cache.clear()
+            self._cache[key] = (version, result)
+            return result
+
+    def stats(self):
+        with self._lock:
+            return {"rows": self._size, "change_seq": self._seq, "version": self._version,
+                    "cached_results": len(self._cache)}
@@ -0,0 +1,2 @@
+# Benchmarks for the Tailor Management System API.
+# Run from the backend directory, e.g. python -m benchmarks.export_throughput
@@ -0,0 +1,272 @@
+# api_load.py
+"""Drive every API route in-process under concurrent load; per-route throughput and p50/p95/p99 as JSON.
+
+    python -m benchmarks.api_load --customers 10000 --concurrency 16 --requests 200 --output run.json
+
+Requests go through the full ASGI app (middleware, validation, serialization) via
+httpx's ASGI transport, so no server or sockets are involved. Routes run one after
+another, each with --concurrency clients sharing --requests requests (streamed exports
+with at most one client per stream slot). Percentiles cover the 2xx responses;
+503 rejections are counted apart from errors. Compare the
+JSON of two commits run with the same arguments and seed. /events is left out -
+it is a long-lived stream, not a request/response route.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.datagen import FIRST_NAMES, GARMENT_TYPES, ORDER_STATUSES, generate
+from benchmarks.stats import summarize
+
+
+class Context:
+    """Ids the scenarios pick from, plus rows created by the POST routes for PUT/DELETE"""
+
+    def __init__(self, database, seed):
+        conn = sqlite3.connect(database)
+        self.max_customer = conn.execute('SELECT max(customer_id) FROM CUSTOMER').fetchone()[0] or 1
+        self.max_measurement = conn.execute('SELECT max(measurement_id) FROM MEASUREMENT').fetchone()[0] or 1
+        self.max_order = conn.execute('SELECT max(order_id) FROM "ORDER"').fetchone()[0] or 1
+        self.sync_cursor = conn.execute('SELECT seq FROM CHANGE_CLOCK').fetchone()[0]
+        self.order_pair = conn.execute('SELECT customer_id, measurement_id FROM "ORDER" LIMIT 1').fetchone()
+        conn.close()
+        self.rng = random.Random(seed)
+        self.created = {"customers": [], "measurements": [], "orders": []}
+        self.etags = {}
+
+    def customer_id(self):
+        return self.rng.randint(1, self.max_customer)
+
+    def measurement_id(self):
+        return self.rng.randint(1, self.max_measurement)
+
+    def order_id(self):
+        return self.rng.randint(1, self.max_order)
+
+    def day(self):
+        return f"{self.rng.randint(2022, 2025)}-{self.rng.randint(1, 12):02d}-{self.rng.randint(1, 28):02d}"
+
+
+def new_customer(ctx):
+    return {"name": f"{ctx.rng.choice(FIRST_NAMES)} Bench", "phone_number": f"0399-{ctx.rng.randint(0, 9999999):07d}"}
+
+
+def new_measurement(ctx):
+    return {"customer_id": ctx.customer_id(), "measurement_date": ctx.day(),
+            "garment_type": ctx.rng.choice(GARMENT_TYPES), "chest": 40.0, "waist": 34.0}
+
+
+def new_order(ctx):
+    customer_id, measurement_id = ctx.order_pair
+    return {"customer_id": customer_id, "measurement_id": measurement_id, "order_date": ctx.day(),
+            "total_amount": 5000, "advance_payment": 1000, "garment_type": "shirt"}
+
+
+async def created(ctx, kind, response):
+    if response.status_code == 200:
+        ctx.created[kind].append(response.json()[{"customers": "customer_id", "measurements": "measurement_id",
+                                                  "orders": "order_id"}[kind]])
+    return response
+
+
+async def pop_created(ctx, kind):
+    return ctx.created[kind].pop() if ctx.created[kind] else 0
+
+
+async def conditional_get(client, ctx, path):
+    """GET with the ETag from a previous response - measures the 304 path"""
+    if path not in ctx.etags:
+        ctx.etags[path] = (await client.get(path)).headers.get("etag", "")
+    return await client.get(path, headers={"If-None-Match": ctx.etags[path]})
+
+
+async def import_batch(client, ctx):
+    records = []
+    for i in range(10):
+        records.append({"entity": "customer", "temp_id": f"c{i}", "data": new_customer(ctx)})
+        records.append({"entity": "measurement", "temp_id": f"m{i}", "customer_ref": f"c{i}",
+                        "data": {**new_measurement(ctx), "customer_id": None}})
+    return await client.post("/import", json=records)
+
+
+# route name -> scenario(client, ctx) returning the response. Order matters: the
+# POST routes run before the PUT/DELETE routes that use the rows they created.
+ROUTES = {
+    "GET /": lambda c, ctx: c.get("/"),
+    "GET /test-db": lambda c, ctx: c.get("/test-db"),
+    "GET /db/pool": lambda c, ctx: c.get("/db/pool"),
+    "GET /db/writer": lambda c, ctx: c.get("/db/writer"),
+    "GET /db/cache": lambda c, ctx: c.get("/db/cache"),
+    "GET /db/events": lambda c, ctx: c.get("/db/events"),
+    "GET /db/lanes": lambda c, ctx: c.get("/db/lanes"),
+    "GET /db/startup": lambda c, ctx: c.get("/db/startup"),
+    "GET /db/slow-queries": lambda c, ctx: c.get("/db/slow-queries"),
+    "GET /metrics": lambda c, ctx: c.get("/metrics"),
+
+    "GET /customers/?limit=100": lambda c, ctx: c.get("/customers/", params={"limit": 100, "after_id": ctx.customer_id()}),
+    "GET /customers/?ids= (50)": lambda c, ctx: c.get("/customers/", params={"ids": ",".join(str(ctx.customer_id()) for _ in range(50))}),
+    "GET /customers/{id}/profile": lambda c, ctx: c.get(f"/customers/{ctx.customer_id()}/profile"),
+    "GET /customers/{id}": lambda c, ctx: c.get(f"/customers/{ctx.customer_id()}"),
+    "GET /customers/ (304)": lambda c, ctx: conditional_get(c, ctx, "/customers/?limit=100"),
+    "POST /customers/": lambda c, ctx: c.post("/customers/", json=new_customer(ctx)),
+    "PUT /customers/{id}": lambda c, ctx: c.put(f"/customers/{ctx.customer_id()}", json={"notes": "bench"}),
+
+    "GET /measurements/?limit=100": lambda c, ctx: c.get("/measurements/", params={"limit": 100, "after_id": ctx.measurement_id()}),
+    "GET /measurements/?ids= (50)": lambda c, ctx: c.get("/measurements/", params={"ids": ",".join(str(ctx.measurement_id()) for _ in range(50))}),
+    "GET /measurements/{id}": lambda c, ctx: c.get(f"/measurements/{ctx.measurement_id()}"),
+    "GET /measurements/{id}/similar": lambda c, ctx: c.get(f"/measurements/{ctx.measurement_id()}/similar"),
+    "POST /measurements/": lambda c, ctx: c.post("/measurements/", json=new_measurement(ctx)),
+    "PUT /measurements/{id}": lambda c, ctx: c.put(f"/measurements/{ctx.measurement_id()}",
+                                                   json={"measurement_date": ctx.day(), "garment_type": "shirt", "chest": 41.0}),
+
+    "GET /orders/?limit=100": lambda c, ctx: c.get("/orders/", params={"limit": 100, "after_id": ctx.order_id()}),
+    "GET /orders/?ids= (50)": lambda c, ctx: c.get("/orders/", params={"ids": ",".join(str(ctx.order_id()) for _ in range(50))}),
+    "GET /orders/{id}": lambda c, ctx: c.get(f"/orders/{ctx.order_id()}"),
+    "GET /orders/{id} (304)": lambda c, ctx: conditional_get(c, ctx, "/orders/1"),
+    "POST /orders/": lambda c, ctx: c.post("/orders/", json=new_order(ctx)),
+    "PUT /orders/{id}": lambda c, ctx: c.put(f"/orders/{ctx.order_id()}", json={"status": ctx.rng.choice(ORDER_STATUSES)}),
+
+    "GET /search/phone/{digits}": lambda c, ctx: c.get(f"/search/phone/{ctx.rng.randint(0, 9999):04d}", params={"match": "suffix"}),
+    "GET /search/name/{name}": lambda c, ctx: c.get(f"/search/name/{ctx.rng.choice(FIRST_NAMES)[:3]}"),
+    "GET /search/garment/{type}": lambda c, ctx: c.get(f"/search/garment/{ctx.rng.choice(GARMENT_TYPES)}"),
+    "GET /search/date/ (day)": lambda c, ctx: c.get("/search/date/", params={"date_str": ctx.day()}),
+    "GET /search/date/ (week)": lambda c, ctx: c.get("/search/date/", params={"from": "2024-03-01", "to": "2024-03-07"}),
+    "GET /dashboard": lambda c, ctx: c.get("/dashboard"),
+    "GET /reports/monthly": lambda c, ctx: c.get("/reports/monthly", params={"year": ctx.rng.randint(2022, 2025),
+                                                                             "month": ctx.rng.randint(1, 12)}),
+    "GET /workload": lambda c, ctx: c.get("/workload", params={"from": ctx.day(), "include_overdue": False}),
+    "GET /analytics/sizes": lambda c, ctx: c.get("/analytics/sizes", params={"garment_type": ctx.rng.choice(GARMENT_TYPES)}),
+    "GET /export/orders (month csv)": lambda c, ctx: c.get("/export/orders", params={"from": "2024-03-01", "to": "2024-03-31"}),
+    "GET /sync": lambda c, ctx: c.get("/sync", params={"since": max(0, ctx.sync_cursor - 500)}),
+    "POST /import (20 rows)": import_batch,
+}
+
+# Streamed responses, each holding one of the server's stream slots while it runs
+STREAMING_ROUTES = ("GET /export/orders (month csv)",)
+
+# Routes whose responses feed ctx.created, and the DELETE routes consuming them
+CREATES = {"POST /customers/": "customers", "POST /measurements/": "measurements", "POST /orders/": "orders"}
+DELETES = {
+    "DELETE /orders/{id}": ("orders", "/orders/{}"),
+    "DELETE /measurements/{id}": ("measurements", "/measurements/{}"),
+    "DELETE /customers/{id}": ("customers", "/customers/{}"),
+}
+
+
+async def run_route(client, ctx, name, scenario, requests, concurrency):
+    """Latency percentiles over the 2xx responses only - a fast 503 or 404 says nothing about the route"""
+    samples = []
+    errors = 0
+    rejected = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors, rejected
+        for _ in remaining:
+            started = time.perf_counter()
+            response = await scenario(client, ctx)
+            elapsed = time.perf_counter() - started
+            if response.status_code == 503:
+                rejected += 1  # load shedding (stream slots), not a failure of the route
+            elif response.status_code >= 500 or response.status_code in (400, 422):
+                errors += 1
+            elif 200 <= response.status_code < 300:
+                samples.append(elapsed)
+                if name in CREATES:
+                    await created(ctx, CREATES[name], response)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {**summarize(samples), "errors": errors, "rejected": rejected,
+            "requests_per_second": round(len(samples) / elapsed, 1)}
+
+
+async def run_all(app, ctx, requests, concurrency, only, stream_slots):
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    # The ASGI transport sends no lifespan events - run startup/shutdown around the load
+    async with app.router.lifespan_context(app), \
+            httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        routes = dict(ROUTES)
+        for name, (kind, path) in DELETES.items():
+            routes[name] = lambda c, ctx, kind=kind, path=path: _delete(c, ctx, kind, path)
+        for name, scenario in routes.items():
+            if only and only not in name:
+                continue
+            # More concurrent exports than stream slots would only measure the 503s
+            clients = min(concurrency, max(1, stream_slots)) if name in STREAMING_ROUTES else concurrency
+            results[name] = await run_route(client, ctx, name, scenario, requests, clients)
+            results[name]["concurrency"] = clients
+    return results
+
+
+async def _delete(client, ctx, kind, path):
+    return await client.delete(path.format(await pop_created(ctx, kind)))
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", help="existing database to reuse (default: generate a fresh one)")
+    parser.add_argument("--customers", type=int, default=10000)
+    parser.add_argument("--measurements", type=int, default=2, help="average measurements per customer")
+    parser.add_argument("--orders", type=int, default=3, help="average orders per customer")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--requests", type=int, default=200, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--route", help="only run routes whose name contains this text")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    database = args.database
+    dataset = None
+    if database is None:
+        database = os.path.join(tempfile.mkdtemp(), "bench.db")
+        started = time.perf_counter()
+        dataset = generate(database, args.customers, args.measurements, args.orders, args.seed)
+        dataset["seconds"] = round(time.perf_counter() - started, 2)
+
+    os.environ["TAILORSHOP_DB"] = database
+    import main as api
+
+    ctx = Context(database, args.seed)
+    routes = asyncio.run(run_all(api.app, ctx, args.requests, args.concurrency, args.route, api.stream_slots.size))
+
+    report = {
+        "benchmark": "api_load",
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "database": args.database,
+        "dataset": dataset,
+        "requests_per_route": args.requests,
+        "concurrency": args.concurrency,
+        "startup": api.startup_report,
+        "routes": routes,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# datagen.py
+"""Synthetic shop data at a configurable scale, reproducible from a seed.
+
+    python -m benchmarks.datagen bench.db --customers 100000 --measurements 2 --orders 3
+"""
+import argparse
+import json
+import random
+import sqlite3
+import time
+from datetime import date, timedelta
+
+from database import normalize_phone
+from migrations import GARMENT_TYPES, ORDER_STATUSES, migrate
+
+# Weights for ORDER_STATUSES - most orders in a real shop are already delivered
+STATUS_WEIGHTS = (5, 5, 8, 7, 75)
+
+FIRST_NAMES = ("Ali", "Ahmed", "Usman", "Bilal", "Hamza", "Hassan", "Hussain", "Imran", "Kashif", "Zain",
+               "Fatima", "Ayesha", "Sana", "Hira", "Maryam", "Zainab", "Abdul", "Omar", "Saad", "Tariq")
+LAST_NAMES = ("Khan", "Ali", "Ahmed", "Malik", "Butt", "Sheikh", "Qureshi", "Chaudhry", "Raza", "Jalil",
+              "Iqbal", "Mirza", "Shah", "Siddiqui", "Hashmi")
+AREAS = ("Gulberg", "Model Town", "Johar Town", "DHA", "Iqbal Town", "Samanabad", "Shadman", "Garden Town")
+CITIES = ("Lahore", "Karachi", "Islamabad", "Faisalabad", "Multan")
+ATTRIBUTES = (None, None, None, "loose fit", "slim fit", "double stitch", "side pockets")
+
+START_DATE = date(2022, 1, 1)
+DAYS = 4 * 365
+
+BATCH = 10000
+
+
+def measurement_values(rng, customer_id, garment_type, day):
+    """One MEASUREMENT row - fields that do not apply to the garment stay NULL"""
+    upper = garment_type in ('2-piece', '3-piece', 'prince-coat', 'shirt', 'coat')
+    lower = garment_type in ('2-piece', '3-piece', 'pants')
+    size = rng.gauss(0, 1)
+
+    def inches(mean, spread, applies=True):
+        return round(mean + spread * (size + rng.gauss(0, 0.3)), 1) if applies else None
+
+    return (
+        customer_id, day.isoformat(), garment_type,
+        inches(40, 3, upper), inches(34, 3), inches(30, 2, upper), inches(18, 1, upper),
+        inches(24, 1.5, upper), inches(8, 0.7, upper), inches(15.5, 0.8, upper),
+        inches(40, 2, lower), inches(8, 0.7, lower), inches(38, 2, garment_type in ('2-piece', '3-piece')),
+        inches(40, 3), inches(42, 2, garment_type == 'prince-coat'), rng.choice(ATTRIBUTES),
+        inches(40, 2, garment_type == 'pants'), inches(7.5, 0.6, garment_type == 'pants'),
+    )
+
+
+def generate(database, customers, measurements_per_customer=2, orders_per_customer=3, seed=1):
+    """Migrate database and fill it with customers and on average the given measurements/orders each.
+
+    Returns the row counts written.
+    """
+    rng = random.Random(seed)
+    conn = sqlite3.connect(database)
+    migrate(conn)
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = OFF')
+    counts = {"customers": 0, "measurements": 0, "orders": 0}
+
+    first_customer = (conn.execute('SELECT max(customer_id) FROM CUSTOMER').fetchone()[0] or 0) + 1
+    first_measurement = (conn.execute('SELECT max(measurement_id) FROM MEASUREMENT').fetchone()[0] or 0) + 1
+    measurement_id = first_measurement
+
+    for batch_start in range(0, customers, BATCH):
+        customer_rows, measurement_rows, order_rows = [], [], []
+        for offset in range(batch_start, min(customers, batch_start + BATCH)):
+            customer_id = first_customer + offset
+            phone = f"03{rng.randint(0, 49):02d}-{rng.randint(0, 9999999):07d}"
+            customer_rows.append((
+                customer_id, f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", phone,
+                f"House {rng.randint(1, 999)}, {rng.choice(AREAS)}, {rng.choice(CITIES)}",
+                rng.choice((None, None, "regular", "prefers home delivery", "wedding season")),
+                *normalize_phone(phone),
+            ))
+
+            # Each customer gets 0..2x the average number of measurements and orders
+            own_measurements = []
+            for _ in range(rng.randint(0, 2 * measurements_per_customer) or 1):
+                garment_type = rng.choice(GARMENT_TYPES)
+                day = START_DATE + timedelta(days=rng.randrange(DAYS))
+                measurement_rows.append((measurement_id, *measurement_values(rng, customer_id, garment_type, day)))
+                own_measurements.append((measurement_id, garment_type, day))
+                measurement_id += 1
+
+            for _ in range(rng.randint(0, 2 * orders_per_customer)):
+                m_id, garment_type, measured = rng.choice(own_measurements)
+                order_day = measured + timedelta(days=rng.randint(0, 60))
+                total = float(rng.randrange(1500, 40000, 100))
+                advance = float(rng.randrange(0, int(total) // 2 + 1, 100))
+                status = rng.choices(ORDER_STATUSES, STATUS_WEIGHTS)[0]
+                order_rows.append((
+                    customer_id, m_id, order_day.isoformat(),
+                    (order_day + timedelta(days=rng.randint(5, 21))).isoformat(),
+                    total, advance, rng.choice((0.0, 0.0, 0.0, 500.0)), status,
+                    rng.choice((None, None, "urgent", "extra buttons")), garment_type,
+                ))
+
+        with conn:
+            conn.executemany('''
+                INSERT INTO CUSTOMER (customer_id, name, phone_number, address, notes, phone_digits, phone_digits_reversed)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', customer_rows)
+            conn.executemany('''
+                INSERT INTO MEASUREMENT
+                (measurement_id, customer_id, measurement_date, garment_type, chest, waist, length,
+                 shoulder, arm_length, arm_opening, neck, shalwar_length, shalwar_bottom,
+                 kamee_length, hip, kurta_length, attribute, pajama_length, pajama_bottom)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', measurement_rows)
+            conn.executemany('''
+                INSERT INTO "ORDER"
+                (customer_id, measurement_id, order_date, delivery_date, total_amount,
+                 advance_payment, discount, status, notes, garment_type)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', order_rows)
+        counts["customers"] += len(customer_rows)
+        counts["measurements"] += len(measurement_rows)
+        counts["orders"] += len(order_rows)
+
+    conn.execute('ANALYZE')
+    conn.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("database")
+    parser.add_argument("--customers", type=int, default=10000)
+    parser.add_argument("--measurements", type=int, default=2, help="average measurements per customer")
+    parser.add_argument("--orders", type=int, default=3, help="average orders per customer")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = generate(args.database, args.customers, args.measurements, args.orders, args.seed)
+    print(json.dumps({**counts, "seconds": round(time.perf_counter() - started, 2)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# export_throughput.py
+"""Rows per second and peak memory of /export/{entity}.
+
+    python -m benchmarks.export_throughput --rows 200000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+
+def fill_orders(database, rows):
+    """Write rows synthetic orders (one customer and measurement per 4 orders) straight into SQLite"""
+    conn = sqlite3.connect(database)
+    customers = max(1, rows // 4)
+    conn.executemany('INSERT INTO CUSTOMER (name, phone_number) VALUES (?, ?)',
+                     ((f"Customer {i}", f"0300{i:07d}") for i in range(customers)))
+    conn.executemany('INSERT INTO MEASUREMENT (customer_id, measurement_date, garment_type, chest) VALUES (?, ?, ?, ?)',
+                     ((i + 1, "2025-01-01", "shirt", 40.0) for i in range(customers)))
+    start = date(2024, 1, 1)
+    conn.executemany('''
+        INSERT INTO "ORDER" (customer_id, measurement_id, order_date, total_amount, advance_payment, status, garment_type)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (
+        (i % customers + 1, i % customers + 1, (start + timedelta(days=i % 730)).isoformat(),
+         random.randint(2000, 20000), 1000, "delivered", "shirt")
+        for i in range(rows)
+    ))
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--format", choices=("csv", "ndjson"), default="csv")
+    parser.add_argument("--gzip", action="store_true")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ["TAILORSHOP_DB"] = os.path.join(workdir, "bench.db")
+    import main as api
+    api.init_database()  # creates the schema in the temporary database
+
+    fill_orders(os.environ["TAILORSHOP_DB"], args.rows)
+
+    async def drain():
+        # Same StreamingResponse the route returns, drained without an HTTP client
+        # (the test client buffers whole bodies, which would hide the server's footprint)
+        response = await api.export_entity(entity="orders", format=args.format, gzip=args.gzip,
+                                           from_date=None, to_date=None, status=None, garment_type=None)
+        size = 0
+        async for piece in response.body_iterator:
+            size += len(piece)
+        return size
+
+    started = time.perf_counter()
+    body_bytes = asyncio.run(drain())
+    elapsed = time.perf_counter() - started
+
+    # Second pass only for memory - tracemalloc slows allocation down noticeably
+    tracemalloc.start()
+    asyncio.run(drain())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(json.dumps({
+        "benchmark": "export_throughput",
+        "rows": args.rows,
+        "format": args.format,
+        "gzip": args.gzip,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(args.rows / elapsed),
+        "body_bytes": body_bytes,
+        "peak_traced_memory_bytes": peak,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
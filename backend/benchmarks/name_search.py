@@ -0,0 +1,57 @@
+# name_search.py
+"""Latency of /search/name/ for first names, last names, short and multi-word prefixes.
+
+    python -m benchmarks.name_search --customers 1000000
+    python -m benchmarks.name_search --database bench.db   # reuse a datagen database
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+from benchmarks.datagen import generate
+from benchmarks.stats import summarize
+
+TERMS = ("Ali", "Sa", "Kh", "Zain", "Zainab", "Khan", "Ali Khan", "Qureshi", "Chaudhry")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--customers", type=int, default=1000000)
+    parser.add_argument("--database", help="existing database to search instead of generating one")
+    parser.add_argument("--repeat", type=int, default=200, help="searches per term")
+    args = parser.parse_args()
+
+    database = args.database
+    if database is None:
+        database = os.path.join(tempfile.mkdtemp(), "bench.db")
+        generate(database, args.customers, measurements_per_customer=0, orders_per_customer=0)
+    os.environ["TAILORSHOP_DB"] = database
+    import main as api
+    api.init_database()
+
+    async def run(term):
+        await api.search_by_name(term, limit=50, all_fields=False)  # warm the page cache
+        samples = []
+        for _ in range(args.repeat):
+            started = time.perf_counter()
+            await api.search_by_name(term, limit=50, all_fields=False)
+            samples.append(time.perf_counter() - started)
+        return samples
+
+    customers = api.pool.acquire()
+    try:
+        count = customers.execute('SELECT count(*) FROM CUSTOMER').fetchone()[0]
+    finally:
+        api.pool.release(customers)
+    print(json.dumps({
+        "benchmark": "name_search",
+        "customers": count,
+        "terms": {term: summarize(asyncio.run(run(term))) for term in TERMS},
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# read_latency.py
+"""Point-read latency (get_customer) alone and while heavy /search/date/ queries run.
+
+    python -m benchmarks.read_latency --rows 100000 --readers 8 --heavy 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+from starlette.requests import Request
+
+from benchmarks.export_throughput import fill_orders
+from benchmarks.stats import summarize
+
+
+def get_request(path):
+    """Bare GET request for handlers that read headers (ETag validation)"""
+    return Request({"type": "http", "method": "GET", "path": path, "query_string": b"", "headers": []})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000, help="synthetic orders")
+    parser.add_argument("--readers", type=int, default=8, help="concurrent point-read clients")
+    parser.add_argument("--heavy", type=int, default=4, help="concurrent /search/date/ clients")
+    parser.add_argument("--seconds", type=float, default=5.0, help="duration of each phase")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ["TAILORSHOP_DB"] = os.path.join(workdir, "bench.db")
+    import main as api
+    api.init_database()  # creates the schema in the temporary database
+
+    fill_orders(os.environ["TAILORSHOP_DB"], args.rows)
+    customers = max(1, args.rows // 4)
+
+    async def reader(deadline, samples):
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            customer_id = random.randint(1, customers)
+            await api.get_customer(customer_id, get_request(f"/customers/{customer_id}"))
+            samples.append(time.perf_counter() - started)
+
+    async def heavy(deadline, samples):
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            # Two months of orders - a few thousand customers with everything they own
+            await api.search_by_date(date_str=None, from_date="2024-03-01", to_date="2024-04-30")
+            samples.append(time.perf_counter() - started)
+
+    async def phase(heavy_clients):
+        deadline = time.perf_counter() + args.seconds
+        reads, heavies = [], []
+        await asyncio.gather(
+            *(reader(deadline, reads) for _ in range(args.readers)),
+            *(heavy(deadline, heavies) for _ in range(heavy_clients)),
+        )
+        return reads, heavies
+
+    baseline, _ = asyncio.run(phase(0))
+    loaded, heavy_samples = asyncio.run(phase(args.heavy))
+
+    print(json.dumps({
+        "benchmark": "read_latency",
+        "rows": args.rows,
+        "readers": args.readers,
+        "heavy_clients": args.heavy,
+        "lanes": api.db.stats(),
+        "point_reads_alone": summarize(baseline),
+        "point_reads_under_load": summarize(loaded),
+        "search_by_date": summarize(heavy_samples),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
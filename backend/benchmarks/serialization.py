@@ -0,0 +1,91 @@
+# serialization.py
+"""Rows -> JSON body for list endpoints: hand-built dicts + response_model vs row mappers + rows.dumps.
+
+    python -m benchmarks.serialization --rows 100000
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+from pydantic import TypeAdapter
+
+
+def synthetic_orders(rows):
+    start = date(2024, 1, 1)
+    return [
+        (i, i % 5000 + 1, i % 5000 + 1, (start + timedelta(days=i % 730)).isoformat(), None,
+         float(random.randint(2000, 20000)), 1000.0, 0.0, "delivered", 4000.0, None, "shirt")
+        for i in range(1, rows + 1)
+    ]
+
+
+def hand_built(row):
+    # What the handlers did before the row mappers
+    return {
+        "order_id": row[0],
+        "customer_id": row[1],
+        "measurement_id": row[2],
+        "order_date": row[3],
+        "delivery_date": row[4],
+        "total_amount": row[5],
+        "advance_payment": row[6],
+        "discount": row[7],
+        "status": row[8],
+        "balance_due": row[9],
+        "notes": row[10],
+        "garment_type": row[11]
+    }
+
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    os.environ["TAILORSHOP_DB"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+    import main as api
+    import rows
+
+    data = synthetic_orders(args.rows)
+    adapter = TypeAdapter(list[api.OrderResponse])
+
+    def validated():
+        # FastAPI validates the returned dicts against response_model, then dumps them
+        return adapter.dump_json(adapter.validate_python([hand_built(row) for row in data]))
+
+    def mapped():
+        return rows.dumps([api.order_row(row) for row in data])
+
+    before, body_before = timed(validated, args.repeat)
+    after, body_after = timed(mapped, args.repeat)
+    assert json.loads(body_before) == json.loads(body_after)
+
+    print(json.dumps({
+        "benchmark": "serialization",
+        "rows": args.rows,
+        "encoder": "orjson" if rows.orjson is not None else "json",
+        "response_model_seconds": round(before, 3),
+        "row_mapper_seconds": round(after, 3),
+        "response_model_rows_per_second": round(args.rows / before),
+        "row_mapper_rows_per_second": round(args.rows / after),
+        "speedup": round(before / after, 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+# stats.py
+"""Latency summaries shared by the benchmarks"""
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def summarize(samples):
+    """Request count and p50/p95/p99 in milliseconds for a list of durations in seconds"""
+    if not samples:
+        return {"requests": 0, "p50_ms": None, "p95_ms": None, "p99_ms": None}
+    return {
+        "requests": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+    }
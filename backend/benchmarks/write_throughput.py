@@ -0,0 +1,65 @@
+# write_throughput.py
+"""Writes per second under concurrent writers, through the group-commit writer.
+
+    python -m benchmarks.write_throughput --clients 16 --writes 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--writes", type=int, default=200, help="writes per client")
+    parser.add_argument("--profile", default="durable", help="PRAGMA profile (durable fsyncs every commit)")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ["TAILORSHOP_DB"] = os.path.join(workdir, "bench.db")
+    os.environ["TAILORSHOP_DB_PROFILE"] = args.profile
+    import main as api
+    api.init_database()  # creates the schema in the temporary database
+
+    lock_errors = 0
+    other_errors = 0
+
+    async def client(n):
+        nonlocal lock_errors, other_errors
+        for i in range(args.writes):
+            try:
+                customer = await api.create_customer(api.CustomerCreate(name=f"Writer {n}-{i}", phone_number=f"03{n:03d}{i:06d}"))
+                await api.update_customer(customer["customer_id"], api.CustomerUpdate(notes="updated"))
+            except sqlite3.OperationalError as e:
+                if "locked" in str(e) or "busy" in str(e):
+                    lock_errors += 1
+                else:
+                    other_errors += 1
+
+    async def run_clients():
+        await asyncio.gather(*(client(n) for n in range(args.clients)))
+
+    started = time.perf_counter()
+    asyncio.run(run_clients())
+    elapsed = time.perf_counter() - started
+
+    writes = args.clients * args.writes * 2
+    print(json.dumps({
+        "benchmark": "write_throughput",
+        "clients": args.clients,
+        "profile": args.profile,
+        "writes": writes,
+        "seconds": round(elapsed, 3),
+        "writes_per_second": round(writes / elapsed),
+        "lock_errors": lock_errors,
+        "other_errors": other_errors,
+        "writer": api.write_queue.stats(),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
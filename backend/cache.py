@@ -0,0 +1,116 @@
+# cache.py
+import threading
+import time
+from collections import OrderedDict
+
+
+class EntityCache:
+    """LRU + TTL cache of single customer / measurement / order responses, keyed by (entity, id).
+
+    Writers invalidate keys after their commit. Every invalidation bumps a
+    generation counter; a reader passes the generation it saw before querying
+    to put(), so a row read before a concurrent write can't be cached after it.
+
+    A writer can also hold() keys inside its transaction and release() them once
+    it has ended: held keys are dropped and neither served nor cached in between,
+    so no reader can pair the old row with the version the commit published.
+    """
+
+    def __init__(self, max_entries=2048, ttl=300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._held = {}  # (entity, id) -> number of open transactions holding it
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    def generation(self):
+        with self._lock:
+            return self._generation
+
+    def get(self, entity, entity_id):
+        """Cached value or None (expired entries count as misses)"""
+        key = (entity, entity_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or key in self._held:
+                self._misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, entity, entity_id, value, generation=None):
+        """Cache a value; skipped if anything was invalidated since `generation`"""
+        if self.max_entries <= 0:
+            return
+        key = (entity, entity_id)
+        with self._lock:
+            if generation is not None and generation != self._generation or key in self._held:
+                return
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, entity, *entity_ids):
+        with self._lock:
+            self._generation += 1
+            for entity_id in entity_ids:
+                if self._entries.pop((entity, entity_id), None) is not None:
+                    self._invalidations += 1
+
+    def hold(self, entity, *entity_ids):
+        """Drop the keys and keep them out of the cache until release()"""
+        with self._lock:
+            self._generation += 1
+            for entity_id in entity_ids:
+                key = (entity, entity_id)
+                self._held[key] = self._held.get(key, 0) + 1
+                if self._entries.pop(key, None) is not None:
+                    self._invalidations += 1
+
+    def release(self, entity, *entity_ids):
+        with self._lock:
+            # Readers that started while the keys were held may have read the old row
+            self._generation += 1
+            for entity_id in entity_ids:
+                key = (entity, entity_id)
+                if self._held[key] == 1:
+                    del self._held[key]
+                else:
+                    self._held[key] -= 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "held": len(self._held),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 3) if lookups else 0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations,
+            }
@@ -0,0 +1,274 @@
+# database.py
+import asyncio
+import contextvars
+import functools
+import queue
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+# PRAGMA profiles applied to every pooled connection.
+# "balanced" is the default for the shop server, "durable" trades write speed
+# for an fsync on every commit, "fast" is meant for imports and benchmarks.
+PRAGMA_PROFILES = {
+    "balanced": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -20000,       # ~20 MB page cache per connection
+        "mmap_size": 268435456,     # 256 MB
+        "busy_timeout": 5000,       # ms
+        "temp_store": "MEMORY",
+        "foreign_keys": "ON",
+    },
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -8000,
+        "mmap_size": 0,
+        "busy_timeout": 10000,
+        "temp_store": "DEFAULT",
+        "foreign_keys": "ON",
+    },
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "OFF",
+        "cache_size": -65536,
+        "mmap_size": 1073741824,
+        "busy_timeout": 5000,
+        "temp_store": "MEMORY",
+        "foreign_keys": "ON",
+    },
+}
+
+
+class ConnectionPool:
+    """Pool of long-lived SQLite connections shared by the worker threads"""
+
+    def __init__(self, database, max_size=8, profile="balanced", timeout=30.0, factory=sqlite3.Connection,
+                 **pragma_overrides):
+        if profile not in PRAGMA_PROFILES:
+            raise ValueError(f"Unknown PRAGMA profile '{profile}'. Must be one of: {', '.join(PRAGMA_PROFILES)}")
+        self.database = database
+        self.max_size = max_size
+        self.profile = profile
+        self.timeout = timeout
+        self.factory = factory
+        self.pragmas = {**PRAGMA_PROFILES[profile], **pragma_overrides}
+
+        # LIFO so the most recently used (warmest) connection is handed out first
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._open = 0
+        self._in_use = 0
+        self._hits = 0
+        self._misses = 0
+        self._waits = 0
+        self._wait_time = 0.0
+        self._closed = False
+
+    def _connect(self):
+        conn = sqlite3.connect(self.database, timeout=self.pragmas["busy_timeout"] / 1000,
+                               check_same_thread=False, factory=self.factory)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def acquire(self, timeout=None):
+        """Take a connection from the pool, opening a new one if below max_size.
+
+        When all max_size are in use, waits up to timeout seconds (default: the pool's).
+        """
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+        try:
+            conn = self._idle.get_nowait()
+            with self._lock:
+                self._hits += 1
+                self._in_use += 1
+            return conn
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_open = self._open < self.max_size
+            if can_open:
+                self._open += 1
+                self._misses += 1
+        if can_open:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._lock:
+                    self._open -= 1
+                raise
+            with self._lock:
+                self._in_use += 1
+            return conn
+
+        # Pool exhausted - wait for another thread to release a connection
+        started = time.perf_counter()
+        try:
+            timeout = self.timeout if timeout is None else timeout
+            conn = self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No database connection available after {timeout}s")
+        with self._lock:
+            self._waits += 1
+            self._wait_time += time.perf_counter() - started
+            self._in_use += 1
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the pool, rolling back anything left uncommitted"""
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            self._in_use -= 1
+            if self._closed:
+                self._open -= 1
+                conn.close()
+                return
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "database": self.database,
+                "profile": self.profile,
+                "max_size": self.max_size,
+                "open_connections": self._open,
+                "in_use": self._in_use,
+                "idle": self._open - self._in_use,
+                "hits": self._hits,
+                "misses": self._misses,
+                "waits": self._waits,
+                "total_wait_ms": round(self._wait_time * 1000, 3),
+            }
+
+    def close(self):
+        """Close all idle connections; busy ones are closed when released"""
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            with self._lock:
+                self._open -= 1
+
+
+class StreamSlots:
+    """Caps how many streamed responses hold a pooled connection at the same time.
+
+    take() never waits: it returns a release function, or None when every slot is
+    in use. Calling the release function more than once frees the slot only once.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self._lock = threading.Lock()
+        self._active = 0
+        self._taken = 0
+        self._rejected = 0
+
+    def take(self):
+        with self._lock:
+            if self._active >= self.size:
+                self._rejected += 1
+                return None
+            self._active += 1
+            self._taken += 1
+        released = False
+
+        def release():
+            nonlocal released
+            with self._lock:
+                if not released:
+                    released = True
+                    self._active -= 1
+        return release
+
+    def stats(self):
+        with self._lock:
+            return {"slots": self.size, "active": self._active, "taken": self._taken, "rejected": self._rejected}
+
+
+class QueryLanes:
+    """Dedicated thread lanes for blocking SQLite reads, awaited from async handlers.
+
+    Every lane is its own small executor, so slow report queries queue up behind
+    each other instead of in front of quick point lookups, and none of them use
+    the event loop's default thread pool.
+    """
+
+    def __init__(self, pool, lanes):
+        self.pool = pool
+        self._executors = {
+            name: ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"sqlite-{name}")
+            for name, workers in lanes.items()
+        }
+        self._workers = dict(lanes)
+        self._lock = threading.Lock()
+        self._queued = {name: 0 for name in lanes}
+        self._calls = {name: 0 for name in lanes}
+
+    async def call(self, lane, fn, *args):
+        """Run a blocking fn(*args) on a lane"""
+        with self._lock:
+            self._queued[lane] += 1
+        loop = asyncio.get_running_loop()
+        try:
+            # Carry the caller's context into the worker (per-request metrics)
+            job = functools.partial(contextvars.copy_context().run, fn, *args)
+            return await loop.run_in_executor(self._executors[lane], job)
+        finally:
+            with self._lock:
+                self._queued[lane] -= 1
+                self._calls[lane] += 1
+
+    def submit(self, lane, fn, *args):
+        """Queue a blocking fn(*args) on a lane without waiting - returns a concurrent Future.
+
+        Unlike call(), the job runs even if the caller is cancelled before it starts.
+        """
+        with self._lock:
+            self._calls[lane] += 1
+        return self._executors[lane].submit(contextvars.copy_context().run, fn, *args)
+
+    async def run(self, lane, fn, *args):
+        """Run fn(conn, *args) on a lane with a pooled connection"""
+        return await self.call(lane, self._with_connection, fn, *args)
+
+    def _with_connection(self, fn, *args):
+        with self.pool.connection() as conn:
+            return fn(conn, *args)
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: {"workers": self._workers[name], "pending": self._queued[name], "calls": self._calls[name]}
+                for name in self._executors
+            }
+
+    def shutdown(self):
+        for executor in self._executors.values():
+            executor.shutdown(wait=True)
+
+
+def normalize_phone(phone_number):
+    """Digits-only phone number and its reverse, as stored for indexed lookups"""
+    digits = re.sub(r"[^0-9]", "", phone_number or "")
+    return digits, digits[::-1]
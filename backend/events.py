@@ -0,0 +1,100 @@
+# events.py
+import asyncio
+import itertools
+import json
+import threading
+
+
+class Subscription:
+    """One connected client - a bounded queue of encoded SSE messages plus its filters"""
+
+    def __init__(self, entities, statuses, max_queue):
+        self.entities = entities
+        self.statuses = statuses
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.overflows = 0
+
+    def wants(self, entity, status, previous_status=None):
+        if self.entities and entity not in self.entities:
+            return False
+        # Status filters only apply to order events that carry a status. An order leaving
+        # a watched status matters as much as one entering it, so either one matches.
+        if self.statuses and entity == "order" and status is not None:
+            return status in self.statuses or previous_status in self.statuses
+        return True
+
+
+class EventBroker:
+    """Fan-out of change events to Server-Sent Events subscribers.
+
+    Each subscriber has a bounded queue. A client that falls max_queue events
+    behind gets its backlog dropped and a single "resync" event instead, so a slow
+    tablet costs a fixed amount of memory and catches up through /sync.
+    Must be used from the event loop thread.
+    """
+
+    def __init__(self, max_queue=256, max_subscribers=100):
+        self.max_queue = max_queue
+        self.max_subscribers = max_subscribers
+        self._subscribers = set()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._published = 0
+        self._delivered = 0
+        self._overflows = 0
+
+    def subscribe(self, entities=None, statuses=None):
+        """New Subscription, or None when max_subscribers are already connected"""
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            subscription = Subscription(set(entities or ()), set(statuses or ()), self.max_queue)
+            self._subscribers.add(subscription)
+            return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, entity, action, entity_id, data=None, status=None, previous_status=None):
+        """Queue an event for every matching subscriber - never blocks"""
+        with self._lock:
+            subscribers = [s for s in self._subscribers if s.wants(entity, status, previous_status)]
+            self._published += 1
+        if not subscribers:
+            return
+        event_id = next(self._ids)
+        payload = {"entity": entity, "action": action, "id": entity_id}
+        if data is not None:
+            payload["data"] = data
+        # Encoded once and shared by every subscriber
+        message = f"id: {event_id}\nevent: {entity}\ndata: {json.dumps(payload, default=str)}\n\n"
+        delivered = 0
+        for subscription in subscribers:
+            try:
+                subscription.queue.put_nowait(message)
+                delivered += 1
+            except asyncio.QueueFull:
+                self._resync(subscription, event_id)
+        with self._lock:
+            self._delivered += delivered
+
+    def _resync(self, subscription, event_id):
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.queue.put_nowait(f"id: {event_id}\nevent: resync\ndata: {{}}\n\n")
+        subscription.overflows += 1
+        with self._lock:
+            self._overflows += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "max_subscribers": self.max_subscribers,
+                "max_queue": self.max_queue,
+                "queued": sum(s.queue.qsize() for s in self._subscribers),
+                "published": self._published,
+                "delivered": self._delivered,
+                "overflows": self._overflows,
+            }
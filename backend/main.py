@@ -1,12 +1,46 @@
 # main.py
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+import asyncio
+import codecs
+import collections
+import csv
+import io
+import itertools
+import json
+import os
+import re
 import sqlite3
-from pydantic import BaseModel
-from typing import Optional
-from datetime import date, datetime
+import threading
+import time
+import weakref
+import zlib
+from contextlib import asynccontextmanager
+from pydantic import BaseModel, ValidationError
+from typing import Literal, Optional
+from datetime import date, datetime, timedelta
 from fastapi.middleware.cors import CORSMiddleware
+from database import ConnectionPool, QueryLanes, StreamSlots, normalize_phone
+from migrations import (CUSTOMER_COLUMNS, EXPECTED_INDEXES, GARMENT_TYPES, HOT_QUERIES, MEASUREMENT_COLUMNS,
+                        OPEN_ORDER_STATUSES, ORDER_COLUMNS, ORDER_STATUSES, SCHEMA_VERSION, WORKLOAD_COLUMNS,
+                        get_schema_version, migrate)
+from writer import WriteQueue
+from cache import EntityCache
+from events import EventBroker
+from rows import TimedJSONResponse, iso_timestamp, json_response, row_mapper
+from metrics import InstrumentedConnection, Metrics, MetricsMiddleware
+from slowlog import SlowQueryLog
+import similar
+import analytics
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    """Schema check and warm-up before the first request, a clean stop after the last"""
+    startup()
+    yield
+    shutdown()
+
+app = FastAPI(lifespan=lifespan, default_response_class=TimedJSONResponse)
 
 # Add CORS middleware
 app.add_middleware(
@@ -15,10 +49,62 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods including OPTIONS
     allow_headers=["*"],
+    expose_headers=["X-Next-After-Id", "Content-Disposition", "ETag", "X-Missing-Ids"],  # Pagination cursor, export filenames, validators, batch misses
 )
 
 # Database initialization
-DATABASE_NAME = "tailorshop.db"
+DATABASE_NAME = os.environ.get("TAILORSHOP_DB", "tailorshop.db")
+DB_PROFILE = os.environ.get("TAILORSHOP_DB_PROFILE", "balanced")
+DB_READ_WORKERS = int(os.environ.get("TAILORSHOP_READ_WORKERS", "4"))
+DB_REPORT_WORKERS = int(os.environ.get("TAILORSHOP_REPORT_WORKERS", "2"))
+DB_STREAMS = int(os.environ.get("TAILORSHOP_STREAMS", "2"))  # NDJSON lists and exports streaming at once
+# One connection per lane worker, one for the writer, the rest for streaming exports
+DB_POOL_SIZE = int(os.environ.get("TAILORSHOP_DB_POOL_SIZE", str(DB_READ_WORKERS + DB_REPORT_WORKERS + 1 + DB_STREAMS)))
+DB_WRITE_WINDOW_MS = float(os.environ.get("TAILORSHOP_WRITE_WINDOW_MS", "1"))
+CACHE_SIZE = int(os.environ.get("TAILORSHOP_CACHE_SIZE", "2048"))  # 0 disables the entity cache
+CACHE_TTL = float(os.environ.get("TAILORSHOP_CACHE_TTL", "300"))  # seconds
+EVENT_QUEUE_SIZE = int(os.environ.get("TAILORSHOP_EVENT_QUEUE", "256"))  # buffered events per client
+EVENT_MAX_SUBSCRIBERS = int(os.environ.get("TAILORSHOP_EVENT_SUBSCRIBERS", "100"))
+EVENT_HEARTBEAT_SECONDS = 15
+WARM_RECENT_ORDERS = int(os.environ.get("TAILORSHOP_WARM_ORDERS", "200"))  # 0 skips the entity cache warm-up
+WARM_HOT_QUERY_ROWS = 1000  # rows stepped per hot query at startup
+METRICS_ENABLED = os.environ.get("TAILORSHOP_METRICS", "1") != "0"  # 0 removes the middleware and SQL timing
+SLOW_QUERY_MS = float(os.environ.get("TAILORSHOP_SLOW_QUERY_MS", "200"))  # 0 disables the slow query log
+
+# Statements over the threshold are logged with their plan and aggregated for /db/slow-queries
+slow_queries = SlowQueryLog(threshold=SLOW_QUERY_MS / 1000)
+if SLOW_QUERY_MS > 0:
+    InstrumentedConnection.slow_log = slow_queries
+
+# Long-lived connections shared by all request handlers
+pool = ConnectionPool(DATABASE_NAME, max_size=DB_POOL_SIZE, profile=DB_PROFILE,
+                      factory=InstrumentedConnection if METRICS_ENABLED or SLOW_QUERY_MS > 0 else sqlite3.Connection)
+
+# A stream holds its connection until the client has read everything, so streams only
+# get the connections left over after the lanes and the writer - never the lanes' own
+stream_slots = StreamSlots(max(0, min(DB_STREAMS, DB_POOL_SIZE - DB_READ_WORKERS - DB_REPORT_WORKERS - 1)))
+
+# Reads run on their own lanes: "read" for point lookups and list pages,
+# "report" for searches, reports and exports that scan many rows
+db = QueryLanes(pool, {"read": DB_READ_WORKERS, "report": DB_REPORT_WORKERS})
+
+# Row -> response dict, built once per table - rows must be selected with the column lists from migrations
+customer_row = row_mapper(CUSTOMER_COLUMNS, {"created_at": iso_timestamp})
+# The search endpoints have no response model and always returned created_at as SQLite stores it
+search_customer_row = row_mapper(CUSTOMER_COLUMNS)
+measurement_row = row_mapper(MEASUREMENT_COLUMNS)
+order_row = row_mapper(ORDER_COLUMNS)
+
+# Delivery workload planner
+WORKLOAD_DEFAULT_DAYS = 7
+WORKLOAD_MAX_DAYS = 92
+
+# List endpoint paging
+LIST_PAGE_MAX = 1000
+STREAM_BATCH_SIZE = 500
+
+# Bulk import - rows per transaction
+IMPORT_CHUNK_SIZE = 500
 
 # Pydantic Models
 class CustomerCreate(BaseModel):
@@ -106,134 +192,479 @@ class OrderUpdate(BaseModel):
     garment_type: Optional[str] = None
 
 def init_database():
-    """Initialize database with all tables"""
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    
-    # Create CUSTOMER table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS CUSTOMER (
-            customer_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            phone_number TEXT NOT NULL,
-            address TEXT,
-            notes TEXT,
-            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Create MEASUREMENT table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS MEASUREMENT (
-            measurement_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            customer_id INTEGER NOT NULL,
-            measurement_date DATE NOT NULL,
-            garment_type TEXT NOT NULL CHECK(garment_type IN ('2-piece', '3-piece', 'prince-coat', 'shirt', 'pants', 'coat')),
-            chest REAL,
-            waist REAL,
-            length REAL,
-            shoulder REAL,
-            arm_length REAL,
-            arm_opening REAL,
-            neck REAL,
-            shalwar_length REAL,
-            shalwar_bottom REAL,
-            kamee_length REAL,
-            hip REAL,
-            kurta_length REAL,
-            attribute TEXT,
-            pajama_length REAL,
-            pajama_bottom REAL,
-            FOREIGN KEY (customer_id) REFERENCES CUSTOMER(customer_id) ON DELETE CASCADE
-        )
-    ''')
-    
-    # Create ORDER table (quoted because ORDER is a SQL keyword)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS "ORDER" (
-            order_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            customer_id INTEGER NOT NULL,
-            measurement_id INTEGER NOT NULL,
-            order_date DATE NOT NULL DEFAULT CURRENT_DATE,
-            delivery_date DATE,
-            total_amount REAL NOT NULL,
-            advance_payment REAL DEFAULT 0,
-            discount REAL DEFAULT 0,
-            status TEXT NOT NULL DEFAULT 'order-book' 
-                CHECK(status IN ('order-book', 'cutting', 'stitching', 'ready-to-deliver', 'delivered')),
-            balance_due REAL GENERATED ALWAYS AS (total_amount - advance_payment - discount) VIRTUAL,
-            notes TEXT,
-            garment_type TEXT NOT NULL,
-            FOREIGN KEY (customer_id) REFERENCES CUSTOMER(customer_id) ON DELETE CASCADE,
-            FOREIGN KEY (measurement_id) REFERENCES MEASUREMENT(measurement_id)
-        )
-    ''')
-    
-    conn.commit()
-    conn.close()
-    print(f"Database '{DATABASE_NAME}' initialized successfully")
+    """Check the schema version - migrations only run when the database is behind this code"""
+    with pool.connection() as conn:
+        version = get_schema_version(conn)
+        if version > SCHEMA_VERSION:
+            raise RuntimeError(f"Database '{DATABASE_NAME}' is at schema version {version}, "
+                               f"newer than this server ({SCHEMA_VERSION})")
+        if version < SCHEMA_VERSION:
+            for version, description in migrate(conn):
+                print(f"Applied migration {version}: {description}")
+    return version
+
+def warm_up():
+    """Open the lane connections and fill their page caches and the entity cache.
+
+    Each lane connection steps the hot queries (prepared statements plus the pages
+    their sample reads), the indexes the range searches probe are read whole once, and
+    the most recent orders and their customers and measurements are cached - the rows
+    the shop opens first after a restart.
+    """
+    connections = [pool.acquire() for _ in range(min(DB_READ_WORKERS + DB_REPORT_WORKERS, pool.max_size))]
+    try:
+        for conn in connections:
+            for sql, params in HOT_QUERIES.values():
+                # Past the LIMIT of every paged query, but not through whole tables
+                cursor = conn.execute(sql, params)
+                cursor.fetchmany(WARM_HOT_QUERY_ROWS)
+                cursor.close()
+
+        conn = connections[0]
+        # A search's first probe lands anywhere in its index; reading each one through
+        # brings it into the OS page cache (shared by every connection) in one pass
+        indexes = sorted(set(EXPECTED_INDEXES.values()))
+        for index in indexes:
+            table, = conn.execute("SELECT tbl_name FROM sqlite_master WHERE type = 'index' AND name = ?",
+                                  (index,)).fetchone()
+            column, = conn.execute('SELECT name FROM pragma_index_info(?) WHERE seqno = 0', (index,)).fetchone()
+            conn.execute(f'SELECT count({column}) FROM "{table}" INDEXED BY {index}').fetchone()
+
+        conn = connections[0]
+        generation = entity_cache.generation()
+        orders = conn.execute(f'SELECT {ORDER_COLUMNS} FROM "ORDER" ORDER BY order_id DESC LIMIT ?',
+                              (WARM_RECENT_ORDERS,)).fetchall()
+        customer_ids = sorted({row[1] for row in orders})
+        measurement_ids = sorted({row[2] for row in orders})
+        placeholders = ", ".join("?" * len(customer_ids))
+        customers = conn.execute(f'SELECT {CUSTOMER_COLUMNS} FROM CUSTOMER WHERE customer_id IN ({placeholders})',
+                                 customer_ids).fetchall() if customer_ids else []
+        placeholders = ", ".join("?" * len(measurement_ids))
+        measurements = conn.execute(f'SELECT {MEASUREMENT_COLUMNS} FROM MEASUREMENT WHERE measurement_id IN ({placeholders})',
+                                    measurement_ids).fetchall() if measurement_ids else []
+    finally:
+        for conn in connections:
+            pool.release(conn)
+
+    for row in customers:
+        entity_cache.put("customer", row[0], customer_row(row), generation)
+    for row in measurements:
+        entity_cache.put("measurement", row[0], measurement_row(row), generation)
+    for row in orders:
+        entity_cache.put("order", row[0], order_row(row), generation)
+    return {"orders": len(orders), "customers": len(customers), "measurements": len(measurements),
+            "indexes": len(indexes)}
+
+def startup():
+    """Schema check, writer start and warm-up - timings are kept for /db/startup"""
+    started = time.perf_counter()
+    schema_version = init_database()
+    schema_ms = (time.perf_counter() - started) * 1000
+    warmed = warm_up() if WARM_RECENT_ORDERS > 0 else None
+    write_queue.start()
+    total_ms = (time.perf_counter() - started) * 1000
+    startup_report.update({
+        "schema_version": schema_version,
+        "schema_check_ms": round(schema_ms, 3),
+        "warm_up_ms": round(total_ms - schema_ms, 3),
+        "warmed": warmed,
+        "total_ms": round(total_ms, 3),
+    })
+    print(f"Database '{DATABASE_NAME}' ready at schema version {schema_version} in {total_ms:.1f} ms "
+          f"(schema check {schema_ms:.1f} ms)")
+
+def shutdown():
+    """Drain the writer, let SQLite refresh its statistics, then close every connection"""
+    write_queue.close()
+    with pool.connection() as conn:
+        conn.execute('PRAGMA optimize')
+    db.shutdown()
+    pool.close()
+
+startup_report = {}
+
+# Every INSERT/UPDATE/DELETE goes through this single writer (group commit)
+write_queue = WriteQueue(pool, window=DB_WRITE_WINDOW_MS / 1000)
+
+# Single customer / measurement / order responses, invalidated by the write handlers
+entity_cache = EntityCache(max_entries=CACHE_SIZE, ttl=CACHE_TTL)
+
+def invalidate_on_commit(entity, *entity_ids):
+    """From inside a write job: drop the cached entries and keep them uncached until the
+    transaction has ended, so no GET pairs the old row with the ETag the commit bumps"""
+    entity_cache.hold(entity, *entity_ids)
+    write_queue.after_transaction(entity_cache.release, entity, *entity_ids)
+
+# Nearest-measurement search for /measurements/{id}/similar, built on first use
+measurement_index = similar.MeasurementIndex()
+
+# Columnar copy of MEASUREMENT behind /analytics/sizes, refreshed from change_seq on use
+size_distribution = analytics.SizeDistribution()
+
+# Change events pushed to /events subscribers after each commit
+event_broker = EventBroker(max_queue=EVENT_QUEUE_SIZE, max_subscribers=EVENT_MAX_SUBSCRIBERS)
+
+# Per-route latency and SQL counters served at /metrics. Added last so it wraps
+# CORS too and times the whole request.
+metrics = Metrics()
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware, metrics=metrics)
+    metrics.gauge("tailorshop_db_pool_in_use", "Pooled connections checked out", lambda: pool.stats()["in_use"])
+    metrics.gauge("tailorshop_db_writer_queued", "Write jobs waiting for the writer", lambda: write_queue.stats()["queued"])
+    metrics.gauge("tailorshop_events_subscribers", "Connected /events clients",
+                  lambda: event_broker.stats()["subscribers"])
+
+def keyset_query(table, key_column, after_id=None, limit=None, columns="*"):
+    """Build a keyset page query - newest first, continuing below after_id"""
+    query = f'SELECT {columns} FROM {table}'
+    params = []
+    if after_id is not None:
+        query += f' WHERE {key_column} < ?'
+        params.append(after_id)
+    query += f' ORDER BY {key_column} DESC'
+    if limit is not None:
+        query += ' LIMIT ?'
+        params.append(limit)
+    return query, params
+
+async def fetch_all(query, params=(), lane="read"):
+    """Run a SELECT on a read lane and return all rows"""
+    return await db.run(lane, lambda conn: conn.execute(query, params).fetchall())
+
+async def fetch_one(query, params=(), lane="read"):
+    """Run a SELECT on a read lane and return the first row (or None)"""
+    return await db.run(lane, lambda conn: conn.execute(query, params).fetchone())
+
+async def table_etag(request, *tables):
+    """Weak ETag from the tables' change counters and the request URL - reads no row data.
+
+    Taken before the rows are read, so a write in between only makes the next poll refetch.
+    """
+    placeholders = ", ".join("?" * len(tables))
+    rows = await fetch_all(f'SELECT version FROM TABLE_VERSION WHERE table_name IN ({placeholders}) '
+                           'ORDER BY table_name', tables)
+    versions = ".".join(str(row[0]) for row in rows)
+    url = request.url.path + "?" + request.url.query
+    return f'W/"{versions}-{zlib.crc32(url.encode()):08x}"'
+
+def etag_matches(request, etag):
+    """True when the client's If-None-Match already holds this ETag"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag.removeprefix("W/") in tags
+
+def not_modified(etag):
+    return Response(status_code=304, headers={"ETag": etag})
 
-# Initialize database on startup
-init_database()
+def set_next_cursor(headers, rows, limit):
+    """Tell the client where the next page starts (only when this page is full)"""
+    if limit is not None and len(rows) == limit:
+        headers["X-Next-After-Id"] = str(rows[-1][0])
+
+def parse_ids(value):
+    """Comma-separated ids ("3,1,2") -> unique ints in the order given, or 400"""
+    try:
+        ids = [int(part) for part in value.split(",") if part.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+    ids = list(dict.fromkeys(ids))
+    if not ids:
+        raise HTTPException(status_code=400, detail="ids must list at least one id")
+    if len(ids) > LIST_PAGE_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {LIST_PAGE_MAX} ids per request")
+    return ids
+
+async def fetch_by_ids(entity, table, key_column, columns, mapper, ids):
+    """Response dicts for ids in the order given, from the entity cache or one IN query.
+
+    Ids that do not exist are left out and returned separately.
+    """
+    found = {}
+    for entity_id in ids:
+        cached = entity_cache.get(entity, entity_id)
+        if cached is not None:
+            found[entity_id] = cached
+    missing = [entity_id for entity_id in ids if entity_id not in found]
+    if missing:
+        generation = entity_cache.generation()
+        rows = await fetch_all(f'SELECT {columns} FROM {table} WHERE {key_column} IN ({", ".join("?" * len(missing))})',
+                               missing)
+        for row in rows:
+            result = found[row[0]] = mapper(row)
+            entity_cache.put(entity, row[0], result, generation)
+    return [found[entity_id] for entity_id in ids if entity_id in found], \
+        [entity_id for entity_id in ids if entity_id not in found]
+
+async def get_by_ids(entity, table, key_column, columns, mapper, ids, etag, after_id, limit, stream):
+    """The ?ids= form of a list endpoint - ids that were not found are named in X-Missing-Ids"""
+    if after_id is not None or limit is not None or stream:
+        raise HTTPException(status_code=400, detail="ids cannot be combined with after_id, limit or stream")
+    results, missing = await fetch_by_ids(entity, table, key_column, columns, mapper, parse_ids(ids))
+    headers = {"ETag": etag}
+    if missing:
+        headers["X-Missing-Ids"] = ",".join(map(str, missing))
+    return json_response(results, headers)
+
+def open_row_batches(query, params):
+    """Row batches for a streamed response, holding one of the stream slots - 503 when all are taken.
+
+    Call it from the handler, before the response starts, so the 503 can still be sent.
+    """
+    release = stream_slots.take()
+    if release is None:
+        raise HTTPException(status_code=503, detail="Too many exports in progress, try again shortly",
+                            headers={"Retry-After": "5"})
+    stream = RowStream(release)
+    batches = iter_row_batches(query, params, stream)
+    # A stream dropped before its first chunk, or left suspended when the client went
+    # away, may never run its finally - collecting it closes the stream instead
+    weakref.finalize(batches, db.submit, "report", stream.close)
+    return batches
+
+class RowStream:
+    """Connection and cursor of one streamed response, only used from the report lane.
+
+    Each step holds the lock, so close() - which also runs when the client goes away
+    mid-stream - waits for a fetch still running on a lane thread instead of closing
+    the cursor under it and handing its connection to another request. Closing twice
+    is harmless.
+    """
+
+    def __init__(self, release):
+        self.release = release
+        self.conn = None
+        self.cursor = None
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def open(self, query, params):
+        with self._lock:
+            if self.closed:
+                return None
+            # The stream slot guarantees a free connection - never wait for one on a lane thread
+            self.conn = pool.acquire(0)
+            self.cursor = self.conn.execute(query, params)
+            return [column[0] for column in self.cursor.description]
+
+    def fetch(self):
+        with self._lock:
+            return [] if self.closed else self.cursor.fetchmany(STREAM_BATCH_SIZE)
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+            try:
+                # Finalize the statement before the connection is reused
+                if self.cursor is not None:
+                    self.cursor.close()
+                if self.conn is not None:
+                    pool.release(self.conn)
+            finally:
+                self.conn = self.cursor = None
+                self.release()
+
+async def iter_row_batches(query, params, stream):
+    """Yield (columns, rows) straight from the cursor, STREAM_BATCH_SIZE rows at a time.
+
+    The first batch is always yielded, even when empty, so callers get the column names.
+    Every step runs on the report lane; the connection is held for the whole stream
+    and released, with the stream slot, when it ends.
+    """
+    try:
+        columns = await db.call("report", stream.open, query, params)
+        rows = await db.call("report", stream.fetch)
+        yield columns, rows
+        while rows:
+            rows = await db.call("report", stream.fetch)
+            if rows:
+                yield columns, rows
+    finally:
+        # Also runs when the client disconnects mid-stream. Submitted rather than called, so
+        # the close runs (after any fetch in flight) even if this generator is cancelled again
+        closing = db.submit("report", stream.close)
+        await asyncio.shield(asyncio.wrap_future(closing))
+
+def stream_ndjson(query, params):
+    """Rows as NDJSON, one chunk per cursor batch (takes a stream slot right away)"""
+    return ndjson_chunks(open_row_batches(query, params))
+
+def stream_csv(query, params):
+    """Rows as CSV with a header line, one chunk per cursor batch (takes a stream slot right away)"""
+    return csv_chunks(open_row_batches(query, params))
+
+async def ndjson_chunks(batches):
+    async for columns, rows in batches:
+        yield "".join(json.dumps(dict(zip(columns, row))) + "\n" for row in rows)
+
+async def csv_chunks(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    header_written = False
+    async for columns, rows in batches:
+        if not header_written:
+            writer.writerow(columns)
+            header_written = True
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+async def stream_gzip(chunks):
+    """Gzip a stream of text chunks without buffering the whole body"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 writes a gzip header
+    async for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
 
 @app.get("/")
-def test_endpoint():
+async def test_endpoint():
     return {"message": "Tailor Management System API is working"}
 
 @app.get("/test-db")
-def test_database():
+async def test_database():
     """Test database connection"""
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute("SELECT 'Database connected successfully'")
-    result = cursor.fetchone()
-    conn.close()
+    result = await fetch_one("SELECT 'Database connected successfully'")
     return {"database_test": result[0]}
 
+@app.get("/db/pool")
+async def get_pool_stats():
+    """Connection pool statistics - used to size TAILORSHOP_DB_POOL_SIZE"""
+    return {**pool.stats(), "streams": stream_slots.stats()}
+
+@app.get("/db/writer")
+async def get_writer_stats():
+    """Group-commit writer statistics"""
+    return write_queue.stats()
+
+@app.get("/db/cache")
+async def get_cache_stats():
+    """Entity cache hit/miss/eviction counters"""
+    return entity_cache.stats()
+
+@app.get("/db/events")
+async def get_event_stats():
+    """Push channel subscriber and overflow counters"""
+    return event_broker.stats()
+
+@app.get("/db/lanes")
+async def get_lane_stats():
+    """Read lane statistics - used to size TAILORSHOP_READ_WORKERS / TAILORSHOP_REPORT_WORKERS"""
+    return db.stats()
+
+@app.get("/db/startup")
+async def get_startup_report():
+    """Schema check and warm-up timings of the last startup"""
+    return startup_report
+
+@app.get("/db/slow-queries")
+async def get_slow_queries(
+    limit: int = Query(20, ge=1, le=200),
+    sort: Literal["total", "max", "count"] = "total"
+):
+    """Slowest query fingerprints since startup (or the last reset)"""
+    if SLOW_QUERY_MS <= 0:
+        raise HTTPException(status_code=404, detail="Slow query log is disabled (TAILORSHOP_SLOW_QUERY_MS=0)")
+    key = {"total": "total_seconds", "max": "max_seconds", "count": "count"}[sort]
+    return {**slow_queries.stats(), "queries": slow_queries.top(limit, key)}
+
+@app.delete("/db/slow-queries")
+async def reset_slow_queries():
+    """Forget the aggregated slow queries"""
+    slow_queries.clear()
+    return {"message": "Slow query log cleared"}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Prometheus scrape endpoint"""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (TAILORSHOP_METRICS=0)")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/customers/", response_model=list[CustomerResponse])
-def get_all_customers():
+async def get_all_customers(
+    request: Request,
+    after_id: Optional[int] = Query(None, description="Return rows with an id below this cursor"),
+    limit: Optional[int] = Query(None, ge=1, le=LIST_PAGE_MAX),
+    stream: bool = Query(False, description="Stream rows as NDJSON instead of a JSON list"),
+    ids: Optional[str] = Query(None, description="Comma-separated ids to fetch instead of a page, e.g. 1,2,3")
+):
     """Get all customers - matches frontend API.customers.getAll()"""
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM CUSTOMER ORDER BY customer_id DESC')
-    rows = cursor.fetchall()
-    conn.close()
-    
-    return [{
-        "customer_id": row[0],
-        "name": row[1],
-        "phone_number": row[2],
-        "address": row[3],
-        "notes": row[4],
-        "created_at": row[5]
-    } for row in rows]
+    etag = await table_etag(request, "CUSTOMER")
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    if ids is not None:
+        return await get_by_ids("customer", 'CUSTOMER', 'customer_id', CUSTOMER_COLUMNS, customer_row,
+                                ids, etag, after_id, limit, stream)
+
+    query, params = keyset_query('CUSTOMER', 'customer_id', after_id, limit, CUSTOMER_COLUMNS)
+    if stream:
+        return StreamingResponse(stream_ndjson(query, params), media_type="application/x-ndjson",
+                                 headers={"ETag": etag})
+
+    rows = await fetch_all(query, params)
+    headers = {"ETag": etag}
+    set_next_cursor(headers, rows, limit)
+    return json_response([customer_row(row) for row in rows], headers)
 
 @app.get("/customers/{customer_id}", response_model=CustomerResponse)
-def get_customer(customer_id: int):
+async def get_customer(customer_id: int, request: Request):
     """Get single customer by ID - matches frontend API.customers.getById()"""
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM CUSTOMER WHERE customer_id = ?', (customer_id,))
-    row = cursor.fetchone()
-    conn.close()
+    etag = await table_etag(request, "CUSTOMER")
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    headers = {"ETag": etag}
+
+    cached = entity_cache.get("customer", customer_id)
+    if cached is not None:
+        return json_response(cached, headers)
+
+    generation = entity_cache.generation()
+    row = await fetch_one(f'SELECT {CUSTOMER_COLUMNS} FROM CUSTOMER WHERE customer_id = ?', (customer_id,))
 
     if not row:
         raise HTTPException(status_code=404, detail="Customer not found")
 
-    return {
-        "customer_id": row[0],
-        "name": row[1],
-        "phone_number": row[2],
-        "address": row[3],
-        "notes": row[4],
-        "created_at": row[5]
-    }
+    result = customer_row(row)
+    entity_cache.put("customer", customer_id, result, generation)
+    return json_response(result, headers)
+
+@app.get("/customers/{customer_id}/profile")
+async def get_customer_profile(customer_id: int, request: Request):
+    """Customer with all their measurements and orders - three indexed queries on one snapshot"""
+    etag = await table_etag(request, "CUSTOMER", "MEASUREMENT", "ORDER")
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    def read(conn):
+        conn.execute('BEGIN')
+        try:
+            customer = conn.execute(f'SELECT {CUSTOMER_COLUMNS} FROM CUSTOMER WHERE customer_id = ?',
+                                    (customer_id,)).fetchone()
+            if customer is None:
+                return None, [], []
+            measurements = conn.execute(f'SELECT {MEASUREMENT_COLUMNS} FROM MEASUREMENT WHERE customer_id = ? '
+                                        'ORDER BY measurement_date DESC, measurement_id DESC', (customer_id,)).fetchall()
+            orders = conn.execute(f'SELECT {ORDER_COLUMNS} FROM "ORDER" WHERE customer_id = ? ORDER BY order_id DESC',
+                                  (customer_id,)).fetchall()
+        finally:
+            conn.rollback()
+        return customer, measurements, orders
+
+    customer, measurements, orders = await db.run("read", read)
+    if customer is None:
+        raise HTTPException(status_code=404, detail="Customer not found")
+    return json_response({
+        "customer": customer_row(customer),
+        "measurements": [measurement_row(row) for row in measurements],
+        "orders": [order_row(row) for row in orders]
+    }, {"ETag": etag})
 
 @app.put("/customers/{customer_id}", response_model=CustomerResponse)
-def update_customer(customer_id: int, customer: CustomerUpdate):
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    
+async def update_customer(customer_id: int, customer: CustomerUpdate):
     # Build dynamic update query
     updates = []
     values = []
@@ -245,118 +676,110 @@ def update_customer(customer_id: int, customer: CustomerUpdate):
     if not updates:
         raise HTTPException(status_code=400, detail="No fields to update")
     
+    # Keep the normalized lookup columns in step with phone_number
+    if customer.phone_number is not None:
+        updates += ["phone_digits = ?", "phone_digits_reversed = ?"]
+        values += list(normalize_phone(customer.phone_number))
+    
     values.append(customer_id)
     query = f"UPDATE CUSTOMER SET {', '.join(updates)} WHERE customer_id = ?"
-    cursor.execute(query, values)
-    conn.commit()
-    
-    # Get updated customer
-    cursor.execute('SELECT * FROM CUSTOMER WHERE customer_id = ?', (customer_id,))
-    row = cursor.fetchone()
-    conn.close()
-    
+
+    def write(conn):
+        invalidate_on_commit("customer", customer_id)
+        cursor = conn.cursor()
+        cursor.execute(query, values)
+
+        # Get updated customer
+        cursor.execute(f'SELECT {CUSTOMER_COLUMNS} FROM CUSTOMER WHERE customer_id = ?', (customer_id,))
+        return cursor.fetchone()
+
+    row = await write_queue.run(write)
+
     if not row:
         raise HTTPException(status_code=404, detail="Customer not found")
     
-    return {
-        "customer_id": row[0],
-        "name": row[1],
-        "phone_number": row[2],
-        "address": row[3],
-        "notes": row[4],
-        "created_at": row[5]
-    }
+    result = customer_row(row)
+    event_broker.publish("customer", "updated", customer_id, result)
+    return result
 
 @app.delete("/customers/{customer_id}")
-def delete_customer(customer_id: int):
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM CUSTOMER WHERE customer_id = ?', (customer_id,))
-    conn.commit()
-    deleted = cursor.rowcount
-    conn.close()
-    
+async def delete_customer(customer_id: int):
+    def write(conn):
+        cursor = conn.cursor()
+        # ON DELETE CASCADE removes these too - collect them so their cache entries go as well
+        cursor.execute('SELECT measurement_id FROM MEASUREMENT WHERE customer_id = ?', (customer_id,))
+        measurement_ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute('SELECT order_id, status FROM "ORDER" WHERE customer_id = ?', (customer_id,))
+        orders = cursor.fetchall()
+        cursor.execute('DELETE FROM CUSTOMER WHERE customer_id = ?', (customer_id,))
+        invalidate_on_commit("customer", customer_id)
+        invalidate_on_commit("measurement", *measurement_ids)
+        invalidate_on_commit("order", *(order_id for order_id, _ in orders))
+        return cursor.rowcount, measurement_ids, orders
+
+    deleted, measurement_ids, orders = await write_queue.run(write)
+    measurement_index.remove(*measurement_ids)
+
     if deleted == 0:
         raise HTTPException(status_code=404, detail="Customer not found")
+
+    event_broker.publish("customer", "deleted", customer_id)
+    for measurement_id in measurement_ids:
+        event_broker.publish("measurement", "deleted", measurement_id)
+    for order_id, status in orders:
+        event_broker.publish("order", "deleted", order_id, status=status)
     
     return {"message": "Customer deleted successfully"}
 
 @app.get("/measurements/", response_model=list[MeasurementResponse])
-def get_all_measurements():
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM MEASUREMENT ORDER BY measurement_id DESC')
-    rows = cursor.fetchall()
-    conn.close()
-    
-    return [{
-        "measurement_id": row[0],
-        "customer_id": row[1],
-        "measurement_date": row[2],
-        "garment_type": row[3],
-        "chest": row[4],
-        "waist": row[5],
-        "length": row[6],
-        "shoulder": row[7],
-        "arm_length": row[8],
-        "arm_opening": row[9],
-        "neck": row[10],
-        "shalwar_length": row[11],
-        "shalwar_bottom": row[12],
-        "kamee_length": row[13],
-        "hip": row[14],
-        "kurta_length": row[15],
-        "attribute": row[16],
-        "pajama_length": row[17],
-        "pajama_bottom": row[18]
-    } for row in rows]
+async def get_all_measurements(
+    request: Request,
+    after_id: Optional[int] = Query(None, description="Return rows with an id below this cursor"),
+    limit: Optional[int] = Query(None, ge=1, le=LIST_PAGE_MAX),
+    stream: bool = Query(False, description="Stream rows as NDJSON instead of a JSON list"),
+    ids: Optional[str] = Query(None, description="Comma-separated ids to fetch instead of a page, e.g. 1,2,3")
+):
+    etag = await table_etag(request, "MEASUREMENT")
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    if ids is not None:
+        return await get_by_ids("measurement", 'MEASUREMENT', 'measurement_id', MEASUREMENT_COLUMNS, measurement_row,
+                                ids, etag, after_id, limit, stream)
+
+    query, params = keyset_query('MEASUREMENT', 'measurement_id', after_id, limit, MEASUREMENT_COLUMNS)
+    if stream:
+        return StreamingResponse(stream_ndjson(query, params), media_type="application/x-ndjson",
+                                 headers={"ETag": etag})
+
+    rows = await fetch_all(query, params)
+    headers = {"ETag": etag}
+    set_next_cursor(headers, rows, limit)
+    return json_response([measurement_row(row) for row in rows], headers)
 
 @app.get("/measurements/{measurement_id}", response_model=MeasurementResponse)
-def get_measurement(measurement_id: int):
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM MEASUREMENT WHERE measurement_id = ?', (measurement_id,))
-    row = cursor.fetchone()
-    conn.close()
+async def get_measurement(measurement_id: int, request: Request):
+    etag = await table_etag(request, "MEASUREMENT")
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    headers = {"ETag": etag}
+
+    cached = entity_cache.get("measurement", measurement_id)
+    if cached is not None:
+        return json_response(cached, headers)
+
+    generation = entity_cache.generation()
+    row = await fetch_one(f'SELECT {MEASUREMENT_COLUMNS} FROM MEASUREMENT WHERE measurement_id = ?', (measurement_id,))
     
     if not row:
         raise HTTPException(status_code=404, detail="Measurement not found")
     
-    return MeasurementResponse(**{
-        "measurement_id": row[0],
-        "customer_id": row[1],
-        "measurement_date": row[2],
-        "garment_type": row[3],
-        "chest": row[4],
-        "waist": row[5],
-        "length": row[6],
-        "shoulder": row[7],
-        "arm_length": row[8],
-        "arm_opening": row[9],
-        "neck": row[10],
-        "shalwar_length": row[11],
-        "shalwar_bottom": row[12],
-        "kamee_length": row[13],
-        "hip": row[14],
-        "kurta_length": row[15],
-        "attribute": row[16],
-        "pajama_length": row[17],
-        "pajama_bottom": row[18]
-    })
+    result = measurement_row(row)
+    entity_cache.put("measurement", measurement_id, result, generation)
+    return json_response(result, headers)
 
 @app.put("/measurements/{measurement_id}", response_model=MeasurementResponse)
-def update_measurement(measurement_id: int, measurement: MeasurementUpdate):
+async def update_measurement(measurement_id: int, measurement: MeasurementUpdate):
     """Update measurement - matches frontend API.measurements.update()"""
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-
-    # Check measurement exists
-    cursor.execute('SELECT * FROM MEASUREMENT WHERE measurement_id = ?', (measurement_id,))
-    row = cursor.fetchone()
-    if not row:
-        conn.close()
-        raise HTTPException(status_code=404, detail="Measurement not found")
-
     # Build dynamic update query
     updates = []
     values = []
@@ -366,121 +789,132 @@ def update_measurement(measurement_id: int, measurement: MeasurementUpdate):
 
     values.append(measurement_id)
     query = f"UPDATE MEASUREMENT SET {', '.join(updates)} WHERE measurement_id = ?"
-    cursor.execute(query, values)
-    conn.commit()
 
-    # Get updated measurement
-    cursor.execute('SELECT * FROM MEASUREMENT WHERE measurement_id = ?', (measurement_id,))
-    row = cursor.fetchone()
-    conn.close()
+    def write(conn):
+        cursor = conn.cursor()
 
-    return {
-        "measurement_id": row[0],
-        "customer_id": row[1],
-        "measurement_date": row[2],
-        "garment_type": row[3],
-        "chest": row[4],
-        "waist": row[5],
-        "length": row[6],
-        "shoulder": row[7],
-        "arm_length": row[8],
-        "arm_opening": row[9],
-        "neck": row[10],
-        "shalwar_length": row[11],
-        "shalwar_bottom": row[12],
-        "kamee_length": row[13],
-        "hip": row[14],
-        "kurta_length": row[15],
-        "attribute": row[16],
-        "pajama_length": row[17],
-        "pajama_bottom": row[18]
-    }
+        # Check measurement exists
+        cursor.execute('SELECT * FROM MEASUREMENT WHERE measurement_id = ?', (measurement_id,))
+        if not cursor.fetchone():
+            raise HTTPException(status_code=404, detail="Measurement not found")
+
+        cursor.execute(query, values)
+        invalidate_on_commit("measurement", measurement_id)
+
+        # Get updated measurement
+        cursor.execute(f'SELECT {MEASUREMENT_COLUMNS} FROM MEASUREMENT WHERE measurement_id = ?', (measurement_id,))
+        return cursor.fetchone()
+
+    row = await write_queue.run(write)
+
+    result = measurement_row(row)
+    measurement_index.upsert(result)
+    event_broker.publish("measurement", "updated", measurement_id, result)
+    return result
+
+@app.get("/measurements/{measurement_id}/similar")
+async def get_similar_measurements(measurement_id: int, k: int = Query(10, ge=1, le=100)):
+    """Closest measurements of the same garment type - for reusing existing paper patterns.
+
+    distance is the root mean square difference in inches over the dimensions both
+    measurements have (NULL dimensions are left out).
+    """
+    if similar.np is None:
+        raise HTTPException(status_code=503, detail="Similarity search needs NumPy installed on the server")
+
+    matches = await db.run("report", measurement_index.similar, measurement_id, k)
+    if matches is None:
+        raise HTTPException(status_code=404, detail="Measurement not found")
+
+    ids = [match[0] for match in matches]
+    rows = await fetch_all(f'SELECT {MEASUREMENT_COLUMNS} FROM MEASUREMENT '
+                           f'WHERE measurement_id IN ({", ".join("?" * len(ids))})', ids) if ids else []
+    by_id = {row[0]: measurement_row(row) for row in rows}
+    return json_response({
+        "measurement_id": measurement_id,
+        "similar": [
+            {**by_id[match_id], "distance": round(distance, 3), "shared_dimensions": shared}
+            for match_id, distance, shared in matches if match_id in by_id
+        ]
+    })
 
 @app.delete("/measurements/{measurement_id}")
-def delete_measurement(measurement_id: int):
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM MEASUREMENT WHERE measurement_id = ?', (measurement_id,))
-    conn.commit()
-    deleted = cursor.rowcount
-    conn.close()
-    
+async def delete_measurement(measurement_id: int):
+    def write(conn):
+        cursor = conn.cursor()
+        try:
+            cursor.execute('DELETE FROM MEASUREMENT WHERE measurement_id = ?', (measurement_id,))
+        except sqlite3.IntegrityError:
+            raise HTTPException(status_code=409, detail="Measurement is used by existing orders")
+        invalidate_on_commit("measurement", measurement_id)
+        return cursor.rowcount
+
+    deleted = await write_queue.run(write)
     if deleted == 0:
         raise HTTPException(status_code=404, detail="Measurement not found")
-    
+
+    measurement_index.remove(measurement_id)
+    event_broker.publish("measurement", "deleted", measurement_id)
     return {"message": "Measurement deleted successfully"}
 
 @app.get("/orders/", response_model=list[OrderResponse])
-def get_all_orders():
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM "ORDER" ORDER BY order_id DESC')
-    rows = cursor.fetchall()
-    conn.close()
-    
-    return [{
-        "order_id": row[0],
-        "customer_id": row[1],
-        "measurement_id": row[2],
-        "order_date": row[3],
-        "delivery_date": row[4],
-        "total_amount": row[5],
-        "advance_payment": row[6],
-        "discount": row[7],
-        "status": row[8],
-        "balance_due": row[9],
-        "notes": row[10],
-        "garment_type": row[11]
-    } for row in rows]
+async def get_all_orders(
+    request: Request,
+    after_id: Optional[int] = Query(None, description="Return rows with an id below this cursor"),
+    limit: Optional[int] = Query(None, ge=1, le=LIST_PAGE_MAX),
+    stream: bool = Query(False, description="Stream rows as NDJSON instead of a JSON list"),
+    ids: Optional[str] = Query(None, description="Comma-separated ids to fetch instead of a page, e.g. 1,2,3")
+):
+    etag = await table_etag(request, "ORDER")
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    if ids is not None:
+        return await get_by_ids("order", '"ORDER"', 'order_id', ORDER_COLUMNS, order_row,
+                                ids, etag, after_id, limit, stream)
+
+    query, params = keyset_query('"ORDER"', 'order_id', after_id, limit, ORDER_COLUMNS)
+    if stream:
+        return StreamingResponse(stream_ndjson(query, params), media_type="application/x-ndjson",
+                                 headers={"ETag": etag})
+
+    rows = await fetch_all(query, params)
+    headers = {"ETag": etag}
+    set_next_cursor(headers, rows, limit)
+    return json_response([order_row(row) for row in rows], headers)
 
 
 @app.get("/orders/{order_id}", response_model=OrderResponse)
-def get_order(order_id: int):
+async def get_order(order_id: int, request: Request):
     """Get single order by ID - matches frontend API.orders.getById()"""
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM "ORDER" WHERE order_id = ?', (order_id,))
-    row = cursor.fetchone()
-    conn.close()
+    etag = await table_etag(request, "ORDER")
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    headers = {"ETag": etag}
+
+    cached = entity_cache.get("order", order_id)
+    if cached is not None:
+        return json_response(cached, headers)
+
+    generation = entity_cache.generation()
+    row = await fetch_one(f'SELECT {ORDER_COLUMNS} FROM "ORDER" WHERE order_id = ?', (order_id,))
 
     if not row:
         raise HTTPException(status_code=404, detail="Order not found")
 
-    return {
-        "order_id": row[0],
-        "customer_id": row[1],
-        "measurement_id": row[2],
-        "order_date": row[3],
-        "delivery_date": row[4],
-        "total_amount": row[5],
-        "advance_payment": row[6],
-        "discount": row[7],
-        "status": row[8],
-        "balance_due": row[9],
-        "notes": row[10],
-        "garment_type": row[11]
-    }
+    result = order_row(row)
+    entity_cache.put("order", order_id, result, generation)
+    return json_response(result, headers)
 
 
 @app.put("/orders/{order_id}", response_model=OrderResponse)
-def update_order(order_id: int, order: OrderUpdate):
+async def update_order(order_id: int, order: OrderUpdate):
     """Update order - matches frontend API.orders.update()"""
-    valid_statuses = ('order-book', 'cutting', 'stitching', 'ready-to-deliver', 'delivered')
-    if order.status is not None and order.status not in valid_statuses:
-        raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {', '.join(valid_statuses)}")
+    if order.status is not None and order.status not in ORDER_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {', '.join(ORDER_STATUSES)}")
     if order.total_amount is not None and order.total_amount < 0:
         raise HTTPException(status_code=400, detail="Total amount cannot be negative")
     if order.advance_payment is not None and order.advance_payment < 0:
         raise HTTPException(status_code=400, detail="Advance payment cannot be negative")
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-
-    # Check order exists
-    cursor.execute('SELECT * FROM "ORDER" WHERE order_id = ?', (order_id,))
-    row = cursor.fetchone()
-    if not row:
-        conn.close()
-        raise HTTPException(status_code=404, detail="Order not found")
 
     # Build dynamic update query
     updates = []
@@ -490,108 +924,183 @@ def update_order(order_id: int, order: OrderUpdate):
             updates.append(f"{field} = ?")
             values.append(value)
 
-    if not updates:
-        conn.close()
-        raise HTTPException(status_code=400, detail="No fields to update")
-
     values.append(order_id)
     query = f'UPDATE "ORDER" SET {", ".join(updates)} WHERE order_id = ?'
-    cursor.execute(query, values)
-    conn.commit()
 
-    # Get updated order
-    cursor.execute('SELECT * FROM "ORDER" WHERE order_id = ?', (order_id,))
-    row = cursor.fetchone()
-    conn.close()
+    def write(conn):
+        cursor = conn.cursor()
 
-    return {
-        "order_id": row[0],
-        "customer_id": row[1],
-        "measurement_id": row[2],
-        "order_date": row[3],
-        "delivery_date": row[4],
-        "total_amount": row[5],
-        "advance_payment": row[6],
-        "discount": row[7],
-        "status": row[8],
-        "balance_due": row[9],
-        "notes": row[10],
-        "garment_type": row[11]
-    }
+        # Check order exists - its status before the update is published along with the new one
+        cursor.execute('SELECT status FROM "ORDER" WHERE order_id = ?', (order_id,))
+        previous = cursor.fetchone()
+        if not previous:
+            raise HTTPException(status_code=404, detail="Order not found")
+
+        if not updates:
+            raise HTTPException(status_code=400, detail="No fields to update")
+
+        cursor.execute(query, values)
+        invalidate_on_commit("order", order_id)
+
+        # Get updated order
+        cursor.execute(f'SELECT {ORDER_COLUMNS} FROM "ORDER" WHERE order_id = ?', (order_id,))
+        return previous[0], cursor.fetchone()
+
+    previous_status, row = await write_queue.run(write)
+
+    result = order_row(row)
+    event_broker.publish("order", "updated", order_id, result, status=result["status"],
+                         previous_status=previous_status)
+    return result
 
 @app.delete("/orders/{order_id}")
-def delete_order(order_id: int):
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute('DELETE FROM "ORDER" WHERE order_id = ?', (order_id,))
-    conn.commit()
-    deleted = cursor.rowcount
-    conn.close()
-    
-    if deleted == 0:
+async def delete_order(order_id: int):
+    def write(conn):
+        cursor = conn.cursor()
+        # Status of the deleted order, for subscribers filtering on it
+        cursor.execute('SELECT status FROM "ORDER" WHERE order_id = ?', (order_id,))
+        row = cursor.fetchone()
+        cursor.execute('DELETE FROM "ORDER" WHERE order_id = ?', (order_id,))
+        invalidate_on_commit("order", order_id)
+        return row
+
+    row = await write_queue.run(write)
+    if row is None:
         raise HTTPException(status_code=404, detail="Order not found")
-    
+
+    event_broker.publish("order", "deleted", order_id, status=row[0])
     return {"message": "Order deleted successfully"}
 
 # 1. Search by Phone
 @app.get("/search/phone/{phone_number}")
-def search_by_phone(phone_number: str):
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    
-    # Get customer by phone
-    cursor.execute('SELECT * FROM CUSTOMER WHERE phone_number LIKE ?', (f"%{phone_number}%",))
-    customer = cursor.fetchone()
-    
-    if not customer:
-        conn.close()
+async def search_by_phone(
+    phone_number: str,
+    match: Literal["prefix", "suffix", "any"] = Query("any", description="Match the leading digits, the last digits, or either"),
+    after_id: Optional[int] = Query(None, description="Return customers with an id below this cursor"),
+    limit: int = Query(20, ge=1, le=LIST_PAGE_MAX)
+):
+    """Search by phone - family members can share a number, so every match is returned"""
+    digits, reversed_digits = normalize_phone(phone_number)
+    if not digits:
         return {"message": "No customer found with this phone"}
-    
-    # Get customer's measurements
-    cursor.execute('SELECT * FROM MEASUREMENT WHERE customer_id = ?', (customer[0],))
-    measurements = cursor.fetchall()
-    
-    # Get customer's orders
-    cursor.execute('SELECT * FROM "ORDER" WHERE customer_id = ?', (customer[0],))
-    orders = cursor.fetchall()
-    
-    conn.close()
+
+    # Range scans on the normalized columns - ':' sorts right after '9'
+    conditions = []
+    params = []
+    if match in ("prefix", "any"):
+        conditions.append('(phone_digits >= ? AND phone_digits < ?)')
+        params += [digits, digits + ':']
+    if match in ("suffix", "any"):
+        conditions.append('(phone_digits_reversed >= ? AND phone_digits_reversed < ?)')
+        params += [reversed_digits, reversed_digits + ':']
+    query = f'SELECT {CUSTOMER_COLUMNS} FROM CUSTOMER WHERE ({" OR ".join(conditions)})'
+    if after_id is not None:
+        query += ' AND customer_id < ?'
+        params.append(after_id)
+    query += ' ORDER BY customer_id DESC LIMIT ?'
+    params.append(limit)
+
+    def read(conn):
+        cursor = conn.cursor()
+
+        # Get customers by phone
+        cursor.execute(query, params)
+        customers = cursor.fetchall()
+        if not customers:
+            return customers, [], []
+
+        customer_ids = [customer[0] for customer in customers]
+        placeholders = ", ".join("?" * len(customer_ids))
+
+        # Get the customers' measurements
+        cursor.execute(f'SELECT {MEASUREMENT_COLUMNS} FROM MEASUREMENT WHERE customer_id IN ({placeholders})',
+                       customer_ids)
+        measurements = cursor.fetchall()
+
+        # Get the customers' orders
+        cursor.execute(f'SELECT {ORDER_COLUMNS} FROM "ORDER" WHERE customer_id IN ({placeholders})', customer_ids)
+        return customers, measurements, cursor.fetchall()
+
+    customers, measurements, orders = await db.run("read", read)
+    if not customers:
+        return {"message": "No customer found with this phone"}
+    customer_ids = [customer[0] for customer in customers]
+
+    results = {}
+    for customer in map(search_customer_row, customers):
+        results[customer["customer_id"]] = {
+            "customer": {
+                "id": customer["customer_id"],
+                "name": customer["name"],
+                "phone": customer["phone_number"],
+                "address": customer["address"]
+            },
+            "measurements": [],
+            "orders": []
+        }
+    for m in map(measurement_row, measurements):
+        results[m["customer_id"]]["measurements"].append({
+            "id": m["measurement_id"],
+            "garment_type": m["garment_type"],
+            "measurement_date": m["measurement_date"]
+        })
+    for o in map(order_row, orders):
+        results[o["customer_id"]]["orders"].append({
+            "id": o["order_id"],
+            "status": o["status"],
+            "order_date": o["order_date"],
+            "total_amount": o["total_amount"],
+            "balance_due": o["balance_due"]
+        })
     
     return {
-        "customer": {
-            "id": customer[0],
-            "name": customer[1],
-            "phone": customer[2],
-            "address": customer[3]
-        },
-        "measurements": [
-            {
-                "id": m[0],
-                "garment_type": m[3],
-                "measurement_date": m[2]
-            } for m in measurements
-        ],
-        "orders": [
-            {
-                "id": o[0],
-                "status": o[8],
-                "order_date": o[3],
-                "total_amount": o[5],
-                "balance_due": o[9]
-            } for o in orders
-        ]
+        "customers": list(results.values()),
+        "next_after_id": customer_ids[-1] if len(customers) == limit else None
     }
 
 # 2. Search by Name
+def fts_prefix_query(text, columns):
+    """Turn free text into an FTS5 query - every word must match as a prefix"""
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    terms = " AND ".join(f'"{word}"*' for word in words)
+    return f"{{{' '.join(columns)}}} : ({terms})"
+
 @app.get("/search/name/{customer_name}")
-def search_by_name(customer_name: str):
-    conn = None
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    
-    cursor.execute('SELECT * FROM CUSTOMER WHERE name LIKE ? ORDER BY name', (f"%{customer_name}%",))
-    customers = cursor.fetchall()
-    conn.close()
+async def search_by_name(
+    customer_name: str,
+    limit: int = Query(50, ge=1, le=LIST_PAGE_MAX),
+    all_fields: bool = Query(False, description="Also match address and notes")
+):
+    """Search customers by name prefix, best matches first.
+
+    Names that start with the search come first, in name order. The rest have a word
+    starting with each search word (in the name, or with all_fields also the address
+    and notes), newest first. Both are walked in index order and stop at limit, so no
+    match outside the page is ever scored.
+    """
+    columns = ("name", "address", "notes") if all_fields else ("name",)
+    match = fts_prefix_query(customer_name, columns)
+    if match is None:
+        return {"message": "No customers found with this name"}
+    start = " ".join(customer_name.split())
+    name_range = (start, start + "\U0010ffff")  # above every character a name can continue with
+
+    def read(conn):
+        customers = conn.execute(f'SELECT {CUSTOMER_COLUMNS} FROM CUSTOMER c '
+                                 'WHERE (c.name COLLATE NOCASE >= ? AND c.name COLLATE NOCASE < ?) '
+                                 'ORDER BY c.name COLLATE NOCASE LIMIT ?', (*name_range, limit)).fetchall()
+        if len(customers) < limit:
+            customers += conn.execute('SELECT c.customer_id, c.name, c.phone_number, c.address, c.notes, c.created_at '
+                                      'FROM CUSTOMER_FTS JOIN CUSTOMER c ON c.customer_id = CUSTOMER_FTS.rowid '
+                                      'WHERE CUSTOMER_FTS MATCH ? '
+                                      'AND NOT (c.name COLLATE NOCASE >= ? AND c.name COLLATE NOCASE < ?) '
+                                      'ORDER BY CUSTOMER_FTS.rowid DESC LIMIT ?',
+                                      (match, *name_range, limit - len(customers))).fetchall()
+        return customers
+
+    customers = await db.run("read", read)
     
     if not customers:
         return {"message": "No customers found with this name"}
@@ -610,226 +1119,830 @@ def search_by_name(customer_name: str):
 
 # 3. Search by Garment Type
 @app.get("/search/garment/{garment_type}")
-def search_by_garment_type(garment_type: str):
-    conn = None
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    
-    # Get measurements of this garment type
-    cursor.execute('SELECT * FROM MEASUREMENT WHERE garment_type = ?', (garment_type,))
-    measurements = cursor.fetchall()
-    
-    # Get orders of this garment type
-    cursor.execute('SELECT * FROM "ORDER" WHERE garment_type = ?', (garment_type,))
-    orders = cursor.fetchall()
-    
-    conn.close()
+async def search_by_garment_type(garment_type: str):
+    # Get measurements and orders of this garment type
+    measurements = await fetch_all(f'SELECT {MEASUREMENT_COLUMNS} FROM MEASUREMENT WHERE garment_type = ?',
+                                   (garment_type,), lane="report")
+    orders = await fetch_all(f'SELECT {ORDER_COLUMNS} FROM "ORDER" WHERE garment_type = ?', (garment_type,), lane="report")
     
     return {
         "measurements": [
             {
-                "id": m[0],
-                "customer_id": m[1],
-                "measurement_date": m[2]
-            } for m in measurements
+                "id": m["measurement_id"],
+                "customer_id": m["customer_id"],
+                "measurement_date": m["measurement_date"]
+            } for m in map(measurement_row, measurements)
         ],
         "orders": [
             {
-                "id": o[0],
-                "customer_id": o[1],
-                "status": o[8],
-                "order_date": o[3]
-            } for o in orders
+                "id": o["order_id"],
+                "customer_id": o["customer_id"],
+                "status": o["status"],
+                "order_date": o["order_date"]
+            } for o in map(order_row, orders)
         ]
     }
-
 # search by date
-@app.get("/search/date/")
-def search_by_date(
-    date_str: str = Query(..., description="Date to search for (YYYY-MM-DD)")
-):
-    """Search by order date - returns customers who have orders on this date with all their data"""
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    
+def parse_date(value):
     try:
-        search_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-        
-        # Get orders on this date
-        cursor.execute('SELECT * FROM "ORDER" WHERE order_date = ? ORDER BY order_id DESC', (search_date,))
-        orders = cursor.fetchall()
-        
-        if not orders:
-            conn.close()
-            return {"message": f"No orders found on date {search_date}"}
-        
-        # Get unique customer IDs from these orders
-        customer_ids = list(set([order[1] for order in orders]))
-        
-        result = []
-        for customer_id in customer_ids:
-            # Get customer details
-            cursor.execute('SELECT * FROM CUSTOMER WHERE customer_id = ?', (customer_id,))
-            customer = cursor.fetchone()
-            
-            if customer:
-                # Get customer's measurements
-                cursor.execute('SELECT * FROM MEASUREMENT WHERE customer_id = ?', (customer_id,))
-                measurements = cursor.fetchall()
-                
-                # Get customer's orders (all orders, not just the date searched)
-                cursor.execute('SELECT * FROM "ORDER" WHERE customer_id = ? ORDER BY order_id DESC', (customer_id,))
-                all_orders = cursor.fetchall()
-                
-                result.append({
-                    "customer": {
-                        "customer_id": customer[0],
-                        "name": customer[1],
-                        "phone_number": customer[2],
-                        "address": customer[3],
-                        "notes": customer[4],
-                        "created_at": customer[5]
-                    },
-                    "measurements": [
-                        {
-                            "measurement_id": m[0],
-                            "customer_id": m[1],
-                            "measurement_date": m[2],
-                            "garment_type": m[3],
-                            "chest": m[4],
-                            "waist": m[5],
-                            "length": m[6],
-                            "shoulder": m[7],
-                            "arm_length": m[8],
-                            "arm_opening": m[9],
-                            "neck": m[10],
-                            "shalwar_length": m[11],
-                            "shalwar_bottom": m[12],
-                            "kamee_length": m[13],
-                            "hip": m[14],
-                            "kurta_length": m[15],
-                            "attribute": m[16],
-                            "pajama_length": m[17],
-                            "pajama_bottom": m[18]
-                        } for m in measurements
-                    ],
-                    "orders": [
-                        {
-                            "order_id": o[0],
-                            "customer_id": o[1],
-                            "measurement_id": o[2],
-                            "order_date": o[3],
-                            "delivery_date": o[4],
-                            "total_amount": o[5],
-                            "advance_payment": o[6],
-                            "discount": o[7],
-                            "status": o[8],
-                            "balance_due": o[9],
-                            "notes": o[10],
-                            "garment_type": o[11]
-                        } for o in all_orders
-                    ]
-                })
-        
-        conn.close()
-        return {"customers": result}
-        
+        return datetime.strptime(value, "%Y-%m-%d").date()
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
+
+@app.get("/search/date/")
+async def search_by_date(
+    date_str: Optional[str] = Query(None, description="Date to search for (YYYY-MM-DD)"),
+    from_date: Optional[str] = Query(None, alias="from", description="Start of a date range (YYYY-MM-DD)"),
+    to_date: Optional[str] = Query(None, alias="to", description="End of a date range, inclusive (YYYY-MM-DD)")
+):
+    """Search by order date - returns customers who have orders on this date (or range) with all their data"""
+    if date_str is not None:
+        start = end = parse_date(date_str)
+    elif from_date is not None and to_date is not None:
+        start, end = parse_date(from_date), parse_date(to_date)
+        if start > end:
+            raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    else:
+        raise HTTPException(status_code=400, detail="Provide date_str, or both 'from' and 'to'")
+
+    # Three set-based queries no matter how many customers ordered in the range
+    customers_in_range = 'SELECT customer_id FROM "ORDER" WHERE order_date BETWEEN ? AND ?'
+
+    def read(conn):
+        cursor = conn.cursor()
+
+        cursor.execute(f'SELECT {CUSTOMER_COLUMNS} FROM CUSTOMER WHERE customer_id IN ({customers_in_range}) '
+                       'ORDER BY customer_id DESC', (start, end))
+        customers = cursor.fetchall()
+        if not customers:
+            return None
+
+        # Get the customers' measurements
+        cursor.execute(f'SELECT {MEASUREMENT_COLUMNS} FROM MEASUREMENT WHERE customer_id IN ({customers_in_range})', (start, end))
+        measurements = cursor.fetchall()
+
+        # Get the customers' orders (all orders, not just the dates searched)
+        cursor.execute(f'SELECT {ORDER_COLUMNS} FROM "ORDER" WHERE customer_id IN ({customers_in_range}) '
+                       'ORDER BY order_id DESC', (start, end))
+        all_orders = cursor.fetchall()
+
+        # Group everything by customer in one pass
+        result = {
+            customer[0]: {
+                "customer": search_customer_row(customer),
+                "measurements": [],
+                "orders": []
+            } for customer in customers
+        }
+        for m in measurements:
+            result[m[1]]["measurements"].append(measurement_row(m))
+        for o in all_orders:
+            result[o[1]]["orders"].append(order_row(o))
+
+        return result
+
+    # Rows are grouped on the report lane too, so big ranges never hold up the event loop
+    result = await db.run("report", read)
+    if result is None:
+        if start == end:
+            return {"message": f"No orders found on date {start}"}
+        return {"message": f"No orders found between {start} and {end}"}
+
+    return {"customers": list(result.values())}
+
 # add customer
 @app.post("/customers/", response_model=CustomerResponse)
-def create_customer(customer: CustomerCreate):
+async def create_customer(customer: CustomerCreate):
     """Create customer - allows duplicate phone numbers"""
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    
-    # Removed duplicate phone check - customers can have same phone numbers
-    cursor.execute('''
-        INSERT INTO CUSTOMER (name, phone_number, address, notes)
-        VALUES (?, ?, ?, ?)
-    ''', (customer.name, customer.phone_number, customer.address, customer.notes))
-    
-    conn.commit()
-    customer_id = cursor.lastrowid
-    
-    # Fetch the created customer with created_at timestamp
-    cursor.execute('SELECT * FROM CUSTOMER WHERE customer_id = ?', (customer_id,))
-    row = cursor.fetchone()
-    conn.close()
-    
-    return {
-        "customer_id": row[0],
-        "name": row[1],
-        "phone_number": row[2],
-        "address": row[3],
-        "notes": row[4],
-        "created_at": row[5]  # Get actual timestamp from database
-    }
+    def write(conn):
+        cursor = conn.cursor()
+
+        # Removed duplicate phone check - customers can have same phone numbers
+        cursor.execute('''
+            INSERT INTO CUSTOMER (name, phone_number, address, notes, phone_digits, phone_digits_reversed)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (customer.name, customer.phone_number, customer.address, customer.notes,
+              *normalize_phone(customer.phone_number)))
+        customer_id = cursor.lastrowid
+
+        # Fetch the created customer with created_at timestamp
+        cursor.execute(f'SELECT {CUSTOMER_COLUMNS} FROM CUSTOMER WHERE customer_id = ?', (customer_id,))
+        return cursor.fetchone()
+
+    generation = entity_cache.generation()
+    row = await write_queue.run(write)
+
+    result = customer_row(row)
+    entity_cache.put("customer", row[0], result, generation)
+    event_broker.publish("customer", "created", row[0], result)
+    return result
 
 # add measurement
 @app.post("/measurements/", response_model=MeasurementResponse)
-def create_measurement(measurement: MeasurementCreate):
+async def create_measurement(measurement: MeasurementCreate):
     """Create measurement - matches frontend API.measurements.create()"""
-    valid_garment_types = ('2-piece', '3-piece', 'prince-coat', 'shirt', 'pants', 'coat')
-    if measurement.garment_type not in valid_garment_types:
-        raise HTTPException(status_code=400, detail=f"Invalid garment_type. Must be one of: {', '.join(valid_garment_types)}")
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO MEASUREMENT 
-        (customer_id, measurement_date, garment_type, chest, waist, length, 
-         shoulder, arm_length, arm_opening, neck, shalwar_length, shalwar_bottom, 
-         kamee_length, hip, kurta_length, attribute, pajama_length, pajama_bottom)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        measurement.customer_id, measurement.measurement_date, measurement.garment_type,
-        measurement.chest, measurement.waist, measurement.length,
-        measurement.shoulder, measurement.arm_length, measurement.arm_opening,
-        measurement.neck, measurement.shalwar_length, measurement.shalwar_bottom,
-        measurement.kamee_length, measurement.hip, measurement.kurta_length,
-        measurement.attribute, measurement.pajama_length, measurement.pajama_bottom
-    ))
-    conn.commit()
-    measurement_id = cursor.lastrowid
-    conn.close()
-    
-    return {
-        "measurement_id": measurement_id,
-        **measurement.dict()
-    }
+    if measurement.garment_type not in GARMENT_TYPES:
+        raise HTTPException(status_code=400, detail=f"Invalid garment_type. Must be one of: {', '.join(GARMENT_TYPES)}")
+
+    def write(conn):
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                INSERT INTO MEASUREMENT
+                (customer_id, measurement_date, garment_type, chest, waist, length,
+                 shoulder, arm_length, arm_opening, neck, shalwar_length, shalwar_bottom,
+                 kamee_length, hip, kurta_length, attribute, pajama_length, pajama_bottom)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                measurement.customer_id, measurement.measurement_date, measurement.garment_type,
+                measurement.chest, measurement.waist, measurement.length,
+                measurement.shoulder, measurement.arm_length, measurement.arm_opening,
+                measurement.neck, measurement.shalwar_length, measurement.shalwar_bottom,
+                measurement.kamee_length, measurement.hip, measurement.kurta_length,
+                measurement.attribute, measurement.pajama_length, measurement.pajama_bottom
+            ))
+        except sqlite3.IntegrityError:
+            # foreign_keys is ON for pooled connections
+            raise HTTPException(status_code=400, detail="Customer not found")
+
+        # Read it back so the cache holds the same form a GET would
+        cursor.execute(f'SELECT {MEASUREMENT_COLUMNS} FROM MEASUREMENT WHERE measurement_id = ?', (cursor.lastrowid,))
+        return cursor.fetchone()
+
+    generation = entity_cache.generation()
+    row = await write_queue.run(write)
+
+    result = measurement_row(row)
+    measurement_id = result["measurement_id"]
+    entity_cache.put("measurement", measurement_id, result, generation)
+    measurement_index.upsert(result)
+    event_broker.publish("measurement", "created", measurement_id, result)
+    return result
 
 # add order
 @app.post("/orders/", response_model=OrderResponse)
-def create_order(order: OrderCreate):
+async def create_order(order: OrderCreate):
     """Create order - matches frontend API.orders.create()"""
-    valid_garment_types = ('2-piece', '3-piece', 'prince-coat', 'shirt', 'pants', 'coat')
-    valid_statuses = ('order-book', 'cutting', 'stitching', 'ready-to-deliver', 'delivered')
-    if order.garment_type not in valid_garment_types:
-        raise HTTPException(status_code=400, detail=f"Invalid garment_type. Must be one of: {', '.join(valid_garment_types)}")
-    if order.status not in valid_statuses:
-        raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {', '.join(valid_statuses)}")
+    if order.garment_type not in GARMENT_TYPES:
+        raise HTTPException(status_code=400, detail=f"Invalid garment_type. Must be one of: {', '.join(GARMENT_TYPES)}")
+    if order.status not in ORDER_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {', '.join(ORDER_STATUSES)}")
     if order.total_amount < 0:
         raise HTTPException(status_code=400, detail="Total amount cannot be negative")
     if order.advance_payment < 0:
         raise HTTPException(status_code=400, detail="Advance payment cannot be negative")
-    conn = sqlite3.connect(DATABASE_NAME)
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO "ORDER" 
-        (customer_id, measurement_id, order_date, delivery_date, total_amount, 
+
+    def write(conn):
+        cursor = conn.cursor()
+        try:
+            cursor.execute('''
+                INSERT INTO "ORDER"
+                (customer_id, measurement_id, order_date, delivery_date, total_amount,
+                 advance_payment, discount, status, notes, garment_type)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                order.customer_id, order.measurement_id, order.order_date,
+                order.delivery_date, order.total_amount, order.advance_payment,
+                order.discount, order.status, order.notes, order.garment_type
+            ))
+        except sqlite3.IntegrityError:
+            raise HTTPException(status_code=400, detail="Customer or measurement not found")
+
+        # Read it back so the cache holds the same form a GET would
+        cursor.execute(f'SELECT {ORDER_COLUMNS} FROM "ORDER" WHERE order_id = ?', (cursor.lastrowid,))
+        return cursor.fetchone()
+
+    generation = entity_cache.generation()
+    row = await write_queue.run(write)
+
+    result = order_row(row)
+    order_id = result["order_id"]
+    entity_cache.put("order", order_id, result, generation)
+    event_broker.publish("order", "created", order_id, result, status=order.status)
+    return result
+
+# Reports
+
+@app.get("/workload")
+async def get_workload(
+    from_date: Optional[str] = Query(None, alias="from", description="First delivery day (YYYY-MM-DD, default today)"),
+    to_date: Optional[str] = Query(None, alias="to", description="Last delivery day, inclusive (default a week from 'from')"),
+    status: Optional[list[str]] = Query(None, description="Only these statuses (default every undelivered one)"),
+    garment_type: Optional[str] = Query(None),
+    include_overdue: bool = Query(True, description="Also list undelivered orders due before 'from'")
+):
+    """Undelivered orders due in a date window, per day and bucketed by status and garment type.
+
+    Orders due before today that are not delivered are flagged "overdue". Orders
+    without a delivery_date are not scheduled and are left out.
+    """
+    today = date.today()
+    start = parse_date(from_date) if from_date is not None else today
+    end = parse_date(to_date) if to_date is not None else start + timedelta(days=WORKLOAD_DEFAULT_DAYS - 1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    if (end - start).days >= WORKLOAD_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"The window can be at most {WORKLOAD_MAX_DAYS} days")
+    statuses = tuple(status) if status else OPEN_ORDER_STATUSES
+    invalid = [value for value in statuses if value not in OPEN_ORDER_STATUSES]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {', '.join(OPEN_ORDER_STATUSES)}")
+    if garment_type is not None and garment_type not in GARMENT_TYPES:
+        raise HTTPException(status_code=400, detail=f"Invalid garment_type. Must be one of: {', '.join(GARMENT_TYPES)}")
+
+    # status IN (...) with a delivery_date range probes idx_order_status_delivery_date once per status,
+    # so delivered orders are never read however many pile up. The planner would rather walk
+    # idx_order_delivery_date to skip sorting for the ORDER BY, which reads every delivered order
+    # in history - hence INDEXED BY.
+    query = (f'SELECT {WORKLOAD_COLUMNS} FROM "ORDER" o INDEXED BY idx_order_status_delivery_date '
+             'JOIN CUSTOMER c ON c.customer_id = o.customer_id '
+             f'WHERE o.status IN ({", ".join("?" * len(statuses))}) AND o.delivery_date {{}}')
+    garment_filter = ' AND o.garment_type = ?' if garment_type is not None else ''
+    garment_params = (garment_type,) if garment_type is not None else ()
+
+    def read(conn):
+        conn.execute('BEGIN')  # window and overdue lists from one snapshot
+        try:
+            due = conn.execute(query.format('BETWEEN ? AND ?') + garment_filter
+                               + ' ORDER BY o.delivery_date, o.order_id',
+                               (*statuses, start.isoformat(), end.isoformat(), *garment_params)).fetchall()
+            overdue = conn.execute(query.format('< ?') + garment_filter + ' ORDER BY o.delivery_date, o.order_id',
+                                   (*statuses, start.isoformat(), *garment_params)).fetchall() if include_overdue else []
+        finally:
+            conn.rollback()
+        return due, overdue
+
+    due, overdue = await db.run("report", read)
+
+    today_key = today.isoformat()
+
+    def workload_order(row):
+        order = order_row(row[:-1])
+        order["customer_name"] = row[-1]
+        order["overdue"] = order["delivery_date"] < today_key
+        return order
+
+    days = {}
+    for offset in range((end - start).days + 1):
+        day = (start + timedelta(days=offset)).isoformat()
+        days[day] = {"date": day, "count": 0, "overdue": 0, "by_status": {value: 0 for value in statuses},
+                     "by_garment_type": {}, "orders": []}
+    totals = {"count": 0, "overdue": 0, "by_status": {value: 0 for value in statuses}, "by_garment_type": {}}
+    for row in due:
+        order = workload_order(row)
+        for bucket in (days[order["delivery_date"]], totals):
+            bucket["count"] += 1
+            bucket["overdue"] += order["overdue"]
+            bucket["by_status"][order["status"]] += 1
+            bucket["by_garment_type"][order["garment_type"]] = bucket["by_garment_type"].get(order["garment_type"], 0) + 1
+        days[order["delivery_date"]]["orders"].append(order)
+
+    return json_response({
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "today": today_key,
+        "totals": totals,
+        "days": list(days.values()),
+        "overdue_before": [workload_order(row) for row in overdue]
+    })
+
+@app.get("/analytics/sizes")
+async def get_size_distribution(
+    garment_type: Optional[str] = Query(None, description="One garment type (default: all of them)"),
+    from_date: Optional[str] = Query(None, alias="from", description="Only measurements taken on or after (YYYY-MM-DD)"),
+    to_date: Optional[str] = Query(None, alias="to", description="Only measurements taken on or before (YYYY-MM-DD)"),
+    bins: int = Query(12, ge=1, le=100, description="Histogram bins per dimension"),
+    sizes: int = Query(5, ge=2, le=10, description="Number of suggested ready-made sizes"),
+    per_customer: bool = Query(True, description="Count only each customer's latest measurement")
+):
+    """Size distribution per garment type - percentiles, histograms and suggested size buckets
+    for every measurement column, for stocking ready-made sizes"""
+    if analytics.np is None:
+        raise HTTPException(status_code=503, detail="Size analytics need NumPy installed on the server")
+    if garment_type is not None and garment_type not in GARMENT_TYPES:
+        raise HTTPException(status_code=400, detail=f"Invalid garment_type. Must be one of: {', '.join(GARMENT_TYPES)}")
+    start = parse_date(from_date) if from_date is not None else None
+    end = parse_date(to_date) if to_date is not None else None
+    if start is not None and end is not None and start > end:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+
+    garment_types = [garment_type] if garment_type is not None else list(GARMENT_TYPES)
+    result = await db.run("report", size_distribution.compute, garment_types, start, end, bins, sizes, per_customer)
+    return json_response({
+        "from": from_date,
+        "to": to_date,
+        "per_customer": per_customer,
+        "garment_types": result
+    })
+
+@app.get("/dashboard")
+async def get_dashboard():
+    """Order counts per status, today's new orders and the outstanding balance.
+
+    Reads the trigger-maintained counter tables - a handful of primary key rows
+    however many orders there are. `python migrations.py --rebuild-counters`
+    recomputes them from "ORDER" if they are ever in doubt.
+    """
+    today = date.today().isoformat()
+
+    def read(conn):
+        conn.execute('BEGIN')  # status and daily counters from one snapshot
+        try:
+            statuses = conn.execute(
+                'SELECT status, order_count, total_amount, balance_due FROM ORDER_STATUS_COUNTER').fetchall()
+            daily = conn.execute('SELECT order_count, total_amount FROM DAILY_ORDER_COUNTER WHERE order_date = ?',
+                                 (today,)).fetchone()
+        finally:
+            conn.rollback()
+        return statuses, daily
+
+    statuses, daily = await db.run("read", read)
+    counts = {status: (count, amount, balance) for status, count, amount, balance in statuses}
+    empty = (0, 0.0, 0.0)
+    today_count, today_amount = daily or (0, 0.0)
+    return {
+        "date": today,
+        "orders_by_status": {status: counts.get(status, empty)[0] for status in ORDER_STATUSES},
+        "open_orders": sum(counts.get(status, empty)[0] for status in OPEN_ORDER_STATUSES),
+        "total_orders": sum(count for count, _, _ in counts.values()),
+        "new_orders_today": today_count,
+        "new_order_amount_today": round(today_amount, 2),
+        "balance_due": round(sum(balance for _, _, balance in counts.values()), 2),
+        "balance_due_by_status": {status: round(counts.get(status, empty)[2], 2) for status in ORDER_STATUSES},
+    }
+
+@app.get("/reports/monthly")
+async def get_monthly_report(
+    year: int = Query(..., ge=2000, le=9999),
+    month: int = Query(..., ge=1, le=12)
+):
+    """Monthly business report - matches frontend GenerateReportScreen"""
+    month_key = f"{year:04d}-{month:02d}"
+    month_start = f"{month_key}-01"
+    month_end = f"{year + 1:04d}-01-01" if month == 12 else f"{year:04d}-{month + 1:02d}-01"
+
+    def read(conn):
+        cursor = conn.cursor()
+
+        # Totals come from the trigger-maintained summaries, not from scanning "ORDER"
+        cursor.execute('''
+            SELECT order_count, total_amount, advance_payment, discount, balance_due
+            FROM MONTHLY_SUMMARY WHERE month = ?
+        ''', (month_key,))
+        totals = cursor.fetchone() or (0, 0, 0, 0, 0)
+
+        cursor.execute('SELECT status, order_count FROM MONTHLY_STATUS_SUMMARY WHERE month = ?', (month_key,))
+        status_counts = dict(cursor.fetchall())
+
+        cursor.execute('''
+            SELECT garment_type, order_count, total_amount FROM MONTHLY_GARMENT_SUMMARY
+            WHERE month = ? AND order_count > 0 ORDER BY garment_type
+        ''', (month_key,))
+        garments = cursor.fetchall()
+
+        # Orders placed this month that have not been delivered yet
+        cursor.execute(f'''
+            SELECT {ORDER_COLUMNS} FROM "ORDER"
+            WHERE order_date >= ? AND order_date < ? AND status != 'delivered'
+            ORDER BY delivery_date IS NULL, delivery_date, order_id
+        ''', (month_start, month_end))
+        return totals, status_counts, garments, cursor.fetchall()
+
+    totals, status_counts, garments, pending = await db.run("report", read)
+    order_count, total_amount, advance_payment, discount, balance_due = totals
+    return {
+        "year": year,
+        "month": month,
+        "order_count": order_count,
+        "total_amount": round(total_amount, 2),
+        "discounts": round(discount, 2),
+        "revenue": round(total_amount - discount, 2),
+        "advance_collected": round(advance_payment, 2),
+        "outstanding_balance": round(balance_due, 2),
+        "orders_by_status": {status: status_counts.get(status, 0) for status in ORDER_STATUSES},
+        "orders_by_garment_type": {
+            garment_type: {"order_count": count, "total_amount": round(amount, 2)}
+            for garment_type, count, amount in garments
+        },
+        "pending_orders": [
+            order_row(o) for o in pending
+        ]
+    }
+
+
+
+# Bulk import
+IMPORT_INSERTS = {
+    "customer": '''
+        INSERT INTO CUSTOMER (name, phone_number, address, notes, phone_digits, phone_digits_reversed)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''',
+    "measurement": '''
+        INSERT INTO MEASUREMENT
+        (customer_id, measurement_date, garment_type, chest, waist, length,
+         shoulder, arm_length, arm_opening, neck, shalwar_length, shalwar_bottom,
+         kamee_length, hip, kurta_length, attribute, pajama_length, pajama_bottom)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''',
+    "order": '''
+        INSERT INTO "ORDER"
+        (customer_id, measurement_id, order_date, delivery_date, total_amount,
          advance_payment, discount, status, notes, garment_type)
         VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        order.customer_id, order.measurement_id, order.order_date,
-        order.delivery_date, order.total_amount, order.advance_payment,
-        order.discount, order.status, order.notes, order.garment_type
-    ))
-    conn.commit()
-    order_id = cursor.lastrowid
-    conn.close()
-    
-    return {
-        "order_id": order_id,
-        **order.dict(),
-        "balance_due": order.total_amount - order.advance_payment - order.discount
-    }
\ No newline at end of file
+    ''',
+}
+
+def import_row_values(entity, record, temp_ids):
+    """Resolve temp_id references, validate with the create models and return the INSERT values"""
+    if not isinstance(record.get("data"), dict):
+        raise ValueError("'data' must be an object")
+    data = dict(record["data"])
+    for field, ref_key in (("customer_id", "customer_ref"), ("measurement_id", "measurement_ref")):
+        ref = record.get(ref_key)
+        if ref is not None:
+            if ref not in temp_ids:
+                raise ValueError(f"Unresolved {ref_key} '{ref}' - it must refer to an earlier, successfully imported row")
+            data[field] = temp_ids[ref]
+
+    if entity == "customer":
+        c = CustomerCreate(**data)
+        return (c.name, c.phone_number, c.address, c.notes, *normalize_phone(c.phone_number))
+
+    if entity == "measurement":
+        m = MeasurementCreate(**data)
+        if m.garment_type not in GARMENT_TYPES:
+            raise ValueError(f"Invalid garment_type. Must be one of: {', '.join(GARMENT_TYPES)}")
+        return (
+            m.customer_id, m.measurement_date, m.garment_type, m.chest, m.waist, m.length,
+            m.shoulder, m.arm_length, m.arm_opening, m.neck, m.shalwar_length, m.shalwar_bottom,
+            m.kamee_length, m.hip, m.kurta_length, m.attribute, m.pajama_length, m.pajama_bottom
+        )
+
+    o = OrderCreate(**data)
+    if o.garment_type not in GARMENT_TYPES:
+        raise ValueError(f"Invalid garment_type. Must be one of: {', '.join(GARMENT_TYPES)}")
+    if o.status not in ORDER_STATUSES:
+        raise ValueError(f"Invalid status. Must be one of: {', '.join(ORDER_STATUSES)}")
+    if o.total_amount < 0:
+        raise ValueError("Total amount cannot be negative")
+    if o.advance_payment < 0:
+        raise ValueError("Advance payment cannot be negative")
+    return (
+        o.customer_id, o.measurement_id, o.order_date, o.delivery_date, o.total_amount,
+        o.advance_payment, o.discount, o.status, o.notes, o.garment_type
+    )
+
+def insert_import_run(conn, entity, prepared, temp_ids, result):
+    """Insert consecutive rows of one entity - executemany first, row by row if a constraint fails"""
+    sql = IMPORT_INSERTS[entity]
+    conn.execute('SAVEPOINT import_run')
+    try:
+        conn.executemany(sql, [values for _, _, values in prepared])
+        # The writer holds the write lock and ids are AUTOINCREMENT, so the run got consecutive ids
+        last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+        new_ids = range(last_id - len(prepared) + 1, last_id + 1)
+        conn.execute('RELEASE import_run')
+    except sqlite3.IntegrityError:
+        conn.execute('ROLLBACK TO import_run')
+        conn.execute('RELEASE import_run')
+        new_ids = []
+        for index, temp_id, values in prepared:
+            try:
+                new_ids.append(conn.execute(sql, values).lastrowid)
+            except sqlite3.IntegrityError as e:
+                new_ids.append(None)
+                result["errors"].append({"index": index, "temp_id": temp_id, "error": f"Constraint failed: {e}"})
+
+    for (index, temp_id, _), new_id in zip(prepared, new_ids):
+        if new_id is None:
+            continue
+        result["imported"][entity] += 1
+        if temp_id is not None:
+            temp_ids[temp_id] = new_id
+
+def import_chunk(conn, records, known_ids):
+    """Import one chunk of (index, record) pairs - runs as a single writer job.
+
+    Returns the chunk's result and the temp_ids it created, which only describe
+    committed rows once the job's transaction has committed. known_ids is read only.
+    """
+    new_ids = {}
+    temp_ids = collections.ChainMap(new_ids, known_ids)  # lookups see both, new ids go to new_ids
+    result = {"imported": {entity: 0 for entity in IMPORT_INSERTS}, "errors": []}
+    for entity, run in itertools.groupby(records, key=lambda item: item[1].get("entity")):
+        prepared = []
+        for index, record in run:
+            temp_id = record.get("temp_id")
+            try:
+                if entity not in IMPORT_INSERTS:
+                    raise ValueError(f"Unknown entity. Must be one of: {', '.join(IMPORT_INSERTS)}")
+                prepared.append((index, temp_id, import_row_values(entity, record, temp_ids)))
+            except (ValidationError, ValueError, TypeError) as e:
+                result["errors"].append({"index": index, "temp_id": temp_id, "error": str(e)})
+        if prepared:
+            insert_import_run(conn, entity, prepared, temp_ids, result)
+    return result, new_ids
+
+class ImportStopped(Exception):
+    """A chunk could not be committed - the rows before it stay imported"""
+
+async def iter_json_array(chunks):
+    """Records of a JSON array body, decoded as its chunks arrive instead of after the whole body.
+
+    Raises ValueError when the body is not a JSON array.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    started = False
+    finished = False
+    text = codecs.getincrementaldecoder("utf-8")()
+    async for piece in chunks:
+        buffer = buffer[position:] + text.decode(piece)
+        position = 0
+        while not finished:
+            position = _skip_whitespace(buffer, position)
+            if position == len(buffer):
+                break
+            if not started:
+                if buffer[position] != "[":
+                    raise ValueError("Body must be a JSON array or NDJSON")
+                started = True
+                position = _skip_whitespace(buffer, position + 1)
+                if buffer.startswith("]", position):
+                    finished = True
+                continue
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                break  # incomplete - wait for more of the body
+            # A number at the very end of what arrived so far may still be growing
+            rest = _skip_whitespace(buffer, end)
+            if rest == len(buffer):
+                break
+            if buffer[rest] not in ",]":
+                raise ValueError(f"Invalid JSON array at character {rest}")
+            finished = buffer[rest] == "]"
+            position = rest + 1
+            yield record
+    if not finished:
+        raise ValueError("Body must be a JSON array or NDJSON" if not started else "JSON array is not terminated")
+
+def _skip_whitespace(text, position):
+    while position < len(text) and text[position] in " \t\r\n":
+        position += 1
+    return position
+
+@app.post("/import")
+async def bulk_import(request: Request):
+    """Bulk import of customers, measurements and orders.
+
+    The body is a JSON array or NDJSON (Content-Type: application/x-ndjson); either is
+    imported while it streams in. Each record looks like
+    {"entity": "measurement", "temp_id": "m1", "customer_ref": "c1", "data": {...}}
+    where customer_ref / measurement_ref point at the temp_id of an earlier record.
+    Invalid rows are reported in "errors" and do not stop the import. If a chunk
+    cannot be committed, the import stops there: the response is a 500 carrying the
+    report of the chunks committed before it.
+    """
+    temp_ids = {}
+    summary = {"imported": {entity: 0 for entity in IMPORT_INSERTS}, "errors": []}
+    chunk = []
+    count = 0
+
+    async def flush():
+        nonlocal chunk
+        records, chunk = chunk, []
+        try:
+            result, new_ids = await write_queue.run(import_chunk, records, temp_ids)
+        except Exception as e:
+            summary["errors"] += [{"index": index, "temp_id": record.get("temp_id"),
+                                   "error": f"Not imported, its chunk was rolled back: {e}"}
+                                  for index, record in records]
+            raise ImportStopped(str(e))
+        # Only now are the chunk's rows committed
+        temp_ids.update(new_ids)
+        for entity, imported in result["imported"].items():
+            summary["imported"][entity] += imported
+        summary["errors"] += result["errors"]
+
+    async def add(record):
+        nonlocal count
+        if isinstance(record, dict):
+            chunk.append((count, record))
+        else:
+            summary["errors"].append({"index": count, "temp_id": None, "error": "Record must be an object"})
+        count += 1
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            await flush()
+
+    stopped = None
+    try:
+        if "ndjson" in request.headers.get("content-type", ""):
+            buffer = b""
+            async for piece in request.stream():
+                buffer += piece
+                *lines, buffer = buffer.split(b"\n")
+                for line in lines:
+                    if line.strip():
+                        try:
+                            await add(json.loads(line))
+                        except json.JSONDecodeError as e:
+                            summary["errors"].append({"index": count, "temp_id": None, "error": f"Invalid JSON: {e}"})
+                            count += 1
+            if buffer.strip():
+                try:
+                    await add(json.loads(buffer))
+                except json.JSONDecodeError as e:
+                    summary["errors"].append({"index": count, "temp_id": None, "error": f"Invalid JSON: {e}"})
+                    count += 1
+        else:
+            try:
+                async for record in iter_json_array(request.stream()):
+                    await add(record)
+            except ValueError as e:
+                if not count:
+                    raise HTTPException(status_code=400, detail=str(e))
+                # Malformed after some records - import those and report where it broke
+                summary["errors"].append({"index": count, "temp_id": None, "error": f"Invalid JSON: {e}"})
+        if chunk:
+            await flush()
+    except ImportStopped as e:
+        stopped = str(e)
+
+    summary["errors"].sort(key=lambda error: error["index"])
+    if summary["imported"]["measurement"]:
+        measurement_index.invalidate()  # rebuilt by the next similarity search
+    # One event per entity rather than per row - subscribers fetch the rows through /sync
+    for entity, imported in summary["imported"].items():
+        if imported:
+            event_broker.publish(entity, "imported", None, {"count": imported})
+
+    report = {
+        "received": count,
+        "imported": summary["imported"],
+        "failed": len(summary["errors"]),
+        "errors": summary["errors"],
+        "ids": temp_ids
+    }
+    if stopped is not None:
+        return JSONResponse(status_code=500, content={"detail": f"Import stopped: {stopped}", **report})
+    return report
+
+
+# Export
+# entity -> (table, selected columns, id column, date column used by from/to)
+EXPORT_ENTITIES = {
+    "customers": ("CUSTOMER", CUSTOMER_COLUMNS, "customer_id", "created_at"),
+    "measurements": ("MEASUREMENT", MEASUREMENT_COLUMNS, "measurement_id", "measurement_date"),
+    "orders": ('"ORDER"', ORDER_COLUMNS, "order_id", "order_date"),
+}
+
+@app.get("/export/{entity}")
+async def export_entity(
+    entity: Literal["customers", "measurements", "orders"],
+    format: Literal["csv", "ndjson"] = "csv",
+    gzip: bool = False,
+    from_date: Optional[str] = Query(None, alias="from", description="First day to include (YYYY-MM-DD)"),
+    to_date: Optional[str] = Query(None, alias="to", description="Last day to include (YYYY-MM-DD)"),
+    status: Optional[str] = None,
+    garment_type: Optional[str] = None
+):
+    """Stream a full export - dates filter order_date, measurement_date or created_at"""
+    table, columns, id_column, date_column = EXPORT_ENTITIES[entity]
+    conditions = []
+    params = []
+    if from_date is not None:
+        conditions.append(f"{date_column} >= ?")
+        params.append(parse_date(from_date).isoformat())
+    if to_date is not None:
+        # Exclusive upper bound so created_at timestamps on the last day are included
+        conditions.append(f"{date_column} < ?")
+        params.append((parse_date(to_date) + timedelta(days=1)).isoformat())
+    if status is not None:
+        if entity != "orders":
+            raise HTTPException(status_code=400, detail="status can only filter order exports")
+        conditions.append("status = ?")
+        params.append(status)
+    if garment_type is not None:
+        if entity == "customers":
+            raise HTTPException(status_code=400, detail="garment_type cannot filter customer exports")
+        conditions.append("garment_type = ?")
+        params.append(garment_type)
+
+    query = f"SELECT {columns} FROM {table}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += f" ORDER BY {id_column}"
+
+    if format == "csv":
+        body, media_type, filename = stream_csv(query, params), "text/csv", f"{entity}.csv"
+    else:
+        body, media_type, filename = stream_ndjson(query, params), "application/x-ndjson", f"{entity}.ndjson"
+    if gzip:
+        body, media_type, filename = stream_gzip(body), "application/gzip", filename + ".gz"
+
+    return StreamingResponse(body, media_type=media_type,
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+# Delta sync
+# entity -> (table, columns sent to clients)
+SYNC_ENTITIES = {
+    "customers": ("CUSTOMER", CUSTOMER_COLUMNS),
+    "measurements": ("MEASUREMENT", MEASUREMENT_COLUMNS),
+    "orders": ('"ORDER"', ORDER_COLUMNS),
+}
+SYNC_TOMBSTONE_KEYS = {"customer": "customers", "measurement": "measurements", "order": "orders"}
+
+@app.get("/sync")
+async def sync_changes(
+    since: int = Query(0, ge=0, description="Cursor from the previous sync (0 for a full download)"),
+    limit: int = Query(500, ge=1, le=5000, description="Maximum changed rows and deletions per batch")
+):
+    """Rows changed and ids deleted after the cursor, across customers, measurements and orders.
+
+    Every write stamps the row with the next change_seq (deletes log a TOMBSTONE), so the
+    client stores "cursor" and calls again with it until has_more is false.
+    """
+    def read(conn):
+        # One read transaction so all four queries see the same snapshot
+        conn.execute('BEGIN')
+        try:
+            changes = []
+            columns = {}
+            for entity, (table, entity_columns) in SYNC_ENTITIES.items():
+                cursor = conn.execute(f'SELECT change_seq, {entity_columns}, updated_at FROM {table} '
+                                      'WHERE change_seq > ? ORDER BY change_seq LIMIT ?', (since, limit + 1))
+                columns[entity] = [column[0] for column in cursor.description[1:]]
+                changes += [(row[0], entity, list(row[1:])) for row in cursor]
+            cursor = conn.execute('SELECT change_seq, entity, entity_id FROM TOMBSTONE '
+                                  'WHERE change_seq > ? ORDER BY change_seq LIMIT ?', (since, limit + 1))
+            changes += [(seq, None, (SYNC_TOMBSTONE_KEYS[entity], entity_id)) for seq, entity, entity_id in cursor]
+        finally:
+            conn.rollback()
+        return columns, changes
+
+    columns, changes = await db.run("report", read)
+
+    # Each source was cut at limit + 1, so the first `limit` by change_seq are exact
+    changes.sort(key=lambda change: change[0])
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+
+    result = {
+        "since": since,
+        "cursor": changes[-1][0] if changes else since,
+        "has_more": has_more,
+        **{entity: {"columns": columns[entity], "rows": []} for entity in SYNC_ENTITIES},
+        "deleted": {entity: [] for entity in SYNC_ENTITIES},
+    }
+    for _, entity, row in changes:
+        if entity is None:
+            result["deleted"][row[0]].append(row[1])
+        else:
+            result[entity]["rows"].append(row)
+    return result
+
+
+# Push channel
+async def event_stream(request, subscription):
+    """SSE body for one subscriber - sends a comment line as heartbeat while idle"""
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(subscription.queue.get(), EVENT_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                message = ": keep-alive\n\n"
+            # Starlette awaits each send, so a slow client stops draining its queue and gets a resync
+            yield message
+    finally:
+        event_broker.unsubscribe(subscription)
+
+@app.get("/events")
+async def subscribe_events(
+    request: Request,
+    entities: Optional[str] = Query(None, description="Comma-separated: customer, measurement, order"),
+    status: Optional[str] = Query(None, description="Comma-separated order statuses to receive")
+):
+    """Server-Sent Events stream of created / updated / deleted customers, measurements and orders.
+
+    An "event: resync" means the client fell behind and should catch up through /sync.
+    """
+    entity_filter = [e.strip() for e in entities.split(",") if e.strip()] if entities else []
+    for entity in entity_filter:
+        if entity not in ("customer", "measurement", "order"):
+            raise HTTPException(status_code=400, detail="entities must be customer, measurement and/or order")
+    status_filter = [s.strip() for s in status.split(",") if s.strip()] if status else []
+    for value in status_filter:
+        if value not in ORDER_STATUSES:
+            raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {', '.join(ORDER_STATUSES)}")
+
+    subscription = event_broker.subscribe(entity_filter, status_filter)
+    if subscription is None:
+        raise HTTPException(status_code=503, detail="Too many event subscribers")
+    return StreamingResponse(event_stream(request, subscription), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
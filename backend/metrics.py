@@ -0,0 +1,299 @@
+# metrics.py
+import contextvars
+import sqlite3
+import time
+from bisect import bisect_left
+
+# Request latency buckets in seconds - point reads sit in the low milliseconds,
+# exports and reports in the hundreds
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 25, 50, 100)
+
+# Label used for requests that matched no route, so 404 scans cannot grow the series count
+UNMATCHED_ROUTE = "<unmatched>"
+
+# Per-request SQL counters of the request currently being handled (None outside a request)
+_current = contextvars.ContextVar("request_stats", default=None)
+
+
+class RequestStats:
+    """SQL and serialization work done while handling one request"""
+    __slots__ = ("queries", "rows", "sql_seconds", "serialize_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.rows = 0
+        self.sql_seconds = 0.0
+        self.serialize_seconds = 0.0
+
+
+def record_query(seconds, rows=0, statements=0):
+    """Add SQLite time (and fetched rows / executed statements) to the current request"""
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += statements
+        stats.rows += rows
+        stats.sql_seconds += seconds
+
+
+def record_serialization(seconds):
+    stats = _current.get()
+    if stats is not None:
+        stats.serialize_seconds += seconds
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that reports statement and fetch time to the current request.
+
+    Time and rows are also summed per statement. A statement whose total crosses the
+    connection's slow_log threshold is handed to the slow query log once it is done:
+    when its rows are exhausted, or the cursor is closed, reused or dropped.
+    """
+    _sql = None
+    _parameters = None
+    _elapsed = 0.0
+    _rows = 0
+    _slow = False
+
+    def _start(self, sql, parameters):
+        self._finish()
+        self._sql = sql
+        self._parameters = parameters
+        self._elapsed = 0.0
+        self._rows = 0
+
+    def _observe(self, seconds, rows=0, statements=0):
+        record_query(seconds, rows, statements)
+        self._elapsed += seconds
+        self._rows += rows
+        slow_log = self.connection.slow_log
+        if slow_log is not None and self._sql is not None and self._elapsed >= slow_log.threshold:
+            self._slow = True
+
+    def _finish(self):
+        sql, self._sql = self._sql, None  # later fetches of the same statement are not logged again
+        if not self._slow:
+            return
+        self._slow = False
+        slow_log = self.connection.slow_log
+        if slow_log is not None:
+            # Statements without a result set report the rows they changed
+            rows = self._rows if self.description is not None else max(self.rowcount, 0)
+            slow_log.record(self.connection, sql, self._parameters, self._elapsed, rows)
+
+    def execute(self, sql, parameters=()):
+        self._start(sql, parameters)
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._observe(time.perf_counter() - started, statements=1)
+            if self.description is None:
+                self._finish()
+
+    def executemany(self, sql, seq_of_parameters):
+        self._start(sql, None)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._observe(time.perf_counter() - started, statements=1)
+            self._finish()
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._observe(time.perf_counter() - started, rows=0 if row is None else 1)
+        if row is None:
+            self._finish()
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        started = time.perf_counter()
+        rows = super().fetchmany(size)
+        self._observe(time.perf_counter() - started, rows=len(rows))
+        if len(rows) < size:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._observe(time.perf_counter() - started, rows=len(rows))
+        self._finish()
+        return rows
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        try:
+            self._finish()
+        except Exception:
+            pass  # the connection may already be closed
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """sqlite3 connection factory whose cursors are InstrumentedCursors"""
+
+    # SlowQueryLog shared by every instrumented connection, None disables it
+    slow_log = None
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense (not thread-safe)"""
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f'{name}_sum{{{labels}}} {self.sum}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+class RouteMetrics:
+    __slots__ = ("latency", "queries_per_request", "queries", "rows", "sql_seconds", "serialize_seconds")
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries_per_request = Histogram(QUERY_COUNT_BUCKETS)
+        self.queries = 0
+        self.rows = 0
+        self.sql_seconds = 0.0
+        self.serialize_seconds = 0.0
+
+
+class Metrics:
+    """Request and SQL metrics, rendered in the Prometheus text exposition format.
+
+    Updated only from the event loop thread (by MetricsMiddleware), so recording a
+    request is a handful of dict lookups and additions with no locking.
+    """
+
+    def __init__(self):
+        self.in_flight = 0
+        self._routes = {}
+        self._responses = {}
+        self._gauges = {}
+
+    def observe(self, method, route, status, seconds, stats):
+        key = (method, route)
+        metrics = self._routes.get(key)
+        if metrics is None:
+            metrics = self._routes[key] = RouteMetrics()
+        metrics.latency.observe(seconds)
+        metrics.queries_per_request.observe(stats.queries)
+        metrics.queries += stats.queries
+        metrics.rows += stats.rows
+        metrics.sql_seconds += stats.sql_seconds
+        metrics.serialize_seconds += stats.serialize_seconds
+        key = (method, route, status)
+        self._responses[key] = self._responses.get(key, 0) + 1
+
+    def gauge(self, name, help_text, read):
+        """Register a gauge whose value read() returns at scrape time"""
+        self._gauges[name] = (help_text, read)
+
+    def render(self):
+        lines = [
+            "# HELP tailorshop_http_requests_in_flight Requests currently being handled",
+            "# TYPE tailorshop_http_requests_in_flight gauge",
+            f"tailorshop_http_requests_in_flight {self.in_flight}",
+            "# HELP tailorshop_http_responses_total Responses by route and status code",
+            "# TYPE tailorshop_http_responses_total counter",
+        ]
+        for (method, route, status), count in sorted(self._responses.items()):
+            lines.append(f'tailorshop_http_responses_total{{method="{method}",route="{route}",status="{status}"}} {count}')
+
+        routes = sorted(self._routes.items())
+        labels = {key: f'method="{key[0]}",route="{key[1]}"' for key, _ in routes}
+        lines += [
+            "# HELP tailorshop_http_request_duration_seconds Request latency, including streamed bodies",
+            "# TYPE tailorshop_http_request_duration_seconds histogram",
+        ]
+        for key, metrics in routes:
+            lines.extend(metrics.latency.lines("tailorshop_http_request_duration_seconds", labels[key]))
+        lines += [
+            "# HELP tailorshop_db_queries_per_request SQL statements executed per request",
+            "# TYPE tailorshop_db_queries_per_request histogram",
+        ]
+        for key, metrics in routes:
+            lines.extend(metrics.queries_per_request.lines("tailorshop_db_queries_per_request", labels[key]))
+
+        for name, help_text, attribute in (
+            ("tailorshop_db_queries_total", "SQL statements executed", "queries"),
+            ("tailorshop_db_rows_fetched_total", "Rows fetched from SQLite", "rows"),
+            ("tailorshop_db_seconds_total", "Time spent inside SQLite executing and fetching", "sql_seconds"),
+            ("tailorshop_serialization_seconds_total", "Time spent encoding JSON response bodies", "serialize_seconds"),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+            for key, metrics in routes:
+                lines.append(f"{name}{{{labels[key]}}} {getattr(metrics, attribute)}")
+
+        for name, (help_text, read) in self._gauges.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {read()}"]
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and SQL work per route template.
+
+    Latency runs until the last body chunk is sent, so streamed exports are
+    measured in full. Requests that match no route share one label.
+    """
+
+    def __init__(self, app, metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        self.metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.metrics.in_flight -= 1
+            _current.reset(token)
+            route = scope.get("route")
+            self.metrics.observe(scope["method"], route.path if route is not None else UNMATCHED_ROUTE,
+                                 status, elapsed, stats)
@@ -0,0 +1,639 @@
+# migrations.py
+import sqlite3
+import sys
+
+from database import normalize_phone
+
+
+def backfill_phone_digits(conn):
+    rows = conn.execute('SELECT customer_id, phone_number FROM CUSTOMER').fetchall()
+    conn.executemany(
+        'UPDATE CUSTOMER SET phone_digits = ?, phone_digits_reversed = ? WHERE customer_id = ?',
+        ((*normalize_phone(phone_number), customer_id) for customer_id, phone_number in rows)
+    )
+
+
+def monthly_summary_upserts(row, sign):
+    """Trigger statements adding (sign=1) or removing (sign=-1) one order row from the monthly summaries"""
+    month = f"substr({row}.order_date, 1, 7)"
+    return f'''
+        INSERT INTO MONTHLY_SUMMARY (month, order_count, total_amount, advance_payment, discount, balance_due)
+        VALUES ({month}, {sign}, {sign} * {row}.total_amount, {sign} * coalesce({row}.advance_payment, 0),
+                {sign} * coalesce({row}.discount, 0), {sign} * coalesce({row}.balance_due, 0))
+        ON CONFLICT(month) DO UPDATE SET
+            order_count = order_count + excluded.order_count,
+            total_amount = total_amount + excluded.total_amount,
+            advance_payment = advance_payment + excluded.advance_payment,
+            discount = discount + excluded.discount,
+            balance_due = balance_due + excluded.balance_due;
+        INSERT INTO MONTHLY_STATUS_SUMMARY (month, status, order_count)
+        VALUES ({month}, {row}.status, {sign})
+        ON CONFLICT(month, status) DO UPDATE SET order_count = order_count + excluded.order_count;
+        INSERT INTO MONTHLY_GARMENT_SUMMARY (month, garment_type, order_count, total_amount)
+        VALUES ({month}, {row}.garment_type, {sign}, {sign} * {row}.total_amount)
+        ON CONFLICT(month, garment_type) DO UPDATE SET
+            order_count = order_count + excluded.order_count,
+            total_amount = total_amount + excluded.total_amount;
+    '''
+
+
+def rebuild_monthly_summaries(conn):
+    """Recompute the monthly summary tables from "ORDER" """
+    conn.execute('DELETE FROM MONTHLY_SUMMARY')
+    conn.execute('DELETE FROM MONTHLY_STATUS_SUMMARY')
+    conn.execute('DELETE FROM MONTHLY_GARMENT_SUMMARY')
+    conn.execute('''
+        INSERT INTO MONTHLY_SUMMARY (month, order_count, total_amount, advance_payment, discount, balance_due)
+        SELECT substr(order_date, 1, 7), count(*), sum(total_amount), sum(coalesce(advance_payment, 0)),
+               sum(coalesce(discount, 0)), sum(coalesce(balance_due, 0))
+        FROM "ORDER" GROUP BY 1
+    ''')
+    conn.execute('''
+        INSERT INTO MONTHLY_STATUS_SUMMARY (month, status, order_count)
+        SELECT substr(order_date, 1, 7), status, count(*) FROM "ORDER" GROUP BY 1, 2
+    ''')
+    conn.execute('''
+        INSERT INTO MONTHLY_GARMENT_SUMMARY (month, garment_type, order_count, total_amount)
+        SELECT substr(order_date, 1, 7), garment_type, count(*), sum(total_amount) FROM "ORDER" GROUP BY 1, 2
+    ''')
+
+
+def dashboard_counter_upserts(row, sign):
+    """Trigger statements adding (sign=1) or removing (sign=-1) one order row from the dashboard counters"""
+    return f'''
+        INSERT INTO ORDER_STATUS_COUNTER (status, order_count, total_amount, balance_due)
+        VALUES ({row}.status, {sign}, {sign} * {row}.total_amount, {sign} * coalesce({row}.balance_due, 0))
+        ON CONFLICT(status) DO UPDATE SET
+            order_count = order_count + excluded.order_count,
+            total_amount = total_amount + excluded.total_amount,
+            balance_due = balance_due + excluded.balance_due;
+        INSERT INTO DAILY_ORDER_COUNTER (order_date, order_count, total_amount)
+        VALUES ({row}.order_date, {sign}, {sign} * {row}.total_amount)
+        ON CONFLICT(order_date) DO UPDATE SET
+            order_count = order_count + excluded.order_count,
+            total_amount = total_amount + excluded.total_amount;
+    '''
+
+
+def rebuild_dashboard_counters(conn):
+    """Recompute the dashboard counter tables from "ORDER" """
+    conn.execute('DELETE FROM ORDER_STATUS_COUNTER')
+    conn.execute('DELETE FROM DAILY_ORDER_COUNTER')
+    conn.execute('''
+        INSERT INTO ORDER_STATUS_COUNTER (status, order_count, total_amount, balance_due)
+        SELECT status, count(*), sum(total_amount), sum(coalesce(balance_due, 0)) FROM "ORDER" GROUP BY status
+    ''')
+    conn.execute('''
+        INSERT INTO DAILY_ORDER_COUNTER (order_date, order_count, total_amount)
+        SELECT order_date, count(*), sum(total_amount) FROM "ORDER" GROUP BY order_date
+    ''')
+
+
+def table_version_triggers(table):
+    """Triggers bumping TABLE_VERSION for table on every insert, update and delete"""
+    bump = f"UPDATE TABLE_VERSION SET version = version + 1 WHERE table_name = '{table}';"
+    return [
+        f'CREATE TRIGGER IF NOT EXISTS {table.lower()}_version_{event.lower()} AFTER {event} ON "{table}" BEGIN {bump} END'
+        for event in ("INSERT", "UPDATE", "DELETE")
+    ]
+
+
+# table -> (primary key, entity name used in TOMBSTONE)
+SYNC_TABLES = {
+    "CUSTOMER": ("customer_id", "customer"),
+    "MEASUREMENT": ("measurement_id", "measurement"),
+    "ORDER": ("order_id", "order"),
+}
+
+NOW_MS = "strftime('%Y-%m-%d %H:%M:%f', 'now')"
+
+
+def backfill_change_seq(conn):
+    """Give every existing row its own change_seq, customers first"""
+    seq = conn.execute('SELECT seq FROM CHANGE_CLOCK').fetchone()[0]
+    for table, (key, _) in SYNC_TABLES.items():
+        ids = [row[0] for row in conn.execute(f'SELECT {key} FROM "{table}" ORDER BY {key}')]
+        conn.executemany(
+            f'UPDATE "{table}" SET change_seq = ?, updated_at = {NOW_MS} WHERE {key} = ?',
+            ((seq + i + 1, row_id) for i, row_id in enumerate(ids))
+        )
+        seq += len(ids)
+    conn.execute('UPDATE CHANGE_CLOCK SET seq = ?', (seq,))
+
+
+def change_tracking_triggers(table):
+    """Triggers stamping updated_at / change_seq on writes and logging a tombstone on delete"""
+    key, entity = SYNC_TABLES[table]
+    tick = "UPDATE CHANGE_CLOCK SET seq = seq + 1;"
+    touch = (f'UPDATE "{table}" SET change_seq = (SELECT seq FROM CHANGE_CLOCK), updated_at = {NOW_MS} '
+             f'WHERE {key} = new.{key};')
+    tombstone = (f"INSERT INTO TOMBSTONE (change_seq, entity, entity_id, deleted_at) "
+                 f"VALUES ((SELECT seq FROM CHANGE_CLOCK), '{entity}', old.{key}, {NOW_MS});")
+    name = table.lower()
+    return [
+        f'CREATE TRIGGER IF NOT EXISTS {name}_touch_insert AFTER INSERT ON "{table}" BEGIN {tick} {touch} END',
+        # The WHEN skips the trigger's own UPDATE, the only one that changes change_seq
+        f'CREATE TRIGGER IF NOT EXISTS {name}_touch_update AFTER UPDATE ON "{table}" '
+        f'WHEN new.change_seq IS old.change_seq BEGIN {tick} {touch} END',
+        # Also fires for rows removed by ON DELETE CASCADE
+        f'CREATE TRIGGER IF NOT EXISTS {name}_tombstone AFTER DELETE ON "{table}" BEGIN {tick} {tombstone} END',
+    ]
+
+
+# Ordered schema migrations. The applied version is stored in PRAGMA user_version,
+# so each entry runs exactly once per database. Never edit a released migration -
+# append a new one instead.
+MIGRATIONS = [
+    (1, "Base tables", [
+        '''
+        CREATE TABLE IF NOT EXISTS CUSTOMER (
+            customer_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            phone_number TEXT NOT NULL,
+            address TEXT,
+            notes TEXT,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS MEASUREMENT (
+            measurement_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            customer_id INTEGER NOT NULL,
+            measurement_date DATE NOT NULL,
+            garment_type TEXT NOT NULL CHECK(garment_type IN ('2-piece', '3-piece', 'prince-coat', 'shirt', 'pants', 'coat')),
+            chest REAL,
+            waist REAL,
+            length REAL,
+            shoulder REAL,
+            arm_length REAL,
+            arm_opening REAL,
+            neck REAL,
+            shalwar_length REAL,
+            shalwar_bottom REAL,
+            kamee_length REAL,
+            hip REAL,
+            kurta_length REAL,
+            attribute TEXT,
+            pajama_length REAL,
+            pajama_bottom REAL,
+            FOREIGN KEY (customer_id) REFERENCES CUSTOMER(customer_id) ON DELETE CASCADE
+        )
+        ''',
+        # ORDER is quoted because it is a SQL keyword
+        '''
+        CREATE TABLE IF NOT EXISTS "ORDER" (
+            order_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            customer_id INTEGER NOT NULL,
+            measurement_id INTEGER NOT NULL,
+            order_date DATE NOT NULL DEFAULT CURRENT_DATE,
+            delivery_date DATE,
+            total_amount REAL NOT NULL,
+            advance_payment REAL DEFAULT 0,
+            discount REAL DEFAULT 0,
+            status TEXT NOT NULL DEFAULT 'order-book'
+                CHECK(status IN ('order-book', 'cutting', 'stitching', 'ready-to-deliver', 'delivered')),
+            balance_due REAL GENERATED ALWAYS AS (total_amount - advance_payment - discount) VIRTUAL,
+            notes TEXT,
+            garment_type TEXT NOT NULL,
+            FOREIGN KEY (customer_id) REFERENCES CUSTOMER(customer_id) ON DELETE CASCADE,
+            FOREIGN KEY (measurement_id) REFERENCES MEASUREMENT(measurement_id)
+        )
+        ''',
+    ]),
+    (2, "Secondary indexes for customer lookups and searches", [
+        'CREATE INDEX IF NOT EXISTS idx_measurement_customer_id ON MEASUREMENT(customer_id)',
+        'CREATE INDEX IF NOT EXISTS idx_measurement_garment_type ON MEASUREMENT(garment_type)',
+        'CREATE INDEX IF NOT EXISTS idx_order_customer_id ON "ORDER"(customer_id)',
+        'CREATE INDEX IF NOT EXISTS idx_order_measurement_id ON "ORDER"(measurement_id)',
+        'CREATE INDEX IF NOT EXISTS idx_order_order_date ON "ORDER"(order_date)',
+        'CREATE INDEX IF NOT EXISTS idx_order_delivery_date ON "ORDER"(delivery_date)',
+        'CREATE INDEX IF NOT EXISTS idx_order_status ON "ORDER"(status)',
+        'CREATE INDEX IF NOT EXISTS idx_order_garment_type ON "ORDER"(garment_type)',
+        'ANALYZE',
+    ]),
+    (3, "Full-text index over customer name, address and notes", [
+        # External content table - the text lives in CUSTOMER, FTS5 only keeps the index
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS CUSTOMER_FTS USING fts5(
+            name, address, notes,
+            content='CUSTOMER', content_rowid='customer_id',
+            prefix='2 3', tokenize='unicode61 remove_diacritics 2'
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS customer_fts_insert AFTER INSERT ON CUSTOMER BEGIN
+            INSERT INTO CUSTOMER_FTS(rowid, name, address, notes)
+            VALUES (new.customer_id, new.name, new.address, new.notes);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS customer_fts_delete AFTER DELETE ON CUSTOMER BEGIN
+            INSERT INTO CUSTOMER_FTS(CUSTOMER_FTS, rowid, name, address, notes)
+            VALUES ('delete', old.customer_id, old.name, old.address, old.notes);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS customer_fts_update AFTER UPDATE OF name, address, notes ON CUSTOMER BEGIN
+            INSERT INTO CUSTOMER_FTS(CUSTOMER_FTS, rowid, name, address, notes)
+            VALUES ('delete', old.customer_id, old.name, old.address, old.notes);
+            INSERT INTO CUSTOMER_FTS(rowid, name, address, notes)
+            VALUES (new.customer_id, new.name, new.address, new.notes);
+        END
+        ''',
+        # Index the customers that existed before this migration
+        "INSERT INTO CUSTOMER_FTS(CUSTOMER_FTS) VALUES ('rebuild')",
+    ]),
+    (4, "Normalized phone number columns for prefix and last-digits lookups", [
+        # Written by the application through database.normalize_phone
+        'ALTER TABLE CUSTOMER ADD COLUMN phone_digits TEXT',
+        'ALTER TABLE CUSTOMER ADD COLUMN phone_digits_reversed TEXT',
+        backfill_phone_digits,
+        'CREATE INDEX IF NOT EXISTS idx_customer_phone_digits ON CUSTOMER(phone_digits)',
+        'CREATE INDEX IF NOT EXISTS idx_customer_phone_digits_reversed ON CUSTOMER(phone_digits_reversed)',
+    ]),
+    (5, "Monthly order summaries maintained by triggers", [
+        '''
+        CREATE TABLE IF NOT EXISTS MONTHLY_SUMMARY (
+            month TEXT PRIMARY KEY,
+            order_count INTEGER NOT NULL DEFAULT 0,
+            total_amount REAL NOT NULL DEFAULT 0,
+            advance_payment REAL NOT NULL DEFAULT 0,
+            discount REAL NOT NULL DEFAULT 0,
+            balance_due REAL NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS MONTHLY_STATUS_SUMMARY (
+            month TEXT NOT NULL,
+            status TEXT NOT NULL,
+            order_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (month, status)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS MONTHLY_GARMENT_SUMMARY (
+            month TEXT NOT NULL,
+            garment_type TEXT NOT NULL,
+            order_count INTEGER NOT NULL DEFAULT 0,
+            total_amount REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (month, garment_type)
+        ) WITHOUT ROWID
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS order_summary_insert AFTER INSERT ON "ORDER" BEGIN
+            {monthly_summary_upserts("new", 1)}
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS order_summary_delete AFTER DELETE ON "ORDER" BEGIN
+            {monthly_summary_upserts("old", -1)}
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS order_summary_update
+        AFTER UPDATE OF order_date, total_amount, advance_payment, discount, status, garment_type ON "ORDER" BEGIN
+            {monthly_summary_upserts("old", -1)}
+            {monthly_summary_upserts("new", 1)}
+        END
+        ''',
+        rebuild_monthly_summaries,
+    ]),
+    (6, "Per-table change counters used as HTTP validators", [
+        '''
+        CREATE TABLE IF NOT EXISTS TABLE_VERSION (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        ''',
+        "INSERT OR IGNORE INTO TABLE_VERSION (table_name) VALUES ('CUSTOMER'), ('MEASUREMENT'), ('ORDER')",
+        *table_version_triggers("CUSTOMER"),
+        *table_version_triggers("MEASUREMENT"),
+        *table_version_triggers("ORDER"),
+    ]),
+    (7, "updated_at / change_seq tracking and deletion tombstones for delta sync", [
+        # Single-row counter shared by all three tables, so one cursor covers every change
+        'CREATE TABLE IF NOT EXISTS CHANGE_CLOCK (id INTEGER PRIMARY KEY CHECK (id = 1), seq INTEGER NOT NULL)',
+        'INSERT OR IGNORE INTO CHANGE_CLOCK (id, seq) VALUES (1, 0)',
+        '''
+        CREATE TABLE IF NOT EXISTS TOMBSTONE (
+            change_seq INTEGER PRIMARY KEY,
+            entity TEXT NOT NULL,
+            entity_id INTEGER NOT NULL,
+            deleted_at TEXT NOT NULL
+        )
+        ''',
+        'ALTER TABLE CUSTOMER ADD COLUMN updated_at TEXT',
+        'ALTER TABLE CUSTOMER ADD COLUMN change_seq INTEGER',
+        'ALTER TABLE MEASUREMENT ADD COLUMN updated_at TEXT',
+        'ALTER TABLE MEASUREMENT ADD COLUMN change_seq INTEGER',
+        'ALTER TABLE "ORDER" ADD COLUMN updated_at TEXT',
+        'ALTER TABLE "ORDER" ADD COLUMN change_seq INTEGER',
+        backfill_change_seq,
+        'CREATE INDEX IF NOT EXISTS idx_customer_change_seq ON CUSTOMER(change_seq)',
+        'CREATE INDEX IF NOT EXISTS idx_measurement_change_seq ON MEASUREMENT(change_seq)',
+        'CREATE INDEX IF NOT EXISTS idx_order_change_seq ON "ORDER"(change_seq)',
+        *change_tracking_triggers("CUSTOMER"),
+        *change_tracking_triggers("MEASUREMENT"),
+        *change_tracking_triggers("ORDER"),
+    ]),
+    (8, "Index on order status and delivery date for the workload planner", [
+        'CREATE INDEX IF NOT EXISTS idx_order_status_delivery_date ON "ORDER"(status, delivery_date)',
+        # Its leading column serves every status-only lookup the old index did
+        'DROP INDEX IF EXISTS idx_order_status',
+    ]),
+    (9, "Order counters per status and per day for the dashboard, maintained by triggers", [
+        '''
+        CREATE TABLE IF NOT EXISTS ORDER_STATUS_COUNTER (
+            status TEXT PRIMARY KEY,
+            order_count INTEGER NOT NULL DEFAULT 0,
+            total_amount REAL NOT NULL DEFAULT 0,
+            balance_due REAL NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS DAILY_ORDER_COUNTER (
+            order_date TEXT PRIMARY KEY,
+            order_count INTEGER NOT NULL DEFAULT 0,
+            total_amount REAL NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS order_counter_insert AFTER INSERT ON "ORDER" BEGIN
+            {dashboard_counter_upserts("new", 1)}
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS order_counter_delete AFTER DELETE ON "ORDER" BEGIN
+            {dashboard_counter_upserts("old", -1)}
+        END
+        ''',
+        # Status changes from update_order move the row between two status counters
+        f'''
+        CREATE TRIGGER IF NOT EXISTS order_counter_update
+        AFTER UPDATE OF order_date, total_amount, advance_payment, discount, status ON "ORDER" BEGIN
+            {dashboard_counter_upserts("old", -1)}
+            {dashboard_counter_upserts("new", 1)}
+        END
+        ''',
+        rebuild_dashboard_counters,
+    ]),
+    (10, "Name index and longer full-text prefix indexes for the name search", [
+        # Customers whose name starts with the search are listed first, walked in name order
+        'CREATE INDEX IF NOT EXISTS idx_customer_name ON CUSTOMER(name COLLATE NOCASE)',
+        # Prefix indexes up to 6 characters, so typed names up to that length never merge
+        # the doclists of every term they prefix. The triggers from migration 3 keep working.
+        'DROP TABLE CUSTOMER_FTS',
+        '''
+        CREATE VIRTUAL TABLE CUSTOMER_FTS USING fts5(
+            name, address, notes,
+            content='CUSTOMER', content_rowid='customer_id',
+            prefix='2 3 4 5 6', tokenize='unicode61 remove_diacritics 2'
+        )
+        ''',
+        "INSERT INTO CUSTOMER_FTS(CUSTOMER_FTS) VALUES ('rebuild')",
+    ]),
+]
+
+# Trigger-maintained summary tables: (tables, function recomputing them from "ORDER")
+COUNTER_TABLES = (
+    (("MONTHLY_SUMMARY", "MONTHLY_STATUS_SUMMARY", "MONTHLY_GARMENT_SUMMARY"), rebuild_monthly_summaries),
+    (("ORDER_STATUS_COUNTER", "DAILY_ORDER_COUNTER"), rebuild_dashboard_counters),
+)
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+# Columns returned to clients (excludes the phone lookup and change tracking columns).
+# Defined here so HOT_QUERIES below checks the statements main.py actually sends.
+CUSTOMER_COLUMNS = "customer_id, name, phone_number, address, notes, created_at"
+MEASUREMENT_COLUMNS = ("measurement_id, customer_id, measurement_date, garment_type, chest, waist, length, "
+                       "shoulder, arm_length, arm_opening, neck, shalwar_length, shalwar_bottom, kamee_length, "
+                       "hip, kurta_length, attribute, pajama_length, pajama_bottom")
+# Values the CHECK constraints on MEASUREMENT and "ORDER" allow
+GARMENT_TYPES = ('2-piece', '3-piece', 'prince-coat', 'shirt', 'pants', 'coat')
+ORDER_STATUSES = ('order-book', 'cutting', 'stitching', 'ready-to-deliver', 'delivered')
+# Statuses that still need work in the shop
+OPEN_ORDER_STATUSES = ORDER_STATUSES[:-1]
+
+ORDER_COLUMNS = ("order_id, customer_id, measurement_id, order_date, delivery_date, total_amount, "
+                 "advance_payment, discount, status, balance_due, notes, garment_type")
+# /workload joins the customer's name onto each order
+WORKLOAD_COLUMNS = ", ".join(f"o.{column.strip()}" for column in ORDER_COLUMNS.split(",")) + ", c.name"
+
+_WORKLOAD_QUERY = (f'SELECT {WORKLOAD_COLUMNS} FROM "ORDER" o INDEXED BY idx_order_status_delivery_date '
+                   'JOIN CUSTOMER c ON c.customer_id = o.customer_id WHERE o.status IN (?, ?, ?, ?) ')
+_CUSTOMERS_IN_RANGE = 'SELECT customer_id FROM "ORDER" WHERE order_date BETWEEN ? AND ?'
+_PHONE_PREFIX = '(phone_digits >= ? AND phone_digits < ?)'
+_PHONE_SUFFIX = '(phone_digits_reversed >= ? AND phone_digits_reversed < ?)'
+_NAME_STARTS = '(c.name COLLATE NOCASE >= ? AND c.name COLLATE NOCASE < ?)'
+
+# Statements the request path sends, exactly as the handlers build them (the tests
+# fail when a handler sends one that is missing here). Each must be served from an index.
+# name -> (sql, sample parameters)
+HOT_QUERIES = {
+    "table versions": ('SELECT version FROM TABLE_VERSION WHERE table_name IN (?) ORDER BY table_name', ("CUSTOMER",)),
+    "customer by id": (f'SELECT {CUSTOMER_COLUMNS} FROM CUSTOMER WHERE customer_id = ?', (1,)),
+    "measurement by id": (f'SELECT {MEASUREMENT_COLUMNS} FROM MEASUREMENT WHERE measurement_id = ?', (1,)),
+    "order by id": (f'SELECT {ORDER_COLUMNS} FROM "ORDER" WHERE order_id = ?', (1,)),
+    "customer page": (f'SELECT {CUSTOMER_COLUMNS} FROM CUSTOMER WHERE customer_id < ? '
+                      'ORDER BY customer_id DESC LIMIT ?', (1000, 100)),
+    "measurement page": (f'SELECT {MEASUREMENT_COLUMNS} FROM MEASUREMENT WHERE measurement_id < ? '
+                         'ORDER BY measurement_id DESC LIMIT ?', (1000, 100)),
+    "order page": (f'SELECT {ORDER_COLUMNS} FROM "ORDER" WHERE order_id < ? ORDER BY order_id DESC LIMIT ?', (1000, 100)),
+    "customers by ids": (f'SELECT {CUSTOMER_COLUMNS} FROM CUSTOMER WHERE customer_id IN (?)', (1,)),
+    "measurements by ids": (f'SELECT {MEASUREMENT_COLUMNS} FROM MEASUREMENT WHERE measurement_id IN (?)', (1,)),
+    "orders by ids": (f'SELECT {ORDER_COLUMNS} FROM "ORDER" WHERE order_id IN (?)', (1,)),
+    "customer measurements": (f'SELECT {MEASUREMENT_COLUMNS} FROM MEASUREMENT WHERE customer_id = ? '
+                              'ORDER BY measurement_date DESC, measurement_id DESC', (1,)),
+    "customer orders": (f'SELECT {ORDER_COLUMNS} FROM "ORDER" WHERE customer_id = ? ORDER BY order_id DESC', (1,)),
+    "customers by phone prefix": (f'SELECT {CUSTOMER_COLUMNS} FROM CUSTOMER WHERE ({_PHONE_PREFIX}) '
+                                  'ORDER BY customer_id DESC LIMIT ?', ("0300", "0300:", 20)),
+    "customers by phone suffix": (f'SELECT {CUSTOMER_COLUMNS} FROM CUSTOMER WHERE ({_PHONE_SUFFIX}) '
+                                  'ORDER BY customer_id DESC LIMIT ?', ("4321", "4321:", 20)),
+    "customers by phone digits": (f'SELECT {CUSTOMER_COLUMNS} FROM CUSTOMER WHERE ({_PHONE_PREFIX} OR {_PHONE_SUFFIX}) '
+                                  'ORDER BY customer_id DESC LIMIT ?', ("0300", "0300:", "0030", "0030:", 20)),
+    "customers by phone digits, next page": (f'SELECT {CUSTOMER_COLUMNS} FROM CUSTOMER '
+                                             f'WHERE ({_PHONE_PREFIX} OR {_PHONE_SUFFIX}) AND customer_id < ? '
+                                             'ORDER BY customer_id DESC LIMIT ?',
+                                             ("0300", "0300:", "0030", "0030:", 1000, 20)),
+    "measurements of customers": (f'SELECT {MEASUREMENT_COLUMNS} FROM MEASUREMENT WHERE customer_id IN (?)', (1,)),
+    "orders of customers": (f'SELECT {ORDER_COLUMNS} FROM "ORDER" WHERE customer_id IN (?)', (1,)),
+    "customers by name start": (f'SELECT {CUSTOMER_COLUMNS} FROM CUSTOMER c WHERE {_NAME_STARTS} '
+                                'ORDER BY c.name COLLATE NOCASE LIMIT ?', ("ali", "ali\U0010ffff", 50)),
+    "customers by name word": ('SELECT c.customer_id, c.name, c.phone_number, c.address, c.notes, c.created_at '
+                               'FROM CUSTOMER_FTS JOIN CUSTOMER c ON c.customer_id = CUSTOMER_FTS.rowid '
+                               f'WHERE CUSTOMER_FTS MATCH ? AND NOT {_NAME_STARTS} '
+                               'ORDER BY CUSTOMER_FTS.rowid DESC LIMIT ?',
+                               ('{name} : ("ali"*)', "ali", "ali\U0010ffff", 50)),
+    "measurements by garment": (f'SELECT {MEASUREMENT_COLUMNS} FROM MEASUREMENT WHERE garment_type = ?', ("shirt",)),
+    "orders by garment": (f'SELECT {ORDER_COLUMNS} FROM "ORDER" WHERE garment_type = ?', ("shirt",)),
+    "customers with orders in date range": (f'SELECT {CUSTOMER_COLUMNS} FROM CUSTOMER WHERE customer_id IN ({_CUSTOMERS_IN_RANGE}) '
+                                            'ORDER BY customer_id DESC', ("2025-01-01", "2025-01-31")),
+    "measurements of customers with orders in date range": (f'SELECT {MEASUREMENT_COLUMNS} FROM MEASUREMENT '
+                                                            f'WHERE customer_id IN ({_CUSTOMERS_IN_RANGE})',
+                                                            ("2025-01-01", "2025-01-31")),
+    "orders of customers with orders in date range": (f'SELECT {ORDER_COLUMNS} FROM "ORDER" '
+                                                      f'WHERE customer_id IN ({_CUSTOMERS_IN_RANGE}) ORDER BY order_id DESC',
+                                                      ("2025-01-01", "2025-01-31")),
+    "monthly summary": ('SELECT order_count, total_amount, advance_payment, discount, balance_due '
+                        'FROM MONTHLY_SUMMARY WHERE month = ?', ("2025-01",)),
+    "monthly status summary": ('SELECT status, order_count FROM MONTHLY_STATUS_SUMMARY WHERE month = ?', ("2025-01",)),
+    "monthly garment summary": ('SELECT garment_type, order_count, total_amount FROM MONTHLY_GARMENT_SUMMARY '
+                                'WHERE month = ? AND order_count > 0 ORDER BY garment_type', ("2025-01",)),
+    "pending orders in month": (f'SELECT {ORDER_COLUMNS} FROM "ORDER" '
+                                "WHERE order_date >= ? AND order_date < ? AND status != 'delivered' "
+                                'ORDER BY delivery_date IS NULL, delivery_date, order_id', ("2025-01-01", "2025-02-01")),
+    "undelivered orders by delivery date": (_WORKLOAD_QUERY + 'AND o.delivery_date BETWEEN ? AND ? '
+                                            'ORDER BY o.delivery_date, o.order_id',
+                                            (*OPEN_ORDER_STATUSES, "2025-01-01", "2025-01-07")),
+    "undelivered orders of a garment by delivery date": (_WORKLOAD_QUERY + 'AND o.delivery_date BETWEEN ? AND ? '
+                                                         'AND o.garment_type = ? ORDER BY o.delivery_date, o.order_id',
+                                                         (*OPEN_ORDER_STATUSES, "2025-01-01", "2025-01-07", "shirt")),
+    "overdue orders": (_WORKLOAD_QUERY + 'AND o.delivery_date < ? ORDER BY o.delivery_date, o.order_id',
+                       (*OPEN_ORDER_STATUSES, "2025-01-01")),
+    "overdue orders of a garment": (_WORKLOAD_QUERY + 'AND o.delivery_date < ? AND o.garment_type = ? '
+                                    'ORDER BY o.delivery_date, o.order_id', (*OPEN_ORDER_STATUSES, "2025-01-01", "shirt")),
+    "order status counters": ('SELECT status, order_count, total_amount, balance_due FROM ORDER_STATUS_COUNTER', ()),
+    "daily order counter": ('SELECT order_count, total_amount FROM DAILY_ORDER_COUNTER WHERE order_date = ?', ("2025-01-01",)),
+    "customers changed since": (f'SELECT change_seq, {CUSTOMER_COLUMNS}, updated_at FROM CUSTOMER '
+                                'WHERE change_seq > ? ORDER BY change_seq LIMIT ?', (0, 501)),
+    "measurements changed since": (f'SELECT change_seq, {MEASUREMENT_COLUMNS}, updated_at FROM MEASUREMENT '
+                                   'WHERE change_seq > ? ORDER BY change_seq LIMIT ?', (0, 501)),
+    "orders changed since": (f'SELECT change_seq, {ORDER_COLUMNS}, updated_at FROM "ORDER" '
+                             'WHERE change_seq > ? ORDER BY change_seq LIMIT ?', (0, 501)),
+    "tombstones since": ('SELECT change_seq, entity, entity_id FROM TOMBSTONE '
+                         'WHERE change_seq > ? ORDER BY change_seq LIMIT ?', (0, 501)),
+}
+
+# Hot queries that have to use one particular index, not just any - name -> index
+EXPECTED_INDEXES = {
+    "undelivered orders by delivery date": "idx_order_status_delivery_date",
+    "undelivered orders of a garment by delivery date": "idx_order_status_delivery_date",
+    "overdue orders": "idx_order_status_delivery_date",
+    "overdue orders of a garment": "idx_order_status_delivery_date",
+    "customers by phone prefix": "idx_customer_phone_digits",
+    "customers by phone suffix": "idx_customer_phone_digits_reversed",
+    "customers by name start": "idx_customer_name",
+}
+
+# Tables read whole on purpose - one row per order status
+SMALL_TABLES = ("ORDER_STATUS_COUNTER",)
+
+
+def get_schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def migrate(conn, target=SCHEMA_VERSION):
+    """Apply pending migrations up to target, one transaction per migration"""
+    applied = []
+    for version, description, statements in MIGRATIONS:
+        if version > target:
+            break
+        # IMMEDIATE takes the write lock before re-checking the version, so two
+        # processes starting at once cannot both apply the same migration
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if get_schema_version(conn) >= version:
+                conn.rollback()
+                continue
+            for statement in statements:
+                if callable(statement):
+                    statement(conn)
+                else:
+                    conn.execute(statement)
+            conn.execute(f'PRAGMA user_version = {version}')
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append((version, description))
+    return applied
+
+
+def explain(conn, sql, params=()):
+    """Return the EXPLAIN QUERY PLAN detail lines for a statement"""
+    return [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}', params)]
+
+
+def plan_failure(plan, index=None):
+    """True when a plan reads a whole table (other than SMALL_TABLES), or does not use index"""
+    # "SCAN t USING INDEX" walks an index in order, a bare "SCAN t" reads every row
+    for line in plan:
+        if line.startswith('SCAN') and 'INDEX' not in line and line.split()[1] not in SMALL_TABLES:
+            return True
+    return index is not None and not any(f'INDEX {index} ' in f'{line} ' for line in plan)
+
+
+def check_query_plans(conn, queries=None):
+    """Return {name: plan} for every hot query that scans a table or misses its expected index"""
+    failures = {}
+    for name, (sql, params) in (queries or HOT_QUERIES).items():
+        plan = explain(conn, sql, params)
+        if plan_failure(plan, EXPECTED_INDEXES.get(name)):
+            failures[name] = plan
+    return failures
+
+
+def _counter_rows(conn, table):
+    """{key: values} of a counter table, rounded to cents and without all-zero rows"""
+    columns = [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+    keys = [row[1] for row in conn.execute(f'PRAGMA table_info({table})') if row[5]]
+    rows = {}
+    for row in conn.execute(f'SELECT * FROM {table}'):
+        values = dict(zip(columns, row))
+        key = tuple(values.pop(column) for column in keys)
+        values = {column: round(value, 2) for column, value in values.items()}
+        if any(values.values()):
+            rows[key] = values
+    return rows
+
+
+def rebuild_counters(conn):
+    """Recompute every trigger-maintained counter table from "ORDER" in one transaction.
+
+    Returns {table: [(key, stored, recomputed)]} for the rows the triggers had
+    got wrong - empty when the counters were consistent.
+    """
+    drift = {}
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        for tables, rebuild in COUNTER_TABLES:
+            before = {table: _counter_rows(conn, table) for table in tables}
+            rebuild(conn)
+            for table in tables:
+                after = _counter_rows(conn, table)
+                wrong = [(key, before[table].get(key), after.get(key))
+                         for key in sorted(before[table].keys() | after.keys(), key=str)
+                         if before[table].get(key) != after.get(key)]
+                if wrong:
+                    drift[table] = wrong
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return drift
+
+
+if __name__ == "__main__":
+    # python migrations.py [database]  - migrate, then verify the hot query plans
+    # python migrations.py [database] --rebuild-counters  - also recompute the counter tables, reporting drift
+    arguments = [argument for argument in sys.argv[1:] if not argument.startswith("--")]
+    database = arguments[0] if arguments else "tailorshop.db"
+    conn = sqlite3.connect(database)
+    for version, description in migrate(conn):
+        print(f"Applied migration {version}: {description}")
+    print(f"Schema version: {get_schema_version(conn)}")
+
+    failures = check_query_plans(conn)
+    for name, (sql, params) in HOT_QUERIES.items():
+        status = "FAIL" if name in failures else "ok"
+        print(f"[{status}] {name}: {' | '.join(explain(conn, sql, params))}")
+
+    if "--rebuild-counters" in sys.argv:
+        drift = rebuild_counters(conn)
+        for table, rows in drift.items():
+            for key, stored, recomputed in rows:
+                print(f"[drift] {table} {key}: stored {stored}, recomputed {recomputed}")
+        print(f"Counters rebuilt: {sum(map(len, drift.values()))} rows were out of date")
+    conn.close()
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,76 @@
+# rows.py
+import json
+import time
+from datetime import date, datetime
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+
+from metrics import record_serialization
+
+try:
+    import orjson  # optional - several times faster than the standard library encoder
+except ImportError:
+    orjson = None
+
+
+def row_mapper(columns, converters=None):
+    """Build a row -> dict function once from a comma-separated column list.
+
+    Rows must be selected with the same column list. converters maps a column
+    name to a function applied to its value.
+    """
+    names = tuple(name.strip() for name in columns.split(","))
+    if not converters:
+        return lambda row: dict(zip(names, row))
+
+    converted = [(name, converters[name]) for name in names if name in converters]
+
+    def to_dict(row):
+        item = dict(zip(names, row))
+        for name, convert in converted:
+            item[name] = convert(item[name])
+        return item
+    return to_dict
+
+
+def iso_timestamp(value):
+    """SQLite CURRENT_TIMESTAMP text in the ISO form the response models produce"""
+    return value.replace(" ", "T", 1) if isinstance(value, str) else value
+
+
+def _default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if hasattr(value, "dict"):
+        return value.dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content):
+    """Encode to JSON bytes, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, separators=(",", ":"), default=_default).encode()
+
+
+class TimedJSONResponse(JSONResponse):
+    """The app's default response class - the stock encoder, with its time counted as serialization.
+
+    Covers dicts and models FastAPI serializes itself; the jsonable_encoder and
+    response_model validation passes before render() are not included.
+    """
+
+    def render(self, content):
+        started = time.perf_counter()
+        body = super().render(content)
+        record_serialization(time.perf_counter() - started)
+        return body
+
+
+def json_response(content, headers=None):
+    """JSON response for rows read from our own tables - skips response_model revalidation"""
+    started = time.perf_counter()
+    body = dumps(content)
+    record_serialization(time.perf_counter() - started)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,256 @@
+# similar.py
+import threading
+
+try:
+    import numpy as np  # optional - /measurements/{id}/similar is unavailable without it
+except ImportError:
+    np = None
+
+# Body dimensions compared between measurements (inches)
+DIMENSIONS = ("chest", "waist", "length", "shoulder", "arm_length", "arm_opening", "neck", "shalwar_length",
+              "shalwar_bottom", "kamee_length", "hip", "kurta_length", "pajama_length", "pajama_bottom")
+
+
+def presence_bits(present):
+    """Bitmask of the dimensions present, per row (fits in 16 bits)"""
+    return np.packbits(present, axis=-1, bitorder="little").view("<u2")
+
+
+class GarmentMatrix:
+    """Dimensions of every measurement of one garment type, laid out for a single matrix-vector product.
+
+    Each row holds [x^2 | x] for its measurement, where x is the dimensions minus a
+    per-garment offset (keeps float32 precise) and 0 where the dimension is NULL.
+    The squared distance to a query q over the dimensions both have then expands to
+
+        sum(x^2 over q's dims) - 2 x.q + sum(q^2 over the row's dims)
+
+    The first two terms come from one GEMV over the matrix. The last term and the
+    number of shared dimensions depend only on which dimensions the row has, so
+    they are computed once per NULL pattern and gathered by pattern code.
+    Rows are packed: a removed row is filled with the last one.
+    """
+
+    def __init__(self, offsets, capacity=1024):
+        self.offsets = offsets
+        self.size = 0
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.data = np.zeros((capacity, 2 * len(DIMENSIONS)), dtype=np.float32)
+        self.codes = np.zeros(capacity, dtype=np.int32)
+        self.patterns = {}  # presence bitmask -> code
+        self.pattern_present = np.zeros((0, len(DIMENSIONS)), dtype=np.float32)
+        self.positions = {}
+
+    @classmethod
+    def build(cls, ids, values):
+        """Matrix for ids and a (rows, dimensions) float32 array with NaN for NULL"""
+        present = ~np.isnan(values)
+        counts = present.sum(axis=0)
+        offsets = np.where(counts > 0, np.nansum(values, axis=0) / np.maximum(counts, 1), 0).astype(np.float32)
+        matrix = cls(offsets, capacity=max(1024, len(ids)))
+        size = matrix.size = len(ids)
+        centered = np.where(present, values - offsets, 0)
+        matrix.data[:size, :len(DIMENSIONS)] = centered * centered
+        matrix.data[:size, len(DIMENSIONS):] = centered
+        matrix.ids[:size] = ids
+        # One pass groups the rows by NULL pattern; the pattern table is filled in one go
+        bits, codes = np.unique(presence_bits(present).ravel(), return_inverse=True)
+        matrix.codes[:size] = codes.ravel()
+        matrix.patterns = dict(zip(bits.tolist(), range(len(bits))))
+        matrix.pattern_present = ((bits[:, None] >> np.arange(len(DIMENSIONS))) & 1).astype(np.float32)
+        matrix.positions = dict(zip(ids.tolist(), range(size)))
+        return matrix
+
+    def _pattern(self, bitmask):
+        code = self.patterns.get(bitmask)
+        if code is None:
+            code = self.patterns[bitmask] = len(self.patterns)
+            row = ((bitmask >> np.arange(len(DIMENSIONS))) & 1).astype(np.float32)
+            self.pattern_present = np.vstack([self.pattern_present, row])
+        return code
+
+    def _grow(self):
+        capacity = self.ids.shape[0] * 2
+        self.ids = np.resize(self.ids, capacity)
+        self.codes = np.resize(self.codes, capacity)
+        data = np.zeros((capacity, self.data.shape[1]), dtype=np.float32)
+        data[:self.size] = self.data[:self.size]
+        self.data = data
+
+    def upsert(self, measurement_id, vector):
+        row = self.positions.get(measurement_id)
+        if row is None:
+            if self.size == self.ids.shape[0]:
+                self._grow()
+            row = self.size
+            self.size += 1
+            self.positions[measurement_id] = row
+            self.ids[row] = measurement_id
+        present = ~np.isnan(vector)
+        centered = np.where(present, vector - self.offsets, 0)
+        self.data[row, :len(DIMENSIONS)] = centered * centered
+        self.data[row, len(DIMENSIONS):] = centered
+        self.codes[row] = self._pattern(int(presence_bits(present)[0]))
+
+    def remove(self, measurement_id):
+        row = self.positions.pop(measurement_id, None)
+        if row is None:
+            return
+        last = self.size - 1
+        if row != last:
+            moved = int(self.ids[last])
+            self.ids[row] = moved
+            self.data[row] = self.data[last]
+            self.codes[row] = self.codes[last]
+            self.positions[moved] = row
+        self.size = last
+
+    def vector(self, measurement_id):
+        row = self.positions[measurement_id]
+        present = self.pattern_present[self.codes[row]] > 0
+        return np.where(present, self.data[row, len(DIMENSIONS):] + self.offsets, np.nan)
+
+    def nearest(self, query, k, exclude=None, min_shared=None):
+        """(ids, distances, shared) of the k rows closest to query.
+
+        The distance is the root mean square difference over the dimensions both
+        rows have; rows sharing fewer than min_shared (default: half of the
+        query's dimensions) are skipped.
+        """
+        size = self.size
+        wanted = ~np.isnan(query)
+        if size == 0 or not wanted.any():
+            return [], [], []
+        if min_shared is None:
+            min_shared = (int(wanted.sum()) + 1) // 2
+
+        mask = wanted.astype(np.float32)
+        centered = np.where(wanted, query - self.offsets, 0).astype(np.float32)
+        squared = self.data[:size] @ np.concatenate([mask, -2 * centered])
+
+        # Per NULL pattern: shared dimension count and the query's own squared term
+        shared = self.pattern_present @ mask
+        scale = np.where(shared >= min_shared, 1 / np.maximum(shared, 1), np.inf).astype(np.float32)
+        codes = self.codes[:size]
+        squared += (self.pattern_present @ (centered * centered))[codes]
+        np.maximum(squared, 0, out=squared)  # float32 rounding on identical rows
+        with np.errstate(invalid="ignore"):
+            squared *= scale[codes]  # mean square; inf (or NaN for 0 * inf) when too few are shared
+        if exclude is not None and exclude in self.positions:
+            squared[self.positions[exclude]] = np.inf
+
+        k = min(k, size)
+        best = np.argpartition(squared, k - 1)[:k] if k < size else np.arange(size)
+        best = best[np.argsort(squared[best], kind="stable")]
+        best = best[np.isfinite(squared[best])]
+        return (self.ids[best].tolist(), np.sqrt(squared[best]).tolist(),
+                shared[codes[best]].astype(int).tolist())
+
+
+class MeasurementIndex:
+    """In-memory k-NN index over MEASUREMENT, one GarmentMatrix per garment_type.
+
+    Built on first use from the database, then kept current by the write handlers
+    through upsert() / remove(). Changes that arrive while a build is running are
+    replayed on top of it, and invalidate() forces a rebuild (bulk imports), also of a
+    build that was running when it was called.
+    Searches and updates share a lock, so it is safe to search from a worker thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+        self._matrices = None
+        self._garment_of = {}
+        self._pending = None
+        self._builds = 0
+        self._generation = 0  # bumped by invalidate(), so a build running across one is redone
+
+    def ensure_built(self, conn):
+        """Build from conn unless already built - blocks while another thread builds"""
+        if self._matrices is not None:
+            return
+        with self._build_lock:
+            columns = ", ".join(DIMENSIONS)
+            # Build again when invalidate() ran during the build - the rows read may be stale
+            while self._matrices is None:
+                with self._lock:
+                    self._pending = []
+                    generation = self._generation
+                matrices = {}
+                garment_of = {}
+                garment_types = [row[0] for row in conn.execute('SELECT DISTINCT garment_type FROM MEASUREMENT')]
+                for garment_type in garment_types:
+                    rows = conn.execute(f'SELECT measurement_id, {columns} FROM MEASUREMENT WHERE garment_type = ?',
+                                        (garment_type,)).fetchall()
+                    # None becomes NaN in a float array
+                    data = np.array(rows, dtype=np.float64).reshape(len(rows), len(DIMENSIONS) + 1)
+                    matrix = GarmentMatrix.build(data[:, 0].astype(np.int64), data[:, 1:].astype(np.float32))
+                    matrices[garment_type] = matrix
+                    garment_of.update(dict.fromkeys(matrix.positions, garment_type))
+                with self._lock:
+                    pending, self._pending = self._pending, None
+                    if self._generation != generation:
+                        continue
+                    self._matrices = matrices
+                    self._garment_of = garment_of
+                    for change in pending:
+                        self._apply(*change)
+                    self._builds += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._generation += 1
+            self._matrices = None
+            self._garment_of = {}
+
+    def upsert(self, measurement):
+        """Add or refresh a measurement from its response dict"""
+        self._change(measurement["measurement_id"], measurement["garment_type"],
+                     [measurement.get(name) for name in DIMENSIONS])
+
+    def remove(self, *measurement_ids):
+        for measurement_id in measurement_ids:
+            self._change(measurement_id, None, None)
+
+    def _change(self, measurement_id, garment_type, vector):
+        # Nothing to keep current until the first search builds the index
+        if self._matrices is None and self._pending is None:
+            return
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((measurement_id, garment_type, vector))
+            if self._matrices is not None:
+                self._apply(measurement_id, garment_type, vector)
+
+    def _apply(self, measurement_id, garment_type, vector):
+        previous = self._garment_of.pop(measurement_id, None)
+        if previous is not None and previous != garment_type:
+            self._matrices[previous].remove(measurement_id)
+        if garment_type is not None:
+            vector = np.array(vector, dtype=np.float32)  # None becomes NaN
+            if garment_type not in self._matrices:
+                self._matrices[garment_type] = GarmentMatrix(np.nan_to_num(vector))
+            self._matrices[garment_type].upsert(measurement_id, vector)
+            self._garment_of[measurement_id] = garment_type
+
+    def similar(self, conn, measurement_id, k):
+        """[(measurement_id, distance, shared_dimensions)] closest first, or None if the id is unknown"""
+        self.ensure_built(conn)
+        with self._lock:
+            garment_type = self._garment_of.get(measurement_id)
+            if garment_type is None:
+                return None
+            matrix = self._matrices[garment_type]
+            ids, distances, shared = matrix.nearest(matrix.vector(measurement_id), k, exclude=measurement_id)
+        return list(zip(ids, distances, shared))
+
+    def stats(self):
+        with self._lock:
+            if self._matrices is None:
+                return {"built": False, "builds": self._builds}
+            return {
+                "built": True,
+                "builds": self._builds,
+                "measurements": {garment_type: matrix.size for garment_type, matrix in self._matrices.items()},
+            }
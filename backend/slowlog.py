@@ -0,0 +1,103 @@
+# slowlog.py
+import logging
+import re
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger("tailorshop.slow_queries")
+
+_WHITESPACE = re.compile(r"\s+")
+# String and numeric literals inlined into the SQL (identifiers like t1 are left alone)
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+# IN (?, ?, ?) lists of any length (including one) share one fingerprint
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+# Statements EXPLAIN QUERY PLAN can describe - BEGIN / COMMIT / PRAGMA are logged without a plan
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "REPLACE")
+
+
+def fingerprint(sql):
+    """SQL with whitespace collapsed and literals replaced by ?, so dynamic variants group together"""
+    sql = _WHITESPACE.sub(" ", sql).strip()
+    return _PLACEHOLDER_LIST.sub("(?, ...)", _LITERALS.sub("?", sql))
+
+
+def parameter_shape(parameters):
+    """Types of the bound parameters without their values, e.g. ["str", "int"]"""
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    return [type(value).__name__ for value in parameters]
+
+
+def query_plan(conn, sql, parameters):
+    """EXPLAIN QUERY PLAN detail lines, or None when the statement has no plan"""
+    if not sql.lstrip().upper().startswith(_EXPLAINABLE):
+        return None
+    # A plain cursor, so the EXPLAIN itself is neither timed nor counted
+    try:
+        return [row[3] for row in sqlite3.Cursor(conn).execute(f'EXPLAIN QUERY PLAN {sql}', parameters)]
+    except sqlite3.Error as e:
+        return [f"EXPLAIN failed: {e}"]
+
+
+class SlowQueryLog:
+    """Statements slower than threshold seconds, logged and aggregated by fingerprint.
+
+    Keeps at most max_fingerprints aggregates; when full, a new fingerprint replaces
+    the one with the least total time. Safe to call from any thread.
+    """
+
+    def __init__(self, threshold=0.2, max_fingerprints=200):
+        self.threshold = threshold
+        self.max_fingerprints = max_fingerprints
+        self._lock = threading.Lock()
+        self._queries = {}
+        self._logged = 0
+
+    def record(self, conn, sql, parameters, seconds, rows):
+        shape = parameter_shape(parameters) if parameters is not None else "executemany"
+        plan = query_plan(conn, sql, parameters) if parameters is not None else None
+        key = fingerprint(sql)
+        logger.warning("slow query %.1f ms, %d rows: %s params=%s plan=%s",
+                       seconds * 1000, rows, key, shape, " | ".join(plan or ()))
+
+        with self._lock:
+            self._logged += 1
+            entry = self._queries.get(key)
+            if entry is None:
+                if len(self._queries) >= self.max_fingerprints:
+                    del self._queries[min(self._queries, key=lambda k: self._queries[k]["total_seconds"])]
+                entry = self._queries[key] = {"fingerprint": key, "count": 0, "total_seconds": 0.0,
+                                              "max_seconds": 0.0, "rows": 0}
+            entry["count"] += 1
+            entry["total_seconds"] += seconds
+            entry["max_seconds"] = max(entry["max_seconds"], seconds)
+            entry["rows"] += rows
+            entry["last_parameters"] = shape
+            entry["last_plan"] = plan
+            entry["last_seen"] = time.time()
+
+    def top(self, limit=20, sort="total_seconds"):
+        """The limit slowest fingerprints, by total_seconds, max_seconds or count"""
+        with self._lock:
+            entries = sorted(self._queries.values(), key=lambda entry: entry[sort], reverse=True)[:limit]
+            return [{
+                "fingerprint": entry["fingerprint"],
+                "count": entry["count"],
+                "total_ms": round(entry["total_seconds"] * 1000, 3),
+                "max_ms": round(entry["max_seconds"] * 1000, 3),
+                "average_ms": round(entry["total_seconds"] * 1000 / entry["count"], 3),
+                "rows": entry["rows"],
+                "last_parameters": entry["last_parameters"],
+                "last_plan": entry["last_plan"],
+                "last_seen": entry["last_seen"],
+            } for entry in entries]
+
+    def stats(self):
+        with self._lock:
+            return {"threshold_ms": self.threshold * 1000, "logged": self._logged,
+                    "fingerprints": len(self._queries), "max_fingerprints": self.max_fingerprints}
+
+    def clear(self):
+        with self._lock:
+            self._queries.clear()
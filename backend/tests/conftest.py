@@ -0,0 +1,62 @@
+# conftest.py
+import os
+import sqlite3
+import sys
+import tempfile
+from contextlib import contextmanager
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# main reads its settings at import time, so point it at a scratch database first
+DATABASE = os.path.join(tempfile.mkdtemp(prefix="tailorshop-tests-"), "test.db")
+os.environ["TAILORSHOP_DB"] = DATABASE
+os.environ.setdefault("TAILORSHOP_SLOW_QUERY_MS", "0")
+
+from benchmarks.datagen import generate  # noqa: E402
+
+# Enough rows that the planner's choices match a real shop's
+generate(DATABASE, customers=2000)
+
+import main  # noqa: E402
+from metrics import InstrumentedConnection  # noqa: E402
+
+
+class StatementRecorder:
+    """Stands in for the slow query log with a zero threshold - keeps every statement run"""
+    threshold = 0
+
+    def __init__(self):
+        self.statements = []
+
+    def record(self, conn, sql, parameters, seconds, rows):
+        self.statements.append((sql, parameters))
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    with TestClient(main.app) as client:
+        yield client
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(DATABASE)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def capture():
+    """capture() as a context manager yields the list of (sql, parameters) executed inside it"""
+    @contextmanager
+    def recording():
+        recorder = StatementRecorder()
+        previous, InstrumentedConnection.slow_log = InstrumentedConnection.slow_log, recorder
+        try:
+            yield recorder.statements
+        finally:
+            InstrumentedConnection.slow_log = previous
+    return recording
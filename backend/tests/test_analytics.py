@@ -0,0 +1,59 @@
+# test_analytics.py
+import sqlite3
+
+import pytest
+
+from analytics import SizeDistribution
+from migrations import GARMENT_TYPES
+
+pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def scratch(conn, tmp_path):
+    """A copy of the test database this test may write to directly"""
+    copy = sqlite3.connect(tmp_path / "sizes.db")
+    conn.backup(copy)
+    yield copy
+    copy.close()
+
+
+def test_refresh_matches_a_full_recompute(scratch):
+    queries = [dict(garment_types=GARMENT_TYPES),
+               dict(garment_types=("shirt", "pants"), latest_per_customer=False),
+               dict(garment_types=("2-piece",), start="2023-01-01", end="2024-06-30", bins=8, sizes=3)]
+    incremental = SizeDistribution()
+    before = [incremental.compute(scratch, **query) for query in queries]
+
+    # Measurements no order points at, so deleting them keeps the foreign keys intact
+    free = [row[0] for row in scratch.execute(
+        'SELECT measurement_id FROM MEASUREMENT WHERE measurement_id NOT IN '
+        '(SELECT measurement_id FROM "ORDER" WHERE measurement_id IS NOT NULL) ORDER BY measurement_id LIMIT 6')]
+    customer_id, latest = scratch.execute('SELECT customer_id, max(measurement_date) FROM MEASUREMENT '
+                                          "WHERE garment_type = 'shirt' GROUP BY customer_id LIMIT 1").fetchone()
+    with scratch:
+        scratch.execute('UPDATE MEASUREMENT SET chest = chest + 30, waist = NULL WHERE measurement_id = ?', (free[0],))
+        scratch.execute("UPDATE MEASUREMENT SET garment_type = 'pants', measurement_date = '2023-03-03', "
+                        'chest = NULL, pajama_length = 39 WHERE measurement_id = ?', (free[1],))
+        scratch.execute("UPDATE MEASUREMENT SET measurement_date = '2024-02-29' WHERE measurement_id = ?", (free[2],))
+        scratch.execute('DELETE FROM MEASUREMENT WHERE measurement_id IN (?, ?)', free[3:5])
+        # A newer shirt for a customer who already has one replaces it in the per-customer view
+        scratch.execute("INSERT INTO MEASUREMENT (customer_id, measurement_date, garment_type, chest, waist) "
+                        "VALUES (?, date(?, '+1 day'), 'shirt', 55, 50)", (customer_id, latest))
+        scratch.executemany("INSERT INTO MEASUREMENT (customer_id, measurement_date, garment_type, chest, hip) "
+                            "VALUES (?, '2024-01-15', '2-piece', ?, ?)", [(1, 38, 40), (2, 47.5, 44)])
+
+    after = [incremental.compute(scratch, **query) for query in queries]
+    assert incremental.stats()["version"] == 2
+    assert after != before
+    assert after == [SizeDistribution().compute(scratch, **query) for query in queries]
+
+    # Two shirts measured the same day: the later id wins, wherever a delete moved the rows
+    with scratch:
+        scratch.executemany("INSERT INTO MEASUREMENT (customer_id, measurement_date, garment_type, chest) "
+                            "VALUES (?, '2030-01-01', 'shirt', ?)", [(customer_id, 36), (customer_id, 60)])
+    incremental.compute(scratch, **queries[0])
+    with scratch:
+        scratch.execute('DELETE FROM MEASUREMENT WHERE measurement_id = ?', (free[5],))
+    assert [incremental.compute(scratch, **query) for query in queries] == [
+        SizeDistribution().compute(scratch, **query) for query in queries]
@@ -0,0 +1,65 @@
+# test_counters.py
+import os
+import subprocess
+import sys
+from datetime import date, timedelta
+
+import main
+from migrations import OPEN_ORDER_STATUSES, ORDER_STATUSES
+
+
+def create_order(client, customer_id, measurement_id, order_date, total_amount, status="order-book"):
+    response = client.post("/orders/", json={"customer_id": customer_id, "measurement_id": measurement_id,
+                                             "order_date": order_date, "total_amount": total_amount,
+                                             "advance_payment": 500, "status": status, "garment_type": "shirt"})
+    assert response.status_code == 200
+    return response.json()["order_id"]
+
+
+def new_customer_with_measurement(client):
+    customer = {"name": "Counter Test", "phone_number": "0301-7654321"}
+    customer_id = client.post("/customers/", json=customer).json()["customer_id"]
+    measurement_id = client.post("/measurements/", json={"customer_id": customer_id, "measurement_date": "2024-05-01",
+                                                         "garment_type": "shirt", "chest": 40}).json()["measurement_id"]
+    return customer_id, measurement_id
+
+
+def test_dashboard_counters_match_a_fresh_count_after_mixed_writes(client, conn):
+    today = date.today().isoformat()
+    yesterday = (date.today() - timedelta(days=1)).isoformat()
+    kept_customer, kept_measurement = new_customer_with_measurement(client)
+    gone_customer, gone_measurement = new_customer_with_measurement(client)
+
+    orders = [create_order(client, kept_customer, kept_measurement, day, amount, status)
+              for day, amount, status in ((today, 2500, "order-book"), (today, 4000, "cutting"),
+                                          (yesterday, 1800, "stitching"), (today, 3200, "ready-to-deliver"))]
+    for _ in range(3):
+        create_order(client, gone_customer, gone_measurement, today, 5000)
+
+    # Amount, status and date changes, a direct delete and a cascade delete
+    assert client.put(f"/orders/{orders[0]}", json={"total_amount": 2700, "advance_payment": 1000}).status_code == 200
+    assert client.put(f"/orders/{orders[1]}", json={"status": "delivered"}).status_code == 200
+    assert client.put(f"/orders/{orders[2]}", json={"order_date": today, "status": "cutting"}).status_code == 200
+    assert client.delete(f"/orders/{orders[3]}").status_code == 200
+    assert client.delete(f"/customers/{gone_customer}").status_code == 200
+
+    dashboard = client.get("/dashboard").json()
+    counts = dict(conn.execute('SELECT status, count(*) FROM "ORDER" GROUP BY status').fetchall())
+    balances = dict(conn.execute('SELECT status, sum(balance_due) FROM "ORDER" GROUP BY status').fetchall())
+    today_count, today_amount = conn.execute('SELECT count(*), coalesce(sum(total_amount), 0) FROM "ORDER" '
+                                             'WHERE order_date = ?', (today,)).fetchone()
+
+    assert dashboard["orders_by_status"] == {status: counts.get(status, 0) for status in ORDER_STATUSES}
+    assert dashboard["open_orders"] == sum(counts.get(status, 0) for status in OPEN_ORDER_STATUSES)
+    assert dashboard["total_orders"] == conn.execute('SELECT count(*) FROM "ORDER"').fetchone()[0]
+    assert (dashboard["new_orders_today"], dashboard["new_order_amount_today"]) == (today_count, round(today_amount, 2))
+    assert dashboard["balance_due_by_status"] == {status: round(balances.get(status) or 0, 2)
+                                                  for status in ORDER_STATUSES}
+    assert dashboard["balance_due"] == round(sum(balance or 0 for balance in balances.values()), 2)
+
+    result = subprocess.run([sys.executable, "migrations.py", main.DATABASE_NAME, "--rebuild-counters"],
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert "[drift]" not in result.stdout
+    assert "Counters rebuilt: 0 rows were out of date" in result.stdout
@@ -0,0 +1,53 @@
+# test_entity_cache.py
+import main
+from cache import EntityCache
+
+
+def test_held_keys_are_neither_served_nor_cached():
+    cache = EntityCache()
+    cache.put("customer", 1, {"name": "Old"})
+    generation = cache.generation()
+    cache.hold("customer", 1)
+    assert cache.get("customer", 1) is None
+    cache.put("customer", 1, {"name": "Old"}, cache.generation())
+    assert cache.get("customer", 1) is None
+    cache.release("customer", 1)
+    # A reader that started before the release may hold the old row
+    cache.put("customer", 1, {"name": "Old"}, generation)
+    assert cache.get("customer", 1) is None
+    cache.put("customer", 1, {"name": "New"}, cache.generation())
+    assert cache.get("customer", 1) == {"name": "New"}
+
+
+def test_no_stale_entry_between_commit_and_handler(client):
+    customer_id = client.post("/customers/", json={"name": "Old", "phone_number": "0300-7654321"}).json()["customer_id"]
+    assert client.get(f"/customers/{customer_id}").json()["name"] == "Old"
+    seen = {}
+
+    def after_commit():
+        # Committed, but the handler that wrote has not resumed yet
+        seen["cached"] = main.entity_cache.get("customer", customer_id)
+
+    def write(conn):
+        main.write_queue.after_transaction(after_commit)
+        conn.execute("UPDATE CUSTOMER SET name = 'New' WHERE customer_id = ?", (customer_id,))
+        main.invalidate_on_commit("customer", customer_id)
+
+    main.write_queue.execute(write)
+    assert seen["cached"] is None
+    response = client.get(f"/customers/{customer_id}")
+    assert response.json()["name"] == "New"
+    assert client.get(f"/customers/{customer_id}", headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+
+
+def test_created_entities_are_cached_as_stored(client):
+    customer_id = client.post("/customers/", json={"name": "Cached", "phone_number": "0300-1112223"}).json()["customer_id"]
+    measurement_id = client.post("/measurements/", json={"customer_id": customer_id, "measurement_date": "2024-02-01",
+                                                         "garment_type": "shirt", "chest": 40}).json()["measurement_id"]
+    order_id = client.post("/orders/", json={"customer_id": customer_id, "measurement_id": measurement_id,
+                                             "order_date": "2024-02-01", "total_amount": 1000,
+                                             "garment_type": "shirt"}).json()["order_id"]
+    paths = (f"/measurements/{measurement_id}", f"/orders/{order_id}")
+    cached = [client.get(path).content for path in paths]
+    main.entity_cache.clear()
+    assert [client.get(path).content for path in paths] == cached
@@ -0,0 +1,71 @@
+# test_events.py
+import json
+
+import main
+from events import EventBroker
+
+
+def drain(subscription):
+    """(event name, data) of every message queued for subscription"""
+    events = []
+    while not subscription.queue.empty():
+        fields = dict(line.split(": ", 1) for line in subscription.queue.get_nowait().strip().split("\n"))
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_entity_and_status_filters():
+    broker = EventBroker()
+    everything = broker.subscribe()
+    customers = broker.subscribe(entities=["customer"])
+    cutting = broker.subscribe(entities=["order"], statuses=["cutting"])
+
+    broker.publish("customer", "updated", 1, {"name": "A"})
+    broker.publish("order", "created", 2, status="order-book")
+    broker.publish("order", "updated", 3, status="cutting", previous_status="order-book")
+    broker.publish("order", "updated", 4, status="stitching", previous_status="cutting")
+    broker.publish("order", "deleted", 5, status="delivered")
+
+    assert [(e["entity"], e["id"]) for _, e in drain(everything)] == [
+        ("customer", 1), ("order", 2), ("order", 3), ("order", 4), ("order", 5)]
+    assert [e["id"] for _, e in drain(customers)] == [1]
+    # Orders entering and leaving the watched status, nothing else
+    assert [e["id"] for _, e in drain(cutting)] == [3, 4]
+
+
+def test_overflow_replaces_the_backlog_with_a_resync():
+    broker = EventBroker(max_queue=3)
+    slow = broker.subscribe()
+    for customer_id in range(1, 5):
+        broker.publish("customer", "updated", customer_id)
+
+    assert drain(slow) == [("resync", {})]
+    assert slow.overflows == 1
+    broker.publish("customer", "updated", 5)
+    assert [e["id"] for _, e in drain(slow)] == [5]
+    stats = broker.stats()
+    assert (stats["published"], stats["delivered"], stats["overflows"]) == (5, 4, 1)
+
+
+def test_subscriber_cap(client, monkeypatch):
+    broker = EventBroker(max_subscribers=2)
+    first = broker.subscribe()
+    assert broker.subscribe() is not None
+    assert broker.subscribe() is None
+    broker.unsubscribe(first)
+    assert broker.subscribe() is not None
+
+    monkeypatch.setattr(main, "event_broker", broker)
+    response = client.get("/events")
+    assert response.status_code == 503
+
+
+def test_order_update_reaches_subscribers_of_its_previous_status(client, conn):
+    order_id, = conn.execute('SELECT order_id FROM "ORDER" WHERE status = ? LIMIT 1', ("cutting",)).fetchone()
+    subscription = main.event_broker.subscribe(statuses=["cutting"])
+    try:
+        assert client.put(f"/orders/{order_id}", json={"status": "stitching"}).status_code == 200
+        assert [(name, e["id"], e["data"]["status"]) for name, e in drain(subscription)] == [
+            ("order", order_id, "stitching")]
+    finally:
+        main.event_broker.unsubscribe(subscription)
@@ -0,0 +1,100 @@
+# test_import.py
+import asyncio
+import json
+import sqlite3
+
+import main
+
+
+def customer(temp_id, name="Import Test"):
+    return {"entity": "customer", "temp_id": temp_id, "data": {"name": name, "phone_number": "0300-2223334"}}
+
+
+def measurement(temp_id, customer_ref=None, **data):
+    record = {"entity": "measurement", "temp_id": temp_id,
+              "data": {"measurement_date": "2024-05-01", "garment_type": "shirt", "chest": 40.0, **data}}
+    if customer_ref is not None:
+        record["customer_ref"] = customer_ref
+    return record
+
+
+def test_references_resolve_and_bad_rows_are_reported(client, conn):
+    records = [
+        customer("c1"),
+        measurement("m1", "c1"),
+        {"entity": "order", "temp_id": "o1", "customer_ref": "c1", "measurement_ref": "m1",
+         "data": {"order_date": "2024-05-02", "total_amount": 2500, "garment_type": "shirt"}},
+        measurement("m2", "c1", garment_type="cape"),
+        measurement("m3", "nope"),
+        "not an object",
+        {"entity": "invoice", "data": {}},
+    ]
+    report = client.post("/import", json=records).json()
+
+    assert report["received"] == 7
+    assert report["imported"] == {"customer": 1, "measurement": 1, "order": 1}
+    assert [error["index"] for error in report["errors"]] == [3, 4, 5, 6]
+    assert "Unresolved customer_ref 'nope'" in report["errors"][1]["error"]
+    ids = report["ids"]
+    assert set(ids) == {"c1", "m1", "o1"}
+    assert conn.execute('SELECT customer_id FROM MEASUREMENT WHERE measurement_id = ?', (ids["m1"],)).fetchone() == (ids["c1"],)
+    assert conn.execute('SELECT customer_id, measurement_id FROM "ORDER" WHERE order_id = ?',
+                        (ids["o1"],)).fetchone() == (ids["c1"], ids["m1"])
+
+
+def test_constraint_failure_falls_back_to_row_by_row(client, conn):
+    customer_id = client.post("/import", json=[customer("c1")]).json()["ids"]["c1"]
+    records = [measurement("m1", customer_id=customer_id),
+               measurement("m2", customer_id=10 ** 9),  # foreign key fails the executemany
+               measurement("m3", customer_id=customer_id, chest=42.0)]
+    report = client.post("/import", json=records).json()
+
+    assert report["imported"]["measurement"] == 2
+    assert [(error["index"], error["temp_id"]) for error in report["errors"]] == [(1, "m2")]
+    assert report["errors"][0]["error"].startswith("Constraint failed")
+    ids = report["ids"]
+    assert set(ids) == {"m1", "m3"}
+    assert conn.execute('SELECT chest FROM MEASUREMENT WHERE measurement_id = ?', (ids["m3"],)).fetchone() == (42.0,)
+
+
+def test_failed_chunk_returns_the_committed_part(client, conn, monkeypatch):
+    import_chunk = main.import_chunk
+    calls = []
+
+    def failing_second_chunk(conn, records, known_ids):
+        calls.append(records)
+        result = import_chunk(conn, records, known_ids)
+        if len(calls) == 2:
+            raise sqlite3.OperationalError("disk I/O error")
+        return result
+
+    monkeypatch.setattr(main, "IMPORT_CHUNK_SIZE", 2)
+    monkeypatch.setattr(main, "import_chunk", failing_second_chunk)
+    records = [customer(f"c{i}", name=f"Chunk Failure {i}") for i in range(5)]
+    response = client.post("/import", json=records)
+
+    assert response.status_code == 500
+    report = response.json()
+    assert report["detail"] == "Import stopped: disk I/O error"
+    assert report["imported"]["customer"] == 2
+    assert set(report["ids"]) == {"c0", "c1"}
+    assert [error["index"] for error in report["errors"]] == [2, 3]
+    names = [row[0] for row in conn.execute("SELECT name FROM CUSTOMER WHERE name LIKE 'Chunk Failure %' ORDER BY name")]
+    assert names == ["Chunk Failure 0", "Chunk Failure 1"]
+
+
+def test_json_array_is_decoded_as_it_arrives():
+    body = json.dumps([{"name": "Zoë"}, 12, [1, 2], {"n": 1.5}], ensure_ascii=False).encode()
+
+    async def pieces():
+        for start in range(0, len(body), 3):  # splits the multi-byte ë and the number too
+            yield body[start:start + 3]
+
+    async def decode():
+        return [record async for record in main.iter_json_array(pieces())]
+    assert asyncio.run(decode()) == [{"name": "Zoë"}, 12, [1, 2], {"n": 1.5}]
+
+
+def test_body_that_is_not_an_array_is_rejected(client):
+    assert client.post("/import", content=b'{"entity": "customer"}').status_code == 400
+    assert client.post("/import", content=b"").status_code == 400
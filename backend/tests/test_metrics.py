@@ -0,0 +1,66 @@
+# test_metrics.py
+import sqlite3
+import time
+
+from metrics import InstrumentedConnection
+from slowlog import SlowQueryLog
+
+
+def test_slow_query_is_logged_with_its_fetch_time_and_rows():
+    conn = sqlite3.connect(":memory:", factory=InstrumentedConnection)
+    conn.create_function("slow", 1, lambda value: time.sleep(0.002) or value)
+    slow_log = SlowQueryLog(threshold=0.001)
+    conn.slow_log = slow_log
+    # execute() steps to the first row only - the other 19 are computed while fetching
+    cursor = conn.execute("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 20) "
+                          "SELECT slow(i) FROM n")
+    assert slow_log.top() == []
+    rows = []
+    while batch := cursor.fetchmany(8):
+        rows += batch
+
+    [entry] = slow_log.top()
+    assert len(rows) == entry["rows"] == 20
+    assert entry["count"] == 1
+    assert entry["total_ms"] >= 40
+
+
+def scrape(client):
+    """{(metric name, labels): value} from /metrics"""
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    samples = {}
+    for line in response.text.splitlines():
+        if line.startswith("#"):
+            assert line.split()[1] in ("HELP", "TYPE")
+            continue
+        series, value = line.rsplit(" ", 1)
+        name, _, labels = series.partition("{")
+        samples[name, labels.rstrip("}")] = float(value)
+    return samples
+
+
+def test_metrics_exposition_after_requests(client):
+    before = scrape(client)
+    assert client.get("/customers/1").status_code == 200
+    assert client.get("/dashboard").status_code == 200
+    after = scrape(client)
+
+    def delta(name, labels):
+        return after[name, labels] - before.get((name, labels), 0)
+
+    customer = 'method="GET",route="/customers/{customer_id}"'
+    dashboard = 'method="GET",route="/dashboard"'
+    assert delta("tailorshop_http_responses_total", customer + ',status="200"') == 1
+    assert delta("tailorshop_http_request_duration_seconds_count", customer) == 1
+    assert delta("tailorshop_db_queries_total", dashboard) >= 2
+    # /dashboard returns a dict FastAPI encodes, which counts as serialization too
+    assert delta("tailorshop_serialization_seconds_total", dashboard) > 0
+
+    buckets = [value for (name, labels), value in after.items()
+               if name == "tailorshop_http_request_duration_seconds_bucket" and labels.startswith(customer)]
+    assert buckets == sorted(buckets)
+    assert buckets[-1] == after["tailorshop_http_request_duration_seconds_count", customer]
+    assert after["tailorshop_http_requests_in_flight", ""] == 1  # the scrape itself
+    assert ("tailorshop_db_pool_in_use", "") in after
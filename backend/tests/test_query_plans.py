@@ -0,0 +1,71 @@
+# test_query_plans.py
+import main
+from migrations import EXPECTED_INDEXES, HOT_QUERIES, check_query_plans, explain, plan_failure
+from slowlog import fingerprint
+
+# Requests whose statements must all be listed in HOT_QUERIES and served from an index
+HOT_REQUESTS = [
+    "/customers/5",
+    "/measurements/5",
+    "/orders/5",
+    "/customers/?limit=100&after_id=500",
+    "/measurements/?limit=100&after_id=500",
+    "/orders/?limit=100&after_id=500",
+    "/customers/?ids=1,2,3",
+    "/measurements/?ids=1,2,3",
+    "/orders/?ids=1,2,3",
+    "/customers/5/profile",
+    "/search/phone/0300?match=prefix",
+    "/search/phone/1234?match=suffix",
+    "/search/phone/0300?match=any",
+    "/search/phone/0300?match=any&after_id=1500",
+    "/search/name/Ali",
+    "/search/name/Khan",
+    "/search/garment/shirt",
+    "/search/date/?date_str=2023-03-01",
+    "/search/date/?from=2023-03-01&to=2023-03-07",
+    "/reports/monthly?year=2023&month=3",
+    "/workload?from=2024-01-01",
+    "/workload?from=2024-01-01&garment_type=shirt",
+    "/dashboard",
+    "/sync?since=0",
+]
+
+
+def test_hot_queries_use_their_indexes(conn):
+    assert check_query_plans(conn) == {}
+
+
+def test_plan_failure_catches_a_missed_index():
+    plan = ["SEARCH o USING INDEX idx_order_delivery_date (delivery_date<?)"]
+    assert plan_failure(plan, "idx_order_status_delivery_date")
+    assert not plan_failure(plan)
+    assert plan_failure(["SCAN ORDER"])
+
+
+def test_handlers_only_send_hot_queries(client, capture, conn):
+    """EXPLAIN the statements the handlers really send, as captured from their connections"""
+    names = {fingerprint(sql): name for name, (sql, _) in HOT_QUERIES.items()}
+    unlisted = []
+    failures = {}
+    seen = set()
+    for path in HOT_REQUESTS:
+        main.entity_cache.clear()  # so lookups by id reach SQLite
+        with capture() as statements:
+            assert client.get(path).status_code == 200, path
+        for sql, parameters in statements:
+            if not sql.lstrip().upper().startswith("SELECT"):
+                continue
+            name = names.get(fingerprint(sql))
+            if name is None:
+                unlisted.append((path, fingerprint(sql)))
+                continue
+            seen.add(name)
+            plan = explain(conn, sql, parameters)
+            if plan_failure(plan, EXPECTED_INDEXES.get(name)):
+                failures[name] = plan
+
+    assert unlisted == []
+    assert failures == {}
+    # Every entry is a statement some handler sends, not an approximation of one
+    assert set(HOT_QUERIES) - seen == set()
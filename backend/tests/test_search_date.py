@@ -0,0 +1,42 @@
+# test_search_date.py
+DAY = "2030-01-15"  # after every generated order
+
+
+def add_customer_with_order(client, day):
+    customer = client.post("/customers/", json={"name": "Date Search", "phone_number": "0300-1234567"}).json()
+    measurement = client.post("/measurements/", json={"customer_id": customer["customer_id"], "measurement_date": day,
+                                                      "garment_type": "shirt", "chest": 40.0}).json()
+    client.post("/orders/", json={"customer_id": customer["customer_id"], "measurement_id": measurement["measurement_id"],
+                                  "order_date": day, "total_amount": 1000, "garment_type": "shirt"})
+
+
+def search_queries(client, capture, **params):
+    with capture() as statements:
+        response = client.get("/search/date/", params=params)
+    assert response.status_code == 200
+    return response.json()["customers"], [sql for sql, _ in statements if sql.lstrip().upper().startswith("SELECT")]
+
+
+def test_query_count_does_not_grow_with_customers(client, capture):
+    add_customer_with_order(client, DAY)
+    customers, queries = search_queries(client, capture, date_str=DAY)
+    assert len(customers) == 1
+    assert len(queries) == 3
+
+    for _ in range(20):
+        add_customer_with_order(client, DAY)
+    customers, queries = search_queries(client, capture, date_str=DAY)
+    assert len(customers) == 21
+    assert len(queries) == 3
+    assert all(len(customer["orders"]) == 1 for customer in customers)
+
+    customers, queries = search_queries(client, capture, **{"from": "2030-01-01", "to": "2030-01-31"})
+    assert len(customers) == 21
+    assert len(queries) == 3
+
+
+def test_created_at_is_returned_as_stored(client, conn):
+    add_customer_with_order(client, "2030-02-01")
+    customer = client.get("/search/date/", params={"date_str": "2030-02-01"}).json()["customers"][0]["customer"]
+    stored = conn.execute("SELECT created_at FROM CUSTOMER WHERE customer_id = ?", (customer["customer_id"],)).fetchone()
+    assert customer["created_at"] == stored[0]
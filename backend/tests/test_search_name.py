@@ -0,0 +1,12 @@
+# test_search_name.py
+def test_names_starting_with_the_search_come_first(client):
+    for name in ("Quxley Bari", "Anwar Quxford", "quxine Abbas"):
+        client.post("/customers/", json={"name": name, "phone_number": "0300-5550000"})
+
+    names = [c["name"] for c in client.get("/search/name/qux").json()["customers"]]
+    assert names == ["quxine Abbas", "Quxley Bari", "Anwar Quxford"]
+    names = [c["name"] for c in client.get("/search/name/qux", params={"limit": 2}).json()["customers"]]
+    assert names == ["quxine Abbas", "Quxley Bari"]
+    names = [c["name"] for c in client.get("/search/name/Anwar Qux").json()["customers"]]
+    assert names == ["Anwar Quxford"]
+    assert set(client.get("/search/name/qux").json()["customers"][0]) == {"id", "name", "phone", "address", "created_at"}
@@ -0,0 +1,82 @@
+# test_similar.py
+import sqlite3
+
+import pytest
+
+from similar import DIMENSIONS, MeasurementIndex
+
+pytest.importorskip("numpy")
+
+
+class ImportDuringBuild:
+    """Connection that bulk-imports a measurement right after the build has read the rows"""
+
+    def __init__(self, conn, index):
+        self.conn = conn
+        self.index = index
+        self.imported = False
+
+    def execute(self, sql, *params):
+        cursor = self.conn.execute(sql, *params)
+        if "WHERE garment_type" not in sql or self.imported:
+            return cursor
+        rows = cursor.fetchall()
+        self.imported = True
+        self.conn.execute("INSERT INTO MEASUREMENT (measurement_id, garment_type, chest) VALUES (3, 'shirt', 41)")
+        self.index.invalidate()
+        return Fetched(rows)
+
+
+class Fetched:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_invalidate_during_a_build_rebuilds():
+    conn = sqlite3.connect(":memory:")
+    conn.execute(f"CREATE TABLE MEASUREMENT (measurement_id INTEGER PRIMARY KEY, garment_type TEXT, "
+                 f"{', '.join(DIMENSIONS)})")
+    conn.execute("INSERT INTO MEASUREMENT (measurement_id, garment_type, chest) VALUES (1, 'shirt', 40), (2, 'shirt', 44)")
+    index = MeasurementIndex()
+
+    index.ensure_built(ImportDuringBuild(conn, index))
+    assert index.stats() == {"built": True, "builds": 1, "measurements": {"shirt": 3}}
+    assert [match[0] for match in index.similar(conn, 3, 2)] == [1, 2]
+
+
+def test_build_groups_rows_by_null_pattern():
+    import numpy as np
+    from similar import GarmentMatrix
+
+    rng = np.random.default_rng(1)
+    values = rng.normal(40, 3, (500, len(DIMENSIONS))).astype(np.float32)
+    values[rng.random(values.shape) < 0.4] = np.nan
+    matrix = GarmentMatrix.build(np.arange(1, 501), values)
+
+    assert matrix.pattern_present.shape == (len(matrix.patterns), len(DIMENSIONS))
+    for row in range(matrix.size):
+        present = matrix.pattern_present[matrix.codes[row]] > 0
+        assert (present == ~np.isnan(values[row])).all()
+        assert np.allclose(matrix.vector(row + 1), values[row], equal_nan=True, atol=1e-4)
+
+
+def test_nearest_skips_rows_sharing_too_few_dimensions_without_warnings():
+    import warnings
+
+    import numpy as np
+    from similar import GarmentMatrix
+
+    values = np.full((3, len(DIMENSIONS)), np.nan, dtype=np.float32)
+    values[0, :4] = 40
+    values[1, :4] = 41
+    values[2, 4:8] = 40  # no dimension in common with the others: 0 * inf
+    matrix = GarmentMatrix.build(np.array([1, 2, 3]), values)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        ids, distances, shared = matrix.nearest(matrix.vector(1), 3, exclude=1)
+    assert ids == [2]
+    assert shared == [4]
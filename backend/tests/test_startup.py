@@ -0,0 +1,49 @@
+# test_startup.py
+import json
+import os
+import subprocess
+import sys
+
+# Runs in a fresh interpreter: main builds its pool, writer and lanes at import time,
+# and the session's app must keep running for the other tests
+LIFECYCLE = """
+import json, os, sys
+os.environ["TAILORSHOP_DB"] = sys.argv[1]
+import main
+from fastapi.testclient import TestClient
+
+result = {"before": {"writer": main.write_queue._thread is not None, "pool": main.pool.stats()["open_connections"]}}
+with TestClient(main.app) as client:
+    result["startup"] = client.get("/db/startup").json()
+    result["writer"] = main.write_queue._thread.is_alive()
+    customer = {"name": "Startup Test", "phone_number": "0303-1234567"}
+    result["created"] = client.post("/customers/", json=customer).status_code
+    result["pool"] = client.get("/db/pool").json()
+result["after"] = {"writer": main.write_queue._thread is not None, "pool": main.pool.stats()["open_connections"],
+                   "closed": main.pool._closed}
+print(json.dumps(result))
+"""
+
+
+def test_app_starts_and_stops_cleanly(tmp_path):
+    from migrations import SCHEMA_VERSION
+
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    database = tmp_path / "startup.db"
+    process = subprocess.run([sys.executable, "-c", LIFECYCLE, str(database)], cwd=backend,
+                             capture_output=True, text=True, timeout=120)
+    assert process.returncode == 0, process.stderr
+    result = json.loads(process.stdout.splitlines()[-1])
+
+    # Nothing runs before the lifespan starts
+    assert result["before"] == {"writer": False, "pool": 0}
+    # An empty database is migrated to this code's schema and warmed
+    assert result["startup"]["schema_version"] == SCHEMA_VERSION
+    assert result["startup"]["warmed"]["indexes"] > 0
+    assert "Applied migration 1" in process.stdout
+    # The writer thread and the lane connections are up
+    assert result["writer"] is True
+    assert result["created"] == 200
+    assert result["pool"]["open_connections"] > 1
+    # Shutdown stops the writer and closes every connection
+    assert result["after"] == {"writer": False, "pool": 0, "closed": True}
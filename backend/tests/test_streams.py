@@ -0,0 +1,88 @@
+# test_streams.py
+import asyncio
+import threading
+import time
+
+import main
+from database import StreamSlots
+from metrics import InstrumentedCursor
+
+
+async def disconnect_after_first_chunk(path):
+    """GET path through the ASGI app and go away once the first body chunk arrived"""
+    first_chunk = asyncio.Event()
+
+    async def receive():
+        await first_chunk.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body"):
+            first_chunk.set()
+
+    # Before ASGI spec 2.4 the response watches receive() for the disconnect
+    scope = {"type": "http", "asgi": {"version": "3.0", "spec_version": "2.3"}, "http_version": "1.1",
+             "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+             "root_path": "", "headers": [], "client": ("test", 1), "server": ("test", 80)}
+    await main.app(scope, receive, send)
+
+
+def test_stream_slots_release_once():
+    slots = StreamSlots(1)
+    release = slots.take()
+    assert slots.take() is None
+    release()
+    release()
+    assert slots.stats()["active"] == 0
+    assert slots.take() is not None
+
+
+def test_streams_give_their_slot_back(client):
+    response = client.get("/orders/", params={"stream": True})
+    assert response.status_code == 200
+    assert response.text.count("\n") > 0
+    assert client.get("/export/customers", params={"format": "csv"}).status_code == 200
+    assert main.stream_slots.stats()["active"] == 0
+
+
+def test_stream_rejected_when_slots_are_taken(client, monkeypatch):
+    monkeypatch.setattr(main, "stream_slots", StreamSlots(0))
+    response = client.get("/export/orders")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "5"
+    assert client.get("/customers/", params={"stream": True}).status_code == 503
+    # Lane reads never depend on a stream slot
+    assert client.get("/customers/1").status_code == 200
+
+
+def test_disconnect_waits_for_the_running_fetch(client, monkeypatch):
+    fetching = threading.Event()
+    released_while_fetching = []
+    fetchmany = InstrumentedCursor.fetchmany
+    release = main.pool.release
+
+    def slow_fetchmany(self, size=None):
+        fetching.set()
+        try:
+            time.sleep(0.05)
+            return fetchmany(self, size)
+        finally:
+            fetching.clear()
+
+    def checked_release(conn):
+        released_while_fetching.append(fetching.is_set())
+        release(conn)
+
+    monkeypatch.setattr(InstrumentedCursor, "fetchmany", slow_fetchmany)
+    monkeypatch.setattr(main.pool, "release", checked_release)
+    monkeypatch.setattr(main, "STREAM_BATCH_SIZE", 10)
+    in_use = main.pool.stats()["in_use"]
+
+    asyncio.run(disconnect_after_first_chunk("/export/orders"))
+    # The close queued on the report lane runs once the fetch in flight returns
+    deadline = time.monotonic() + 5
+    while main.stream_slots.stats()["active"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert released_while_fetching == [False]
+    assert main.pool.stats()["in_use"] == in_use
+    assert main.stream_slots.stats()["active"] == 0
@@ -0,0 +1,112 @@
+# test_sync.py
+
+
+def create_customer(client, name="Sync Test"):
+    response = client.post("/customers/", json={"name": name, "phone_number": "0300-1234567"})
+    assert response.status_code == 200
+    return response.json()["customer_id"]
+
+
+def create_measurement(client, customer_id):
+    response = client.post("/measurements/", json={"customer_id": customer_id, "measurement_date": "2024-05-01",
+                                                   "garment_type": "shirt", "chest": 40, "waist": 34})
+    assert response.status_code == 200
+    return response.json()["measurement_id"]
+
+
+def create_order(client, customer_id, measurement_id):
+    response = client.post("/orders/", json={"customer_id": customer_id, "measurement_id": measurement_id,
+                                             "order_date": "2024-05-02", "total_amount": 3000,
+                                             "garment_type": "shirt"})
+    assert response.status_code == 200
+    return response.json()["order_id"]
+
+
+def cursor_now(conn):
+    return conn.execute('SELECT seq FROM CHANGE_CLOCK').fetchone()[0]
+
+
+def sync(client, since, limit=500):
+    response = client.get("/sync", params={"since": since, "limit": limit})
+    assert response.status_code == 200
+    return response.json()
+
+
+def row_ids(batch, entity):
+    """Primary keys of the changed rows of entity in a /sync batch"""
+    key = batch[entity]["columns"].index(entity[:-1] + "_id")
+    return [row[key] for row in batch[entity]["rows"]]
+
+
+def test_cursor_pages_until_has_more_is_false(client, conn):
+    since = cursor_now(conn)
+    created = [create_customer(client, f"Sync Page {n}") for n in range(5)]
+
+    pages = []
+    while True:
+        batch = sync(client, since, limit=2)
+        pages.append((row_ids(batch, "customers"), batch["has_more"]))
+        assert batch["cursor"] > since
+        since = batch["cursor"]
+        if not batch["has_more"]:
+            break
+    assert pages == [(created[:2], True), (created[2:4], True), (created[4:], False)]
+    batch = sync(client, since)
+    assert (batch["cursor"], batch["has_more"], row_ids(batch, "customers")) == (since, False, [])
+
+
+def test_updates_come_back_in_change_seq_order_across_tables(client, conn):
+    customer_id = create_customer(client)
+    measurement_id = create_measurement(client, customer_id)
+    order_id = create_order(client, customer_id, measurement_id)
+    since = updated = cursor_now(conn)
+
+    assert client.put(f"/orders/{order_id}", json={"status": "cutting"}).status_code == 200
+    assert client.put(f"/customers/{customer_id}", json={"name": "Sync Renamed"}).status_code == 200
+    measurement = {"measurement_date": "2024-05-01", "garment_type": "shirt", "chest": 41}
+    assert client.put(f"/measurements/{measurement_id}", json=measurement).status_code == 200
+
+    # One change per batch: the three tables merged by change_seq, not table by table
+    seen = []
+    while True:
+        batch = sync(client, since, limit=1)
+        seen += [(entity, row_id) for entity in ("customers", "measurements", "orders")
+                 for row_id in row_ids(batch, entity)]
+        since = batch["cursor"]
+        if not batch["has_more"]:
+            break
+    assert seen == [("orders", order_id), ("customers", customer_id), ("measurements", measurement_id)]
+
+    # An updated row is sent once, with its latest values
+    batch = sync(client, updated)
+    name = batch["customers"]["columns"].index("name")
+    assert [row[name] for row in batch["customers"]["rows"]] == ["Sync Renamed"]
+
+
+def test_direct_deletes_leave_tombstones(client, conn):
+    customer_id = create_customer(client)
+    measurement_id = create_measurement(client, customer_id)
+    order_id = create_order(client, customer_id, create_measurement(client, customer_id))
+    since = cursor_now(conn)
+
+    assert client.delete(f"/orders/{order_id}").status_code == 200
+    assert client.delete(f"/measurements/{measurement_id}").status_code == 200
+
+    batch = sync(client, since)
+    assert batch["deleted"] == {"customers": [], "measurements": [measurement_id], "orders": [order_id]}
+    assert row_ids(batch, "orders") == [] and row_ids(batch, "measurements") == []
+
+
+def test_cascade_deletes_leave_tombstones(client, conn):
+    customer_id = create_customer(client)
+    measurement_ids = [create_measurement(client, customer_id) for _ in range(2)]
+    order_id = create_order(client, customer_id, measurement_ids[0])
+    since = cursor_now(conn)
+
+    assert client.delete(f"/customers/{customer_id}").status_code == 200
+
+    batch = sync(client, since)
+    assert batch["deleted"]["customers"] == [customer_id]
+    assert sorted(batch["deleted"]["measurements"]) == measurement_ids
+    assert batch["deleted"]["orders"] == [order_id]
+    assert all(row_ids(batch, entity) == [] for entity in ("customers", "measurements", "orders"))
@@ -0,0 +1,79 @@
+# test_workload.py
+from datetime import date, timedelta
+
+import pytest
+
+import main
+
+
+@pytest.fixture(scope="module")
+def due_orders(client):
+    """{label: order_id} of coats due around today, created for these tests"""
+    today = date.today()
+    customer = {"name": "Workload Test", "phone_number": "0302-1112223"}
+    customer_id = client.post("/customers/", json=customer).json()["customer_id"]
+    measurement_id = client.post("/measurements/", json={"customer_id": customer_id, "measurement_date": "2024-05-01",
+                                                         "garment_type": "coat", "chest": 42}).json()["measurement_id"]
+    due = {
+        "overdue": (today - timedelta(days=1), "stitching"),
+        "today": (today, "cutting"),
+        "tomorrow": (today + timedelta(days=1), "order-book"),
+        "end of week": (today + timedelta(days=main.WORKLOAD_DEFAULT_DAYS - 1), "ready-to-deliver"),
+        "next week": (today + timedelta(days=main.WORKLOAD_DEFAULT_DAYS), "order-book"),
+        "delivered today": (today, "delivered"),
+    }
+    orders = {}
+    for label, (delivery_date, status) in due.items():
+        response = client.post("/orders/", json={"customer_id": customer_id, "measurement_id": measurement_id,
+                                                 "order_date": (today - timedelta(days=10)).isoformat(),
+                                                 "delivery_date": delivery_date.isoformat(), "total_amount": 9000,
+                                                 "status": status, "garment_type": "coat"})
+        assert response.status_code == 200
+        orders[label] = response.json()["order_id"]
+    return orders
+
+
+def mine(orders, due_orders):
+    ids = set(due_orders.values())
+    return [order for order in orders if order["order_id"] in ids]
+
+
+def test_default_window_runs_from_today_to_the_end_of_the_week(client, due_orders):
+    today = date.today()
+    workload = client.get("/workload", params={"garment_type": "coat"}).json()
+
+    assert (workload["from"], workload["to"], workload["today"]) == (
+        today.isoformat(), (today + timedelta(days=main.WORKLOAD_DEFAULT_DAYS - 1)).isoformat(), today.isoformat())
+    assert [day["date"] for day in workload["days"]] == [
+        (today + timedelta(days=offset)).isoformat() for offset in range(main.WORKLOAD_DEFAULT_DAYS)]
+
+    placed = {order["order_id"]: (day["date"], order["overdue"])
+              for day in workload["days"] for order in mine(day["orders"], due_orders)}
+    assert placed == {
+        due_orders["today"]: (today.isoformat(), False),
+        due_orders["tomorrow"]: ((today + timedelta(days=1)).isoformat(), False),
+        due_orders["end of week"]: ((today + timedelta(days=main.WORKLOAD_DEFAULT_DAYS - 1)).isoformat(), False),
+    }
+    first, second, last = workload["days"][0], workload["days"][1], workload["days"][-1]
+    assert first["by_status"]["cutting"] >= 1 and second["by_status"]["order-book"] >= 1
+    assert last["by_status"]["ready-to-deliver"] >= 1 and last["by_garment_type"]["coat"] >= 1
+    assert workload["totals"]["overdue"] == 0
+
+    overdue = mine(workload["overdue_before"], due_orders)
+    assert [(order["order_id"], order["overdue"]) for order in overdue] == [(due_orders["overdue"], True)]
+
+
+def test_window_starting_in_the_past_flags_overdue_days(client, due_orders):
+    today = date.today()
+    yesterday = (today - timedelta(days=1)).isoformat()
+    workload = client.get("/workload", params={"from": yesterday, "to": today.isoformat(),
+                                               "garment_type": "coat", "include_overdue": False}).json()
+
+    days = {day["date"]: day for day in workload["days"]}
+    assert [(order["order_id"], order["overdue"]) for order in mine(days[yesterday]["orders"], due_orders)] == [
+        (due_orders["overdue"], True)]
+    assert [(order["order_id"], order["overdue"]) for order in mine(days[today.isoformat()]["orders"], due_orders)] == [
+        (due_orders["today"], False)]
+    assert days[yesterday]["overdue"] == days[yesterday]["count"]
+    assert days[today.isoformat()]["overdue"] == 0
+    assert workload["overdue_before"] == []
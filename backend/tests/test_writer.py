@@ -0,0 +1,25 @@
+# test_writer.py
+import main
+from database import ConnectionPool
+from writer import WriteQueue
+
+
+def lose_transaction(conn):
+    """Behaves like SQLITE_FULL: SQLite has rolled the whole transaction back"""
+    conn.execute("ROLLBACK")
+    raise OSError("database or disk is full")
+
+
+def test_writer_survives_a_lost_transaction():
+    pool = ConnectionPool(main.pool.database, max_size=1)
+    writer = WriteQueue(pool, window=0.2)  # wide enough for all three jobs to share one batch
+    futures = [writer.submit(lambda conn: conn.execute("SELECT 1").fetchone()[0]),
+               writer.submit(lose_transaction),
+               writer.submit(lambda conn: conn.execute("SELECT 2").fetchone()[0])]
+    # The jobs before and after the failing one lost their work with the transaction
+    assert all(future.exception(timeout=5) is not None for future in futures)
+
+    assert writer.submit(lambda conn: conn.execute("SELECT 3").fetchone()[0]).result(timeout=5) == 3
+    assert writer.stats()["failed"] == 3
+    writer.close()
+    pool.close()
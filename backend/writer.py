@@ -0,0 +1,193 @@
+# writer.py
+import asyncio
+import contextvars
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger("tailorshop.writer")
+
+_STOP = object()
+
+
+class WriteQueue:
+    """Single writer thread that applies every mutation, group-committing concurrent ones.
+
+    Callers submit a function taking a connection. Jobs that arrive within the
+    batching window share one transaction; each runs inside its own SAVEPOINT so a
+    failing job is rolled back on its own and only its caller sees the error.
+    Results are handed back only after the shared COMMIT succeeded. If SQLite gives
+    up the whole transaction (disk full, I/O error), every job in the batch fails.
+    A job can register after_transaction() callbacks; they run once the
+    transaction has ended, committed or not, before any result is handed back.
+    """
+
+    def __init__(self, pool, max_batch=64, window=0.001):
+        self.pool = pool
+        self.max_batch = max_batch
+        self.window = window
+        self._jobs = queue.Queue()
+        self._lock = threading.Lock()
+        self._transactions = 0
+        self._writes = 0
+        self._failed = 0
+        self._largest_batch = 0
+        self._thread = None
+        self._after = []  # callbacks registered by the jobs of the current batch (writer thread only)
+
+    def start(self):
+        """Start the writer thread - submit() also starts it on first use"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, fn, *args):
+        """Queue fn(conn, *args) and return a Future for its result"""
+        if self._thread is None:
+            self.start()
+        future = Future()
+        # fn runs in the submitter's context so per-request metrics see its queries
+        self._jobs.put((contextvars.copy_context(), fn, args, future))
+        return future
+
+    def execute(self, fn, *args):
+        """Run fn(conn, *args) on the writer and wait for the committed result"""
+        return self.submit(fn, *args).result()
+
+    async def run(self, fn, *args):
+        """Async version of execute() - awaits the commit without tying up a thread"""
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def after_transaction(self, fn, *args):
+        """From inside a job: call fn(*args) once its transaction has committed or rolled back"""
+        self._after.append((fn, args))
+
+    def _next_batch(self):
+        job = self._jobs.get()
+        if job is _STOP:
+            return None
+        batch = [job]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.perf_counter()
+            try:
+                job = self._jobs.get(timeout=timeout) if timeout > 0 else self._jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is _STOP:
+                self._jobs.put(_STOP)  # finish this batch, stop on the next loop
+                break
+            batch.append(job)
+        return batch
+
+    def _run(self):
+        conn = self.pool.acquire()
+        try:
+            while True:
+                batch = self._next_batch()
+                if batch is None:
+                    break
+                try:
+                    self._apply(conn, batch)
+                except Exception as e:
+                    # Never let the writer thread die - later submits would wait forever
+                    logger.exception("write batch failed")
+                    for _, _, _, future in batch:
+                        if not future.done():
+                            future.set_exception(e)
+        finally:
+            self.pool.release(conn)
+
+    def _rollback(self, conn):
+        try:
+            conn.rollback()
+        except Exception:
+            logger.exception("rollback failed")
+
+    def _apply(self, conn, batch):
+        done = []
+        failed = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+        except Exception as e:
+            for _, _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        # Set when a savepoint statement fails: SQLite has rolled the whole transaction
+        # back (SQLITE_FULL, SQLITE_IOERR, ...), so the rest of the batch cannot run in it
+        broken = None
+        for context, fn, args, future in batch:
+            if broken is not None:
+                failed.append((future, broken))
+                continue
+            try:
+                conn.execute('SAVEPOINT write_job')
+            except Exception as e:
+                broken = e
+                failed.append((future, e))
+                continue
+            try:
+                result = context.run(fn, conn, *args)
+                conn.execute('RELEASE write_job')
+                done.append((future, result))
+            except Exception as e:
+                failed.append((future, e))
+                try:
+                    conn.execute('ROLLBACK TO write_job')
+                    conn.execute('RELEASE write_job')
+                except Exception as e:
+                    broken = e
+
+        if broken is None:
+            try:
+                conn.commit()
+            except Exception as e:
+                self._rollback(conn)
+                broken = e
+        else:
+            self._rollback(conn)
+        if broken is not None:
+            failed += [(future, broken) for future, _ in done]
+            done = []
+
+        after, self._after = self._after, []
+        for fn, args in after:
+            try:
+                fn(*args)
+            except Exception:
+                logger.exception("after_transaction callback failed")
+
+        with self._lock:
+            self._transactions += 1
+            self._writes += len(done)
+            self._failed += len(failed)
+            self._largest_batch = max(self._largest_batch, len(batch))
+        for future, result in done:
+            future.set_result(result)
+        for future, error in failed:
+            future.set_exception(error)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queued": self._jobs.qsize(),
+                "transactions": self._transactions,
+                "writes": self._writes,
+                "failed": self._failed,
+                "average_batch": round((self._writes + self._failed) / self._transactions, 2) if self._transactions else 0,
+                "largest_batch": self._largest_batch,
+                "max_batch": self.max_batch,
+                "window_ms": self.window * 1000,
+            }
+
+    def close(self):
+        """Apply everything already queued, then stop the writer thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._jobs.put(_STOP)
+            thread.join()